@@ -0,0 +1,102 @@
+import bisect
+import heapq
+
+
+class BidBook:
+    """
+    A class indexing the bids at ingestion time by (time_slot, buyer_id).
+
+    Every (time_slot, buyer_id) couple has a merit order kept sorted by price with bisect, bids with the
+    same price keep their arrival order. Every bid receives a stable integer identifier, stored in the
+    'bid_id' field of the bid, so that membership tests can be performed with sets of identifiers.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty book.
+        """
+        self.bids = {}
+        self.merit_orders = {}
+        self.next_bid_id = 0
+
+    def add_bid(self, time_slot, bid_info):
+        """
+        Add a bid to the book.
+
+        :param time_slot: The time slot for which the Bidder offers flexibility
+        :param bid_info: Bid dict, must include at least 'buyer_id' and 'price'
+        :return: The identifier assigned to the bid
+        """
+        bid_id = self.next_bid_id
+        self.next_bid_id += 1
+        bid_info['bid_id'] = bid_id
+        self.bids[bid_id] = bid_info
+
+        if time_slot not in self.merit_orders:
+            self.merit_orders[time_slot] = {}
+        if bid_info['buyer_id'] not in self.merit_orders[time_slot]:
+            self.merit_orders[time_slot][bid_info['buyer_id']] = ([], [])
+        prices, bid_ids = self.merit_orders[time_slot][bid_info['buyer_id']]
+
+        # Insert after the bids with the same price to keep the arrival order
+        position = bisect.bisect_right(prices, bid_info['price'])
+        prices.insert(position, bid_info['price'])
+        bid_ids.insert(position, bid_id)
+        return bid_id
+
+    def add_bids(self, time_slots, bid_infos):
+        """
+        Add several bids to the book, merging them into the merit orders once per (time_slot, buyer_id) couple.
+        The result is the same of calling add_bid for every bid in the given order.
+
+        :param time_slots: Sequence of time slots
+        :param bid_infos: Sequence of bid dicts, with the same length of time_slots
+        :return: The identifiers assigned to the bids
+        """
+        groups = {}
+        bid_ids = []
+        for time_slot, bid_info in zip(time_slots, bid_infos):
+            bid_id = self.next_bid_id
+            self.next_bid_id += 1
+            bid_info['bid_id'] = bid_id
+            self.bids[bid_id] = bid_info
+            bid_ids.append(bid_id)
+            groups.setdefault((time_slot, bid_info['buyer_id']), []).append(bid_id)
+
+        for (time_slot, buyer_id), new_ids in groups.items():
+            if time_slot not in self.merit_orders:
+                self.merit_orders[time_slot] = {}
+            prices, ids = self.merit_orders[time_slot].get(buyer_id, ([], []))
+            # Stable sort of the new bids, then a stable merge after the existing bids with the same price
+            new_ids.sort(key=lambda i: self.bids[i]['price'])
+            merged = list(heapq.merge(zip(prices, ids), [(self.bids[i]['price'], i) for i in new_ids],
+                                      key=lambda entry: entry[0]))
+            self.merit_orders[time_slot][buyer_id] = ([entry[0] for entry in merged], [entry[1] for entry in merged])
+        return bid_ids
+
+    def get_bid(self, bid_id):
+        """
+        Return the bid with the given identifier.
+        """
+        return self.bids[bid_id]
+
+    def get_merit_order(self, time_slot, buyer_id, max_price=None):
+        """
+        Return the bids offered to a Buyer for a time slot, sorted by price.
+
+        :param time_slot: The time slot of the bids
+        :param buyer_id: Identifier of the Buyer
+        :param max_price: If given, only the bids with price <= max_price are returned
+        :return: A list of bid dicts
+        """
+        if time_slot not in self.merit_orders or buyer_id not in self.merit_orders[time_slot]:
+            return []
+        prices, bid_ids = self.merit_orders[time_slot][buyer_id]
+        end = len(bid_ids) if max_price is None else bisect.bisect_right(prices, max_price)
+        return [self.bids[bid_id] for bid_id in bid_ids[:end]]
+
+    def get_buyer_ids(self, time_slot):
+        """
+        Return the identifiers of the Buyers that received at least a bid for the time slot.
+        """
+        return list(self.merit_orders.get(time_slot, {}).keys())
@@ -1,5 +1,10 @@
+import numpy as np
 import pandas as pd
 
+from classes.event_sink import NULL_SINK
+from classes.offer_memory import OfferMemory
+from classes.slot_store import SlotStore
+
 class Bidder:
     """
     A class representing a Bidder in a pay-as-bid market, with an adaptive strategy
@@ -7,7 +12,7 @@ class Bidder:
     """
 
     def __init__(self, id, alpha=0.05, beta=0.05, gamma=0.5, L=7, w1=1.0, w2=1.0, w3=1.0,
-                 baseline=0.10, pow_req_ref=100.0, avg_acc_ref=50.0):
+                 baseline=0.10, pow_req_ref=100.0, avg_acc_ref=50.0, slot_resolution='15min', event_sink=None):
         """
         Initialize the bidder with the given parameters.
 
@@ -19,7 +24,12 @@ class Bidder:
         :param w2: Weight for the average accepted price in the priority calculation
         :param w3: Weight for penalizing a low success ratio in the priority calculation
         :param baseline: Time-series dataset for the bidder baseline.
+        :param slot_resolution: Duration of a time slot, used to index the actual values (the time slots of the
+                                actual values must be datetime-like and aligned to it, see SlotStore)
+        :param event_sink: Sink of the 'offer' events (see classes.event_sink), None discards them
         """
+        if L < 0:
+            raise ValueError("History length L must be non-negative")
         self.id = id
         self.alpha = alpha
         self.beta = beta
@@ -29,10 +39,11 @@ class Bidder:
         self.w2 = w2
         self.w3 = w3
         self.baseline = baseline if baseline is not None else pd.DataFrame()
-        self.actual_values = pd.DataFrame()
+        self.actual_store = SlotStore(resolution=slot_resolution, initial_keys=1)
         self.pow_req_ref = pow_req_ref
         self.avg_acc_ref = avg_acc_ref
         self.memory = {}
+        self.event_sink = event_sink if event_sink is not None else NULL_SINK
 
         self.current_bidding = {}
 
@@ -47,19 +58,10 @@ class Bidder:
         :param accepted: Boolean indicating whether the offer was accepted (reward) or not
         """
         if buyer_id not in self.memory:
-            self.memory[buyer_id] = []
-
-        # Append this record
-        self.memory[buyer_id].append({
-            "time": time_slot,
-            "price": offered_price,
-            "power": offered_power,
-            "accepted": accepted
-        })
+            self.memory[buyer_id] = OfferMemory(self.L)
 
-        # Keep only the last L entries to avoid unbounded growth
-        if len(self.memory[buyer_id]) > self.L:
-            self.memory[buyer_id].pop(0)
+        # Append this record, only the last L entries are kept to avoid unbounded growth
+        self.memory[buyer_id].append(time_slot, offered_price, offered_power, accepted)
 
     def get_buyer_stats(self, buyer_id):
         """
@@ -71,25 +73,12 @@ class Bidder:
             - p_min: Minimum accepted price
             - p_max: Maximum accepted price
         """
-        if buyer_id not in self.memory or len(self.memory[buyer_id]) == 0:
+        if buyer_id not in self.memory:
             # Default values if no history
             return 0.0, 0.0, 0.0, 0.0, 0.0
 
-        records = self.memory[buyer_id]
-        accepted_prices = [r["price"] for r in records if r["accepted"]]
-        rejected_prices = [r["price"] for r in records if not r["accepted"]]
-
-        # Compute average accepted price
-        avg_acc = sum(accepted_prices) / len(accepted_prices) if len(accepted_prices) > 0 else 0.0
-        # Compute average rejected price
-        avg_rej = sum(rejected_prices) / len(rejected_prices) if len(rejected_prices) > 0 else 0.0
-        # Compute success ratio
-        success_ratio = len(accepted_prices) / len(records)
-        # Compute min and max of accepted prices
-        p_min = min(accepted_prices) if len(accepted_prices) > 0 else 0.0
-        p_max = max(accepted_prices) if len(accepted_prices) > 0 else 0.0
-
-        return avg_acc, avg_rej, success_ratio, p_min, p_max
+        # Running sums and counts are maintained by the memory, min and max by monotonic deques
+        return self.memory[buyer_id].get_stats()
 
     def compute_priority(self, buyer_id, pow_req, wtp):
         """
@@ -180,6 +169,56 @@ class Bidder:
         final_power = pow_bid
         return p_start, final_power
 
+    def build_offers(self, time_slots, buyer_requests, power_factor=1.0):
+        """
+        Build the offers of a batch of time slots (e.g. a day-ahead schedule) in one call.
+
+        For every time slot the buyer is selected as in select_buyer and the offer is built as in build_offer,
+        with the power given by the baseline scaled by power_factor. The history does not change inside the batch,
+        hence the statistics and the prices are computed once per buyer and the priorities and powers as arrays.
+
+        :param time_slots: Sequence of time slots
+        :param buyer_requests: Dict time_slot -> list of buyer info dicts ('id', 'requested_power', 'wtp'),
+                               as in select_buyer. The time slots without requests get no offer
+        :param power_factor: Fraction of the baseline offered as power
+        :return: A DataFrame with the columns time_slot, bidder_id, buyer_id, power, price (one row per offer)
+        """
+        columns = ['time_slot', 'bidder_id', 'buyer_id', 'power', 'price']
+        slots = [time_slot for time_slot in time_slots if buyer_requests.get(time_slot)]
+        if len(slots) == 0:
+            return pd.DataFrame(columns=columns)
+        requests = [(s, buyer_info) for s, time_slot in enumerate(slots) for buyer_info in buyer_requests[time_slot]]
+        request_slot = np.array([s for s, _ in requests], dtype=np.int64)
+        buyer_codes, buyer_ids = pd.factorize(pd.Series([buyer_info['id'] for _, buyer_info in requests],
+                                                        dtype=object))
+        pow_req = np.array([buyer_info['requested_power'] for _, buyer_info in requests], dtype=float)
+
+        # Priorities, with the same operations of compute_priority
+        stats = [self.get_buyer_stats(buyer_id) for buyer_id in buyer_ids]
+        avg_acc = np.array([stat[0] for stat in stats])[buyer_codes]
+        success_ratio = np.array([stat[2] for stat in stats])[buyer_codes]
+        priority = (self.w1 * (pow_req / self.pow_req_ref)) + (self.w2 * (avg_acc / self.avg_acc_ref)) - \
+                   (self.w3 * (1.0 - success_ratio))
+        priority = np.where(np.isnan(priority), -np.inf, priority)
+
+        # Best request of every slot, the first one in case of ties (as select_buyer)
+        order = np.lexsort((np.arange(len(requests)), -priority, request_slot))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = request_slot[order][1:] != request_slot[order][:-1]
+        best = order[first]
+        best = best[priority[best] > -np.inf]
+
+        # Prices depend only on the buyer, powers on the baseline
+        prices = {buyer_id: self.build_offer(buyer_id)[0] for buyer_id in buyer_ids[np.unique(buyer_codes[best])]}
+        offer_slots = [slots[s] for s in request_slot[best]]
+        offer_buyers = [requests[r][1]['id'] for r in best]
+        baseline = self.baseline['value'].reindex(pd.Index(offer_slots)).to_numpy(dtype=float)
+        return pd.DataFrame({'time_slot': offer_slots,
+                             'bidder_id': [self.id] * len(best),
+                             'buyer_id': offer_buyers,
+                             'power': baseline * power_factor,
+                             'price': [prices[buyer_id] for buyer_id in offer_buyers]}, columns=columns)
+
     def get_last_record(self, buyer_id):
         """
         Retrieve the most recent record from memory for a given Buyer.
@@ -187,9 +226,9 @@ class Bidder:
         :param buyer_id: Identifier of the Buyer
         :return: The latest record dict or None if not available
         """
-        if buyer_id not in self.memory or len(self.memory[buyer_id]) == 0:
+        if buyer_id not in self.memory:
             return None
-        return self.memory[buyer_id][-1]
+        return self.memory[buyer_id].get_last_record()
 
     def update_current_bidding(self, buyer_id, offered_power, offered_price):
         """
@@ -204,6 +243,8 @@ class Bidder:
             "power": offered_power,
             "price": offered_price,
         }
+        if self.event_sink.enabled:
+            self.event_sink.emit('offer', **self.current_bidding)
 
     def set_reference_values(self, pow_req_ref, avg_acc_ref):
         """
@@ -220,7 +261,24 @@ class Bidder:
         """
         Add an actual value for a specific time slot.
 
-        :param time_slot: The time (or slot) of the market session
+        :param time_slot: The time slot of the market session, datetime-like and aligned to slot_resolution
         :param value: The actual value to be added
         """
-        self.actual_values.loc[time_slot, 'value'] = value
\ No newline at end of file
+        self.actual_store.set_value(self.id, time_slot, value)
+
+    def get_actual_value(self, time_slot):
+        """
+        Get the actual value of a specific time slot.
+
+        :param time_slot: The time (or slot) of the market session
+        :return: The actual value, or None if not available
+        """
+        return self.actual_store.get_value(self.id, time_slot, default=None)
+
+    @property
+    def actual_values(self):
+        """
+        The actual values as a DataFrame indexed by time slot with a 'value' column (a copy, use
+        add_actual_value to change them).
+        """
+        return self.actual_store.get_series(self.id).dropna().to_frame('value')
@@ -0,0 +1,344 @@
+import numpy as np
+
+
+def add_empty_column(values):
+    """
+    Return a copy of a 2D array with an additional last column of zeros, cheaper than np.pad on small arrays.
+    """
+    padded = np.zeros((values.shape[0], values.shape[1] + 1), dtype=values.dtype)
+    padded[:, :-1] = values
+    return padded
+
+
+class BidderPopulation:
+    """
+    A class simulating a population of bidders with the strategy of Bidder, vectorized over all the bidders.
+
+    The parameters of the bidders (alpha, beta, gamma, L, w1, w2, w3 and the reference values) are arrays and
+    the per-buyer histories are stored in a (bidder x buyer x max L) ring buffer of prices, powers and
+    acceptance flags. Statistics, priorities, buyer selections and offers are computed for all the bidders
+    in one NumPy pass. The running counts and sums of the accepted and rejected prices are updated with the
+    same operations of OfferMemory, so the results are identical to the ones of the per-object Bidder methods.
+    """
+
+    def __init__(self, ids, alpha=0.05, beta=0.05, gamma=0.5, L=7, w1=1.0, w2=1.0, w3=1.0, pow_req_ref=100.0,
+                 avg_acc_ref=50.0, initial_buyers=4):
+        """
+        Initialize the population, every parameter can be a scalar (shared) or an array with a value per bidder.
+
+        :param ids: Identifiers of the bidders
+        :param initial_buyers: Number of buyers preallocated in the ring buffer
+        See Bidder for the other parameters.
+        """
+        self.ids = list(ids)
+        self.bidders = {bidder_id: b for b, bidder_id in enumerate(self.ids)}
+        n = len(self.ids)
+        self.alpha = np.broadcast_to(np.asarray(alpha, dtype=float), n).copy()
+        self.beta = np.broadcast_to(np.asarray(beta, dtype=float), n).copy()
+        self.gamma = np.broadcast_to(np.asarray(gamma, dtype=float), n).copy()
+        self.L = np.broadcast_to(np.asarray(L, dtype=np.int64), n).copy()
+        if np.any(self.L < 0):
+            raise ValueError("History lengths L must be non-negative")
+        self.w1 = np.broadcast_to(np.asarray(w1, dtype=float), n).copy()
+        self.w2 = np.broadcast_to(np.asarray(w2, dtype=float), n).copy()
+        self.w3 = np.broadcast_to(np.asarray(w3, dtype=float), n).copy()
+        self.pow_req_ref = np.broadcast_to(np.asarray(pow_req_ref, dtype=float), n).copy()
+        self.avg_acc_ref = np.broadcast_to(np.asarray(avg_acc_ref, dtype=float), n).copy()
+
+        # Ring buffer of the histories: the k-th offer of a bidder b to a buyer is stored at k % L[b]
+        self.buyers = {}
+        self.L_max = max(int(self.L.max()), 1) if n > 0 else 1
+        shape = (n, max(initial_buyers, 1), self.L_max)
+        self.prices = np.zeros(shape)
+        self.powers = np.zeros(shape)
+        self.accepted = np.zeros(shape, dtype=bool)
+        self.counts = np.zeros(shape[:2], dtype=np.int64)
+        self.n_accepted = np.zeros(shape[:2], dtype=np.int64)
+        self.accepted_sums = np.zeros(shape[:2])
+        self.rejected_sums = np.zeros(shape[:2])
+
+    @classmethod
+    def from_bidders(cls, bidders, initial_buyers=4):
+        """
+        Create a population with the parameters and the reference values of a list of Bidder objects.
+        The histories of the bidders are not copied.
+        """
+        return cls(ids=[bidder.id for bidder in bidders],
+                   alpha=[bidder.alpha for bidder in bidders],
+                   beta=[bidder.beta for bidder in bidders],
+                   gamma=[bidder.gamma for bidder in bidders],
+                   L=[bidder.L for bidder in bidders],
+                   w1=[bidder.w1 for bidder in bidders],
+                   w2=[bidder.w2 for bidder in bidders],
+                   w3=[bidder.w3 for bidder in bidders],
+                   pow_req_ref=[bidder.pow_req_ref for bidder in bidders],
+                   avg_acc_ref=[bidder.avg_acc_ref for bidder in bidders],
+                   initial_buyers=initial_buyers)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # -------------------------------------------------------------------------
+    # Indexes
+    # -------------------------------------------------------------------------
+    def get_bidder_indexes(self, bidder_ids):
+        return np.array([self.bidders[bidder_id] for bidder_id in bidder_ids], dtype=np.int64)
+
+    def add_buyer(self, buyer_id):
+        """
+        Add a buyer (if not already available) and return its column in the ring buffer.
+        """
+        if buyer_id not in self.buyers:
+            column = len(self.buyers)
+            if column >= self.counts.shape[1]:
+                pad = ((0, 0), (0, self.counts.shape[1]), (0, 0))
+                self.prices = np.pad(self.prices, pad)
+                self.powers = np.pad(self.powers, pad)
+                self.accepted = np.pad(self.accepted, pad)
+                self.counts = np.pad(self.counts, pad[:2])
+                self.n_accepted = np.pad(self.n_accepted, pad[:2])
+                self.accepted_sums = np.pad(self.accepted_sums, pad[:2])
+                self.rejected_sums = np.pad(self.rejected_sums, pad[:2])
+            self.buyers[buyer_id] = column
+        return self.buyers[buyer_id]
+
+    def get_buyer_indexes(self, buyer_ids):
+        """
+        Return the columns of the given buyers, -1 for the buyers without any history.
+        """
+        return np.array([self.buyers.get(buyer_id, -1) for buyer_id in buyer_ids], dtype=np.int64)
+
+    # -------------------------------------------------------------------------
+    # Histories
+    # -------------------------------------------------------------------------
+    def update_history(self, bidder_ids, buyer_ids, offered_prices, offered_powers, accepted):
+        """
+        Store the results of several offers, see Bidder.update_history.
+        The offers of the same (bidder, buyer) couple are stored in the given order.
+
+        :param bidder_ids: Sequence of bidder identifiers
+        :param buyer_ids: Sequence of buyer identifiers
+        :param offered_prices: Sequence of offered prices
+        :param offered_powers: Sequence of offered powers
+        :param accepted: Sequence of booleans, True if the offer was accepted
+        """
+        self.update_history_at(self.get_bidder_indexes(bidder_ids),
+                               np.array([self.add_buyer(buyer_id) for buyer_id in buyer_ids], dtype=np.int64),
+                               offered_prices, offered_powers, accepted)
+
+    def update_history_at(self, rows, columns, offered_prices, offered_powers, accepted):
+        """
+        Store the results of several offers given the rows of the bidders and the columns of the buyers in the
+        ring buffer (see add_buyer), without looking up the identifiers. See update_history.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        offered_prices = np.asarray(offered_prices, dtype=float)
+        offered_powers = np.asarray(offered_powers, dtype=float)
+        accepted = np.asarray(accepted, dtype=bool)
+        # The bidders with L = 0 keep no history
+        kept = self.L[rows] > 0
+        if not kept.all():
+            rows, columns, offered_prices = rows[kept], columns[kept], offered_prices[kept]
+            offered_powers, accepted = offered_powers[kept], accepted[kept]
+        if len(rows) == 0:
+            return
+
+        # Rank of every offer among the ones of its couple, the offers with the same rank are written together
+        couples = rows * self.counts.shape[1] + columns
+        order = np.argsort(couples, kind='stable')
+        sorted_couples = couples[order]
+        new_couple = np.ones(len(order), dtype=bool)
+        new_couple[1:] = sorted_couples[1:] != sorted_couples[:-1]
+        starts = np.flatnonzero(new_couple)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - starts[np.cumsum(new_couple) - 1]
+
+        for r in range(rank.max() + 1):
+            selected = rank == r
+            b, k = rows[selected], columns[selected]
+            L = self.L[b]
+            position = self.counts[b, k] % L
+
+            # Remove the oldest offers of the full memories from the running statistics
+            full = self.counts[b, k] >= L
+            old_prices = self.prices[b, k, position]
+            old_accepted = full & self.accepted[b, k, position]
+            old_rejected = full & ~self.accepted[b, k, position]
+            n_accepted = self.n_accepted[b, k] - old_accepted
+            self.n_accepted[b, k] = n_accepted
+            self.accepted_sums[b, k] = np.where(old_accepted, np.where(n_accepted > 0, self.accepted_sums[b, k] -
+                                                                       old_prices, 0.0), self.accepted_sums[b, k])
+            self.rejected_sums[b, k] = np.where(old_rejected, np.where(L - 1 - n_accepted > 0,
+                                                                       self.rejected_sums[b, k] - old_prices, 0.0),
+                                                self.rejected_sums[b, k])
+
+            # Add the new offers
+            new_accepted = accepted[selected]
+            self.n_accepted[b, k] += new_accepted
+            self.accepted_sums[b, k] = np.where(new_accepted, self.accepted_sums[b, k] + offered_prices[selected],
+                                                self.accepted_sums[b, k])
+            self.rejected_sums[b, k] = np.where(new_accepted, self.rejected_sums[b, k],
+                                                self.rejected_sums[b, k] + offered_prices[selected])
+            self.prices[b, k, position] = offered_prices[selected]
+            self.powers[b, k, position] = offered_powers[selected]
+            self.accepted[b, k, position] = accepted[selected]
+            self.counts[b, k] += 1
+
+    def get_buyer_stats(self, price_range=True):
+        """
+        Compute the statistics of Bidder.get_buyer_stats for all the (bidder, buyer) couples.
+
+        :param price_range: False to skip p_min and p_max (returned as None), not needed by the strategy
+        :return: Arrays (bidder x buyer) avg_acc, avg_rej, success_ratio, p_min, p_max, with an additional
+                 last column of zeros for the buyers without any history
+        """
+        # The first min(count, L) positions of the ring buffer hold the stored offers
+        n_buyers = len(self.buyers)
+        lengths = np.minimum(self.counts[:, :n_buyers], self.L[:, None])
+        n_accepted = self.n_accepted[:, :n_buyers]
+        n_rejected = lengths - n_accepted
+
+        stats = [np.where(n_accepted > 0, self.accepted_sums[:, :n_buyers] / np.maximum(n_accepted, 1), 0.0),
+                 np.where(n_rejected > 0, self.rejected_sums[:, :n_buyers] / np.maximum(n_rejected, 1), 0.0),
+                 np.where(lengths > 0, n_accepted / np.maximum(lengths, 1), 0.0)]
+        if price_range:
+            accepted = self.accepted[:, :n_buyers] & (np.arange(self.L_max) < lengths[..., None])
+            prices = self.prices[:, :n_buyers]
+            stats.append(np.where(n_accepted > 0, np.where(accepted, prices, np.inf).min(axis=2), 0.0))
+            stats.append(np.where(n_accepted > 0, np.where(accepted, prices, -np.inf).max(axis=2), 0.0))
+        padded = tuple(add_empty_column(stat) for stat in stats)
+        return padded if price_range else padded + (None, None)
+
+    def get_last_accepted(self):
+        """
+        Return the acceptance flag of the most recent offer of every (bidder, buyer) couple, with a mask of the
+        couples having at least one offer. An additional last column is added for the buyers without history.
+        """
+        position = (self.counts - 1) % np.maximum(self.L, 1)[:, None]
+        last_accepted = np.take_along_axis(self.accepted, position[..., None], axis=2)[..., 0]
+        n_buyers = len(self.buyers)
+        has_record = add_empty_column(self.counts[:, :n_buyers] > 0)
+        return add_empty_column(last_accepted[:, :n_buyers]) & has_record, has_record
+
+    # -------------------------------------------------------------------------
+    # Strategy
+    # -------------------------------------------------------------------------
+    def set_reference_values(self, pow_req_ref, avg_acc_ref):
+        """
+        Update the reference values of all the bidders, see Bidder.set_reference_values.
+        """
+        if pow_req_ref != 0.0:
+            self.pow_req_ref[:] = pow_req_ref
+        if avg_acc_ref != 0.0:
+            self.avg_acc_ref[:] = avg_acc_ref
+
+    def compute_priorities(self, buyers_info):
+        """
+        Compute the priorities of Bidder.compute_priority for all the bidders and the given buyers.
+
+        :param buyers_info: A list of dict with 'id', 'requested_power' and 'wtp', as in Bidder.select_buyer
+        :return: Array (bidder x buyer) of priorities
+        """
+        columns = self.get_buyer_indexes([buyer_info['id'] for buyer_info in buyers_info])
+        pow_req = np.array([buyer_info['requested_power'] for buyer_info in buyers_info], dtype=float)
+        avg_acc, _, success_ratio, _, _ = self.get_buyer_stats()
+        avg_acc = avg_acc[:, columns]
+        success_ratio = success_ratio[:, columns]
+
+        normalized_pow_req = pow_req[None, :] / self.pow_req_ref[:, None]
+        normalized_avg_acc = avg_acc / self.avg_acc_ref[:, None]
+        return (self.w1[:, None] * normalized_pow_req) + (self.w2[:, None] * normalized_avg_acc) - \
+            (self.w3[:, None] * (1.0 - success_ratio))
+
+    def select_buyers(self, buyers_info):
+        """
+        Select the best buyer of every bidder, see Bidder.select_buyer.
+
+        :param buyers_info: A list of dict with 'id', 'requested_power' and 'wtp'
+        :return: Array with the position in buyers_info of the buyer selected by every bidder, -1 if none
+        """
+        if not buyers_info:
+            return np.full(len(self.ids), -1, dtype=np.int64)
+        priorities = self.compute_priorities(buyers_info)
+        # NaN priorities are never selected, ties are won by the first buyer
+        priorities = np.where(np.isnan(priorities), -np.inf, priorities)
+        selected = np.argmax(priorities, axis=1)
+        best = priorities[np.arange(len(self.ids)), selected]
+        return np.where(best > -np.inf, selected, -1)
+
+    def select_buyers_batch(self, buyer_ids, pow_req, pow_req_ref, avg_acc_ref, stats=None):
+        """
+        Select the best buyer of every bidder in several slots with the current histories, see select_buyers.
+
+        :param buyer_ids: Identifiers of the buyers, the same in every slot
+        :param pow_req: Array (slot x buyer) of requested powers
+        :param pow_req_ref: Array (slot x bidder) of the reference requested powers
+        :param avg_acc_ref: Array (slot x bidder) of the reference accepted prices
+        :param stats: Result of get_buyer_stats with the current histories, computed if not given
+        :return: Array (slot x bidder) with the position in buyer_ids of the selected buyer, -1 if none
+        """
+        n_slots = len(pow_req)
+        if len(buyer_ids) == 0:
+            return np.full((n_slots, len(self.ids)), -1, dtype=np.int64)
+        columns = self.get_buyer_indexes(buyer_ids)
+        avg_acc, _, success_ratio, _, _ = self.get_buyer_stats() if stats is None else stats
+        avg_acc = avg_acc[:, columns]
+        success_ratio = success_ratio[:, columns]
+
+        # The priorities are computed buyer by buyer on (slot x bidder) arrays, ties are won by the first buyer
+        pow_req = np.asarray(pow_req, dtype=float)
+        pow_req_ref = np.asarray(pow_req_ref, dtype=float)
+        avg_acc_ref = np.asarray(avg_acc_ref, dtype=float)
+        selected = np.zeros(pow_req_ref.shape, dtype=np.int64)
+        best = np.full(pow_req_ref.shape, -np.inf)
+        for k in range(len(buyer_ids)):
+            priorities = (self.w1[None, :] * (pow_req[:, k:k + 1] / pow_req_ref)) + \
+                (self.w2[None, :] * (avg_acc[None, :, k] / avg_acc_ref)) - (self.w3 * (1.0 - success_ratio[:, k]))[None, :]
+            # NaN priorities are never selected
+            better = priorities > best
+            selected[better] = k
+            best[better] = priorities[better]
+        return np.where(best > -np.inf, selected, -1)
+
+    def compute_start_prices(self, avg_acc, avg_rej, success_ratio, last_accepted, has_record, rows):
+        """
+        Apply the price strategy of Bidder.build_offer to the statistics of the given bidders (rows).
+        """
+        gamma = self.gamma[rows]
+        p_start = np.where(avg_acc > 0, avg_acc, np.where(avg_rej > 0, avg_rej, 1.0))
+        p_start = np.where(success_ratio > 0.7, p_start * (1.0 + gamma * 0.5),
+                           np.where(success_ratio < 0.3, p_start * (1.0 - gamma * 0.5), p_start))
+        p_start = np.where(has_record & last_accepted, p_start + gamma * self.alpha[rows], p_start)
+        p_start = np.where(has_record & ~last_accepted, p_start - gamma * self.beta[rows], p_start)
+        return np.where(p_start > 0.01, p_start, 0.01)
+
+    def get_offer_prices(self, buyer_ids, stats=None):
+        """
+        Return the prices every bidder would offer to every buyer, see Bidder.build_offer.
+
+        :param buyer_ids: Identifiers of the buyers
+        :param stats: Result of get_buyer_stats with the current histories, computed if not given
+        :return: Array (bidder x buyer) of prices
+        """
+        columns = self.get_buyer_indexes(buyer_ids)
+        stats = self.get_buyer_stats() if stats is None else stats
+        avg_acc, avg_rej, success_ratio = (stat[:, columns] for stat in stats[:3])
+        last_accepted, has_record = (flag[:, columns] for flag in self.get_last_accepted())
+        return self.compute_start_prices(avg_acc, avg_rej, success_ratio, last_accepted, has_record,
+                                         np.arange(len(self.ids))[:, None])
+
+    def build_offers(self, buyer_ids, pow_bids):
+        """
+        Build the offers of all the bidders, see Bidder.build_offer.
+
+        :param buyer_ids: Identifier of the buyer selected by every bidder
+        :param pow_bids: Maximum power every bidder can offer
+        :return: (offer_prices, offer_powers) arrays
+        """
+        rows = np.arange(len(self.ids))
+        columns = self.get_buyer_indexes(buyer_ids)
+        avg_acc, avg_rej, success_ratio, _, _ = (stat[rows, columns] for stat in self.get_buyer_stats())
+        last_accepted, has_record = (flag[rows, columns] for flag in self.get_last_accepted())
+        p_start = self.compute_start_prices(avg_acc, avg_rej, success_ratio, last_accepted, has_record, rows)
+        return p_start, np.asarray(pow_bids, dtype=float).copy()
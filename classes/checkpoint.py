@@ -0,0 +1,203 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+
+import pandas as pd
+
+
+class CheckpointPickler(pickle.Pickler):
+    """
+    A pickler replacing the chunked dicts and the objects they own with references, see Checkpoint.
+    """
+
+    def __init__(self, file, buffer_callback):
+        super().__init__(file, protocol=5, buffer_callback=buffer_callback)
+        self.references = {}
+
+    def persistent_id(self, obj):
+        return self.references.get(id(obj))
+
+
+class CheckpointUnpickler(pickle.Unpickler):
+    """
+    An unpickler resolving the references of CheckpointPickler with the chunked dicts already loaded.
+    """
+
+    def __init__(self, file, chunked_dicts, buffers):
+        super().__init__(file, buffers=buffers)
+        self.chunked_dicts = chunked_dicts
+
+    def persistent_load(self, pid):
+        obj = self.chunked_dicts[pid[0]]
+        for key in pid[1:]:
+            obj = obj[key]
+        return obj
+
+
+class Checkpoint:
+    """
+    A class saving snapshots of a state (a dict of named objects) in a folder and loading them back.
+
+    The large append-mostly dicts of the state (e.g. the bids by time slot) listed as chunked are pickled as
+    lists of items of chunk_size keys, then every component of the state is pickled. Every piece has its own
+    pickle memo, so an old chunk produces the same bytes at every snapshot. The values of a chunked dict (and
+    the elements of the values that are lists) are owned by it: the pieces pickled later reference them by
+    (dict name, key[, position]), so the objects shared by several structures (e.g. a bid in the bid book and in
+    the bids of its time slot) keep their identity. Owners must be listed before the dicts referencing their
+    values, other objects shared by different pieces are copied. The NumPy arrays are stored out-of-band
+    (pickle protocol 5).
+
+    Every piece and every array buffer is a blob named by the SHA-256 hash of its content, hence a snapshot
+    only writes the blobs that changed since the previous one. The manifest listing the blobs of the last
+    snapshot is replaced atomically, then the unreferenced blobs are removed.
+    """
+
+    MANIFEST_FILE = 'manifest.json'
+    BLOBS_FOLDER = 'blobs'
+
+    def __init__(self, folder, chunk_size=96):
+        """
+        Initialize the checkpoint.
+
+        :param folder: Folder of the snapshots, created if needed
+        :param chunk_size: Number of keys of a chunk of the chunked dicts
+        """
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be a positive number of keys")
+        self.folder = folder
+        self.chunk_size = chunk_size
+        self.blobs_folder = os.path.join(folder, self.BLOBS_FOLDER)
+        os.makedirs(self.blobs_folder, exist_ok=True)
+
+    def exists(self):
+        """
+        Return True if a snapshot is available.
+        """
+        return os.path.exists(os.path.join(self.folder, self.MANIFEST_FILE))
+
+    # -------------------------------------------------------------------------
+    # Blobs
+    # -------------------------------------------------------------------------
+    def write_blob(self, data):
+        """
+        Write a blob if not already available, return its hash and whether it has been written.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        blob_file = os.path.join(self.blobs_folder, digest)
+        if os.path.exists(blob_file):
+            return digest, False
+        tmp_file = '%s.tmp' % blob_file
+        with open(tmp_file, 'wb') as bin_file:
+            bin_file.write(data)
+        os.replace(tmp_file, blob_file)
+        return digest, True
+
+    def read_blob(self, digest):
+        with open(os.path.join(self.blobs_folder, digest), 'rb') as bin_file:
+            return bin_file.read()
+
+    @staticmethod
+    def resolve(state, name):
+        """
+        Return the object of a dotted name, the first part is a key of the state and the other ones attributes.
+        """
+        parts = name.split('.')
+        obj = state[parts[0]]
+        for part in parts[1:]:
+            obj = getattr(obj, part)
+        return obj
+
+    # -------------------------------------------------------------------------
+    # Snapshots
+    # -------------------------------------------------------------------------
+    def save(self, state, step=None, chunked=()):
+        """
+        Save a snapshot of the state.
+
+        :param state: Dict of named objects
+        :param step: Progress of the state (e.g. the next slot to simulate), returned by load
+        :param chunked: Dotted names of the dicts to store in chunks (e.g. 'market_operator.bidder_bids')
+        :return: A dict with the number of blobs and of bytes written
+        """
+        chunked_dicts = {name: self.resolve(state, name) for name in chunked}
+        for name, chunked_dict in chunked_dicts.items():
+            if not isinstance(chunked_dict, dict):
+                raise ValueError("Chunked object %s is not a dict" % name)
+
+        buffers = []
+        stream = io.BytesIO()
+        pickler = CheckpointPickler(stream, buffers.append)
+        pickler.references.update({id(chunked_dict): (name,) for name, chunked_dict in chunked_dicts.items()})
+        manifest = {'step': step, 'saved_at': pd.Timestamp.now(tz='UTC').isoformat(), 'chunked': list(chunked),
+                    'pieces': [], 'buffers': []}
+        written = {'blobs': 0, 'bytes': 0}
+
+        def dump(kind, name, index, obj):
+            stream.seek(0)
+            stream.truncate()
+            pickler.clear_memo()
+            pickler.dump(obj)
+            digest, is_new = self.write_blob(stream.getvalue())
+            if is_new:
+                written['blobs'] += 1
+                written['bytes'] += stream.tell()
+            manifest['pieces'].append({'kind': kind, 'name': name, 'index': index, 'hash': digest})
+
+        for name, chunked_dict in chunked_dicts.items():
+            items = list(chunked_dict.items())
+            for k in range(0, len(items), self.chunk_size):
+                dump('chunk', name, k // self.chunk_size, items[k:k + self.chunk_size])
+            # The values (and the elements of the list values) are owned by this dict from now on
+            for key, value in items:
+                if isinstance(value, (dict, list)):
+                    pickler.references.setdefault(id(value), (name, key))
+                if isinstance(value, list):
+                    for position, element in enumerate(value):
+                        if isinstance(element, (dict, list)):
+                            pickler.references.setdefault(id(element), (name, key, position))
+        for name, obj in state.items():
+            dump('component', name, None, obj)
+
+        for buffer in buffers:
+            digest, is_new = self.write_blob(buffer.raw())
+            if is_new:
+                written['blobs'] += 1
+                written['bytes'] += buffer.raw().nbytes
+            manifest['buffers'].append(digest)
+
+        manifest_file = os.path.join(self.folder, self.MANIFEST_FILE)
+        tmp_file = '%s.tmp' % manifest_file
+        with open(tmp_file, 'w') as json_file:
+            json.dump(manifest, json_file)
+        os.replace(tmp_file, manifest_file)
+
+        # Remove the blobs of the previous snapshots
+        referenced = set(piece['hash'] for piece in manifest['pieces']) | set(manifest['buffers'])
+        for file_name in os.listdir(self.blobs_folder):
+            if file_name not in referenced:
+                os.remove(os.path.join(self.blobs_folder, file_name))
+        return written
+
+    def load(self):
+        """
+        Load the last snapshot.
+
+        :return: (state, step), see save
+        """
+        with open(os.path.join(self.folder, self.MANIFEST_FILE), 'r') as json_file:
+            manifest = json.load(json_file)
+
+        chunked_dicts = {name: {} for name in manifest['chunked']}
+        # The buffers are consumed in the order of the pieces, writable for the arrays
+        buffers = iter([bytearray(self.read_blob(digest)) for digest in manifest['buffers']])
+
+        state = {}
+        for piece in manifest['pieces']:
+            obj = CheckpointUnpickler(io.BytesIO(self.read_blob(piece['hash'])), chunked_dicts, buffers).load()
+            if piece['kind'] == 'chunk':
+                chunked_dicts[piece['name']].update(obj)
+            else:
+                state[piece['name']] = obj
+        return state, manifest['step']
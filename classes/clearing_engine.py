@@ -0,0 +1,214 @@
+import numpy as np
+
+
+def solve_payload(payload):
+    """
+    Worker entry point of ClearingEngine.solve_parallel: clear a chunk of time slots.
+
+    :param payload: Tuple (engine, columns), columns being the keyword arguments of ClearingEngine.solve
+    :return: The result of ClearingEngine.solve for the chunk
+    """
+    engine, columns = payload
+    return engine.solve(**columns)
+
+
+class ClearingEngine:
+    """
+    Array based pay-as-bid clearing kernel.
+
+    Bids and requests are passed as NumPy columns. The kernel sorts all the (request, bid) pairs by
+    (request, price, bid position) in a single pass, walks every merit order with a padded
+    accumulation instead of a Python loop, and computes allocations and rewards as array operations.
+    The sequential subtractions of the walk are reproduced exactly, so the results are identical to
+    the ones of MarketOperator's loop engine.
+    """
+
+    def __init__(self, alpha_rem, beta_rem, gamma_rem, threshold_rem, threshold_rem_bid_inf):
+        """
+        Initialize the engine with the remuneration parameters of the MarketOperator.
+        """
+        self.alpha_rem = alpha_rem
+        self.beta_rem = beta_rem
+        self.gamma_rem = gamma_rem
+        self.threshold_rem = threshold_rem
+        self.threshold_rem_bid_inf = threshold_rem_bid_inf
+
+    def calculate_rewards(self, price, bidded_flexibility, provided_flexibility, requested_flexibility):
+        """
+        Vectorized version of MarketOperator.calculate_reward, the operations are performed in the same order.
+
+        :param price: Array of prices offered by the bidders
+        :param bidded_flexibility: Array of flexibility amounts bidded by the bidders
+        :param provided_flexibility: Array of flexibility amounts actually provided by the bidders
+        :param requested_flexibility: Array of flexibility amounts requested by the buyers
+        :return: Array of rewards
+        """
+        base = np.minimum(requested_flexibility, provided_flexibility) * price
+        under_delivery_penalty = self.alpha_rem * np.maximum(requested_flexibility - provided_flexibility - (self.threshold_rem * requested_flexibility), 0) * price
+        over_delivery_adjustment = self.beta_rem * np.maximum(provided_flexibility - requested_flexibility - (self.threshold_rem * requested_flexibility), 0) * price
+        bid_inflation_penalty = self.gamma_rem * np.maximum(bidded_flexibility - requested_flexibility - (self.threshold_rem_bid_inf * bidded_flexibility), 0) * price
+
+        return base - under_delivery_penalty + over_delivery_adjustment - bid_inflation_penalty
+
+    def solve(self, bid_group, bid_price, bid_power, bid_flexibility, request_group, request_demand, request_wtp):
+        """
+        Clear a batch of time slots.
+
+        Bids and requests are matched through an integer group code identifying a (time_slot, buyer_id) couple.
+        Bids must be given in ingestion order, requests in the order they have been received, since the
+        positions are used to break the ties exactly as the loop engine does.
+
+        :param bid_group: Group code of every bid
+        :param bid_price: Price of every bid
+        :param bid_power: Power (bidded flexibility) of every bid
+        :param bid_flexibility: Real flexibility (baseline - actual) of every bid
+        :param request_group: Group code of every request
+        :param request_demand: Requested power of every request
+        :param request_wtp: Willingness to pay of every request
+        :return: A dict of arrays with the following keys:
+                   - pair_bid, pair_request: indexes of the bids/requests of the matched pairs, sorted by
+                     (request, price, bid position)
+                   - accepted: mask of the pairs where some power has been allocated
+                   - rejected: mask of the pairs visited by the merit order walk without allocation
+                   - allocated, remaining, reward: values of the pairs (meaningful only where accepted)
+                   - unfulfilled: unfulfilled demand of every request (NaN for requests with no demand)
+                   - bid_accepted: mask of the bids accepted by at least one request
+        """
+        bid_group = np.asarray(bid_group, dtype=np.int64)
+        bid_price = np.asarray(bid_price, dtype=float)
+        bid_power = np.asarray(bid_power, dtype=float)
+        bid_flexibility = np.asarray(bid_flexibility, dtype=float)
+        request_group = np.asarray(request_group, dtype=np.int64)
+        request_demand = np.asarray(request_demand, dtype=float)
+        request_wtp = np.asarray(request_wtp, dtype=float)
+
+        # Only the requests with a positive demand are cleared
+        active_requests = np.flatnonzero(request_demand > 0)
+        active_requests = active_requests[np.argsort(request_group[active_requests], kind='stable')]
+        active_groups = request_group[active_requests]
+
+        # Join every bid with all the active requests of its group
+        lo = np.searchsorted(active_groups, bid_group, side='left')
+        if np.all(active_groups[1:] != active_groups[:-1]):
+            # At most a request per group (e.g. a request per buyer and slot), a bid joins at most one request
+            matched = active_groups[np.minimum(lo, len(active_groups) - 1)] == bid_group if len(active_groups) > 0 \
+                else np.zeros(len(bid_group), dtype=bool)
+            pair_bid = np.flatnonzero(matched)
+            pair_request = active_requests[lo[pair_bid]]
+        else:
+            hi = np.searchsorted(active_groups, bid_group, side='right')
+            counts = hi - lo
+            pair_bid = np.repeat(np.arange(len(bid_group)), counts)
+            offsets = np.arange(len(pair_bid)) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_request = active_requests[np.repeat(lo, counts) + offsets]
+
+        # Discard the bids exceeding the willingness to pay and build the merit orders
+        valid = bid_price[pair_bid] <= request_wtp[pair_request]
+        pair_bid = pair_bid[valid]
+        pair_request = pair_request[valid]
+        order = np.lexsort((pair_bid, bid_price[pair_bid], pair_request))
+        pair_bid = pair_bid[order]
+        pair_request = pair_request[order]
+
+        # Position of every pair inside its merit order
+        n_pairs = len(pair_bid)
+        new_group = np.ones(n_pairs, dtype=bool)
+        new_group[1:] = pair_request[1:] != pair_request[:-1]
+        group_starts = np.flatnonzero(new_group)
+        group_lengths = np.diff(np.append(group_starts, n_pairs))
+        group_index = np.cumsum(new_group) - 1
+        position = np.arange(n_pairs) - group_starts[group_index]
+
+        # Walk the merit orders: the remaining demand is decreased only by the bids with a positive flexibility.
+        # np.subtract.accumulate is sequential, hence the remaining values match the loop engine bit for bit.
+        flexibility = bid_flexibility[pair_bid]
+        positive = flexibility > 0
+        max_length = group_lengths.max() if n_pairs > 0 else 0
+        walk = np.zeros((len(group_starts), max_length + 1))
+        walk[:, 0] = request_demand[pair_request[group_starts]]
+        walk[group_index, position + 1] = np.where(positive, flexibility, 0.0)
+        walk = np.subtract.accumulate(walk, axis=1)
+
+        remaining = walk[group_index, position]
+        visited = remaining > 0
+        accepted = visited & positive
+        rejected = visited & ~positive
+        allocated = np.where(accepted, np.minimum(flexibility, remaining), 0.0)
+        # Usually only a few pairs are accepted, the rewards are computed only for them
+        reward = np.zeros(n_pairs)
+        accepted_bid = pair_bid[accepted]
+        reward[accepted] = self.calculate_rewards(price=bid_price[accepted_bid],
+                                                  bidded_flexibility=bid_power[accepted_bid],
+                                                  provided_flexibility=flexibility[accepted],
+                                                  requested_flexibility=request_demand[pair_request[accepted]])
+
+        # When the demand is fully satisfied the loop engine ends with exactly 0.0
+        unfulfilled = np.full(len(request_group), np.nan)
+        unfulfilled[active_requests] = request_demand[active_requests]
+        last_remaining = walk[np.arange(len(group_starts)), group_lengths]
+        unfulfilled[pair_request[group_starts]] = np.where(last_remaining > 0, last_remaining, 0.0)
+
+        bid_accepted = np.zeros(len(bid_group), dtype=bool)
+        bid_accepted[accepted_bid] = True
+
+        return {
+            'pair_bid': pair_bid,
+            'pair_request': pair_request,
+            'accepted': accepted,
+            'rejected': rejected,
+            'allocated': allocated,
+            'remaining': remaining,
+            'reward': reward,
+            'unfulfilled': unfulfilled,
+            'bid_accepted': bid_accepted,
+        }
+
+    def solve_parallel(self, executor, workers, bid_slot, request_slot, bid_group, bid_price, bid_power,
+                       bid_flexibility, request_group, request_demand, request_wtp):
+        """
+        Clear a batch of time slots splitting it in chunks of consecutive slots solved by an executor
+        (e.g. a ProcessPoolExecutor). Time slots are independent, hence the merged result is the same of solve.
+
+        :param executor: A concurrent.futures executor
+        :param workers: Number of chunks
+        :param bid_slot: Non-decreasing slot index of every bid
+        :param request_slot: Non-decreasing slot index of every request
+        :return: The same dict of arrays returned by solve, see solve for the other parameters
+        """
+        bid_slot = np.asarray(bid_slot, dtype=np.int64)
+        request_slot = np.asarray(request_slot, dtype=np.int64)
+        columns = {
+            'bid_group': np.asarray(bid_group, dtype=np.int64),
+            'bid_price': np.asarray(bid_price, dtype=float),
+            'bid_power': np.asarray(bid_power, dtype=float),
+            'bid_flexibility': np.asarray(bid_flexibility, dtype=float),
+            'request_group': np.asarray(request_group, dtype=np.int64),
+            'request_demand': np.asarray(request_demand, dtype=float),
+            'request_wtp': np.asarray(request_wtp, dtype=float),
+        }
+
+        # Cut the slots in chunks with (about) the same number of bids and requests
+        n_slots = max(bid_slot.max(initial=-1), request_slot.max(initial=-1)) + 1
+        if n_slots == 0:
+            return self.solve(**columns)
+        weights = np.cumsum(np.bincount(bid_slot, minlength=n_slots) + np.bincount(request_slot, minlength=n_slots))
+        n_chunks = min(workers, n_slots)
+        cuts = np.searchsorted(weights, weights[-1] * np.arange(1, n_chunks) / n_chunks, side='left') + 1
+        cuts = np.unique(np.concatenate([[0], cuts, [n_slots]]))
+        bid_cuts = np.searchsorted(bid_slot, cuts, side='left')
+        request_cuts = np.searchsorted(request_slot, cuts, side='left')
+
+        payloads = []
+        for k in range(len(cuts) - 1):
+            bids = slice(bid_cuts[k], bid_cuts[k + 1])
+            requests = slice(request_cuts[k], request_cuts[k + 1])
+            payloads.append((self, {name: values[bids if name.startswith('bid_') else requests]
+                                    for name, values in columns.items()}))
+        results = list(executor.map(solve_payload, payloads))
+
+        # Merge the chunks in slot order, moving the local indexes to the batch ones
+        merged = {name: np.concatenate([result[name] for result in results]) for name in results[0].keys()}
+        merged['pair_bid'] = np.concatenate([result['pair_bid'] + bid_cuts[k] for k, result in enumerate(results)])
+        merged['pair_request'] = np.concatenate([result['pair_request'] + request_cuts[k]
+                                                 for k, result in enumerate(results)])
+        return merged
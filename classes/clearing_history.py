@@ -0,0 +1,177 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+ALLOCATION_COLUMNS = ['time_slot', 'bidder_id', 'buyer_id', 'requested_flexibility', 'bidded_flexibility',
+                      'provided_flexibility', 'allocated_flexibility', 'baseline_value', 'actual_value',
+                      'remaining_demand', 'price', 'reward']
+DEMAND_COLUMNS = ['time_slot', 'buyer_id', 'unfulfilled_demand']
+TABLES = {'allocations': ALLOCATION_COLUMNS, 'demands': DEMAND_COLUMNS}
+SEGMENT_FORMATS = ('csv', 'parquet')
+
+class ClearingHistory:
+    """
+    A class storing the clearing results in columnar record batches with bounded memory.
+
+    Two tables are kept: 'allocations' (one row per allocation) and 'demands' (the unfulfilled demand of every
+    cleared request). Only the most recent `hot_window` time slots are kept in memory, as the nested per-slot
+    results used by MarketOperator.clearing_results_history; their columns are built from them when queried or
+    flushed, so that the results are stored once. Older slots are flushed in CSV (or Parquet) segments, whose
+    time range and bidders are indexed so that the queries read only the relevant segments. A time slot cleared
+    again replaces its previous results.
+    """
+
+    def __init__(self, hot_window=None, segments_folder=None, segment_slots=None, segment_format='csv'):
+        """
+        Initialize an empty history.
+
+        :param hot_window: Number of most recent time slots kept in memory, None to keep everything
+        :param segments_folder: Folder of the segments, if None the slots leaving the hot window are discarded
+        :param segment_slots: Number of time slots flushed in every segment, hot_window by default
+        :param segment_format: 'csv' or 'parquet' (requires pyarrow)
+        """
+        if segment_format not in SEGMENT_FORMATS:
+            raise ValueError("Segment format must be one of %s" % (SEGMENT_FORMATS,))
+        if segment_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+            raise ValueError("Parquet segments require the pyarrow package")
+        if hot_window is not None and hot_window < 1:
+            raise ValueError("Hot window must be a positive number of time slots")
+        self.hot_window = hot_window
+        self.segments_folder = segments_folder
+        self.segment_slots = segment_slots if segment_slots is not None else hot_window
+        self.segment_format = segment_format
+        if segments_folder is not None:
+            os.makedirs(segments_folder, exist_ok=True)
+
+        # Hot data
+        self.results = {}
+
+        # Metadata of the flushed segments
+        self.segments = []
+        # Flushed time slots cleared again -> number of segments whose rows of the slot are out of date
+        self.replaced_slots = {}
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+    def add_results(self, clearing_results):
+        """
+        Append the results of a clearing.
+
+        :param clearing_results: Dictionary time_slot -> list of per-buyer results, as produced by
+                                 MarketOperator.pay_as_bid_market_solving
+        """
+        for time_slot, results in clearing_results.items():
+            if time_slot not in self.results and len(self.segments) > 0 and \
+                    time_slot <= self.segments[-1]['last_slot']:
+                self.replaced_slots[time_slot] = len(self.segments)
+            self.results[time_slot] = results
+
+        if self.hot_window is not None and len(self.results) >= self.hot_window + self.segment_slots:
+            self.flush(len(self.results) - self.hot_window)
+
+    def flush(self, n_slots=None):
+        """
+        Move the oldest hot time slots out of memory, writing them in a new segment if a folder is configured.
+
+        :param n_slots: Number of time slots to flush, all the hot ones if None
+        """
+        hot_slots = sorted(self.results.keys())
+        cold_slots = hot_slots if n_slots is None else hot_slots[:n_slots]
+        if len(cold_slots) == 0:
+            return
+        last_cold_slot = cold_slots[-1]
+
+        if self.segments_folder is not None:
+            segment = {'first_slot': cold_slots[0], 'last_slot': last_cold_slot, 'files': {}, 'bidder_ids': set()}
+            for name in TABLES:
+                df = pd.DataFrame(self.get_hot_table(name, cold_slots))
+                if len(df) == 0:
+                    continue
+                file_name = os.path.join(self.segments_folder, '%s_%05d.%s' % (name, len(self.segments),
+                                                                               self.segment_format))
+                if self.segment_format == 'parquet':
+                    df.to_parquet(file_name, index=False)
+                else:
+                    df.to_csv(file_name, index=False)
+                segment['files'][name] = file_name
+                if name == 'allocations':
+                    segment['bidder_ids'] = set(df['bidder_id'])
+            self.segments.append(segment)
+
+        for time_slot in cold_slots:
+            del self.results[time_slot]
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+    def get_hot_table(self, table, time_slots=None):
+        """
+        Return the columns of a table for hot time slots.
+
+        :param table: 'allocations' or 'demands'
+        :param time_slots: The hot time slots, all of them (in clearing order) if None
+        :return: A dict column -> list of values
+        """
+        columns = {column: [] for column in TABLES[table]}
+        for time_slot in (self.results.keys() if time_slots is None else time_slots):
+            for result in self.results[time_slot]:
+                if table == 'demands':
+                    columns['time_slot'].append(time_slot)
+                    columns['buyer_id'].append(result['buyer_id'])
+                    columns['unfulfilled_demand'].append(result['unfulfilled_demand'])
+                    continue
+                for allocation in result['allocations']:
+                    columns['time_slot'].append(time_slot)
+                    for column in ALLOCATION_COLUMNS[1:]:
+                        columns[column].append(allocation[column])
+        return columns
+
+    def read_segment(self, file_name):
+        if self.segment_format == 'parquet':
+            df = pd.read_parquet(file_name)
+        else:
+            df = pd.read_csv(file_name)
+        df['time_slot'] = pd.to_datetime(df['time_slot'])
+        return df
+
+    def query(self, table='allocations', bidder_id=None, start=None, end=None):
+        """
+        Return the rows of a table, optionally filtered by bidder and time range (inclusive).
+        Only the segments overlapping the filters are read.
+
+        :param table: 'allocations' or 'demands'
+        :param bidder_id: If given, only the rows of this bidder ('allocations' only)
+        :param start: If given, only the rows with time_slot >= start
+        :param end: If given, only the rows with time_slot <= end
+        :return: A DataFrame sorted by time slot (in clearing order within a time slot)
+        """
+        frames = []
+        for index, segment in enumerate(self.segments):
+            if table not in segment['files']:
+                continue
+            if start is not None and segment['last_slot'] < start:
+                continue
+            if end is not None and segment['first_slot'] > end:
+                continue
+            if bidder_id is not None and bidder_id not in segment['bidder_ids']:
+                continue
+            df = self.read_segment(segment['files'][table])
+            # The rows of the time slots cleared again after this segment was written are out of date
+            replaced = [time_slot for time_slot, n_segments in self.replaced_slots.items() if n_segments > index]
+            frames.append(df[~df['time_slot'].isin(replaced)] if len(replaced) > 0 else df)
+        frames.append(pd.DataFrame(self.get_hot_table(table)))
+        frames = [df for df in frames if len(df) > 0]
+        if len(frames) == 0:
+            return pd.DataFrame(columns=TABLES[table])
+        df = pd.concat(frames, ignore_index=True)
+
+        mask = pd.Series(True, index=df.index)
+        if bidder_id is not None:
+            mask &= df['bidder_id'] == bidder_id
+        if start is not None:
+            mask &= df['time_slot'] >= start
+        if end is not None:
+            mask &= df['time_slot'] <= end
+        return df[mask].sort_values('time_slot', kind='stable').reset_index(drop=True)
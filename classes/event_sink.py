@@ -0,0 +1,157 @@
+import collections
+import json
+import logging
+
+
+class NullSink:
+    """
+    An event sink discarding the events.
+
+    The components of the market emit structured events (a name and keyword fields) to a sink instead of
+    printing them. They check enabled before building the fields of an event, so a disabled sink costs an
+    attribute lookup per event.
+    """
+
+    enabled = False
+
+    def emit(self, event, **fields):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_SINK = NullSink()
+
+
+class RingBufferSink(NullSink):
+    """
+    An event sink keeping the last events in memory, as dicts with the 'event' name and the fields.
+    """
+
+    enabled = True
+
+    def __init__(self, capacity=10000):
+        """
+        Initialize an empty buffer.
+
+        :param capacity: Maximum number of events kept, the oldest ones are discarded (None keeps all of them)
+        """
+        if capacity is not None and capacity < 1:
+            raise ValueError("Capacity must be a positive number of events")
+        self.buffer = collections.deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def emit(self, event, **fields):
+        fields['event'] = event
+        self.buffer.append(fields)
+
+    def get_events(self, event=None):
+        """
+        Return the kept events, only the ones with the given name if event is not None.
+        """
+        return [record for record in self.buffer if event is None or record['event'] == event]
+
+    def clear(self):
+        self.buffer.clear()
+
+
+class JsonLinesSink(NullSink):
+    """
+    An event sink appending the events to a JSON lines file, one object per line.
+
+    The events are buffered and encoded in batches of batch_size events, so that the file is written once
+    per batch. Values not serializable to JSON (e.g. timestamps) are written as strings. The sink can be
+    pickled (e.g. by a Checkpoint): the pending events are written first and the file is opened again when
+    the next batch is flushed.
+    """
+
+    enabled = True
+
+    def __init__(self, file_name, batch_size=1000, mode='a'):
+        """
+        Initialize the sink.
+
+        :param file_name: JSON lines file
+        :param batch_size: Number of events buffered before writing them
+        :param mode: 'a' appends to an existing file, 'w' truncates it
+        """
+        if batch_size < 1:
+            raise ValueError("Batch size must be a positive number of events")
+        if mode not in ('a', 'w'):
+            raise ValueError("Mode must be 'a' or 'w'")
+        self.file_name = file_name
+        self.batch_size = batch_size
+        self.mode = mode
+        self.file = None
+        self.pending = []
+
+    def __getstate__(self):
+        self.flush()
+        state = self.__dict__.copy()
+        state['file'] = None
+        state['mode'] = 'a'
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def emit(self, event, **fields):
+        fields['event'] = event
+        self.pending.append(fields)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the pending events.
+        """
+        if len(self.pending) == 0:
+            return
+        if self.file is None:
+            self.file = open(self.file_name, self.mode)
+            self.mode = 'a'
+        self.file.write(''.join('%s\n' % json.dumps(record, default=str) for record in self.pending))
+        self.file.flush()
+        self.pending = []
+
+    def close(self):
+        """
+        Write the pending events and close the file.
+        """
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class LoggingSink(NullSink):
+    """
+    An event sink writing the events to a logger, enabled only if the logger handles the level of the events,
+    so that the quiet mode of the logging configuration also skips building the events.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        """
+        Initialize the sink.
+
+        :param logger: Logger, the root logger if None
+        :param level: Logging level of the events
+        """
+        self.logger = logger if logger is not None else logging.getLogger()
+        self.level = level
+
+    @property
+    def enabled(self):
+        return self.logger.isEnabledFor(self.level)
+
+    def emit(self, event, **fields):
+        self.logger.log(self.level, '%s: %s', event, fields, stacklevel=2)
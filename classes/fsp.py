@@ -65,15 +65,16 @@ class FSP(Player):
         from_str = slot_time_from.strftime('%Y-%m-%dT%H:%M:%SZ')
         to_str = slot_time_to.strftime('%Y-%m-%dT%H:%M:%SZ')
 
+        # The baselines of the portfolios are downloaded concurrently
+        endpoints = ['%s%s' % (self.nodes_interface.cfg['mainEndpoint'],
+                               'BaselineIntervals/portfoliobaseline?'
+                               'assetPortfolioId=%s&'
+                               'periodFrom=%s&'
+                               'periodTo=%s&'
+                               'resolutionInMinutes=%i' % (p_k, from_str, to_str, self.main_cfg['fm']['granularity']))
+                     for p_k in self.portfolios.keys()]
         bs = {}
-        for p_k in self.portfolios.keys():
-            res = self.nodes_interface.get_request('%s%s' % (self.nodes_interface.cfg['mainEndpoint'],
-                                                             'BaselineIntervals/portfoliobaseline?'
-                                                             'assetPortfolioId=%s&'
-                                                             'periodFrom=%s&'
-                                                             'periodTo=%s&'
-                                                             'resolutionInMinutes=%i' % (p_k, from_str, to_str,
-                                                                                         self.main_cfg['fm']['granularity'])))
+        for p_k, res in zip(self.portfolios.keys(), self.get_requests(endpoints)):
             df = pd.DataFrame(res)
             df['periodFrom'] = pd.to_datetime(df['periodFrom'], utc=True).dt.strftime('%Y-%m-%dT%H:%M:%SZ')
             df.set_index('periodFrom', inplace=True)
@@ -97,9 +98,10 @@ class FSP(Player):
         for elem in self.get_assets_grid_assignments()['items']:
             tmp_assets_grid_assignments[elem['id']] = elem
 
-        tmp_assets_portfolios_assignments = {}
-        for p_k in self.portfolios.keys():
-            tmp_assets_portfolios_assignments[p_k] = self.get_assets_assigned_to_portfolio(p_k)
+        # The assignments of the portfolios are requested concurrently
+        responses = self.get_requests([self.get_assets_assigned_to_portfolio_endpoint(p_k)
+                                       for p_k in self.portfolios.keys()])
+        tmp_assets_portfolios_assignments = dict(zip(self.portfolios.keys(), responses))
 
         # Cycle over the portfolios that have at least an assignment
         # assets_portfolios_assignments = {}
@@ -132,9 +134,12 @@ class FSP(Player):
                                                          'AssetPortfolios?managedByOrganizationId=%s' % self.nodes_id))
         return res
 
+    def get_assets_assigned_to_portfolio_endpoint(self, portfolio_id):
+        return '%s%s' % (self.nodes_interface.cfg['mainEndpoint'],
+                         'assetportfolioassignments?assetPortfolioId=%s' % portfolio_id)
+
     def get_assets_assigned_to_portfolio(self, portfolio_id):
-        res = self.nodes_interface.get_request('%s%s' % (self.nodes_interface.cfg['mainEndpoint'],
-                                                         'assetportfolioassignments?assetPortfolioId=%s' % portfolio_id))
+        res = self.nodes_interface.get_request(self.get_assets_assigned_to_portfolio_endpoint(portfolio_id))
         return res
 
     def get_assets_grid_assignments(self):
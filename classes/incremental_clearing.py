@@ -0,0 +1,202 @@
+import bisect
+
+
+class IncrementalClearing:
+    """
+    A class maintaining the provisional allocations of the open time slots while requests, bids and actuals
+    arrive, so that clearing a slot only has to emit the already computed allocations.
+
+    Every request (with a positive demand) keeps the walk of its merit order done by the loop engine: one step
+    per visited bid, with the remaining demand before the step. Since the merit order is walked by increasing
+    price, a new bid (or a new actual of a bidder) can only change the steps from its position onwards:
+    the prefix is kept and only the suffix is walked again. A bid falling after the point where the demand
+    was already satisfied costs a single bisection.
+
+    Rewards and accepted prices are written when the slot is cleared, in the same order of the loop engine,
+    hence the results are identical to MarketOperator.loop_market_solving.
+    """
+
+    def __init__(self, market_operator):
+        """
+        Initialize an empty state.
+
+        :param market_operator: The MarketOperator owning the bid book, the baselines and the actuals
+        """
+        self.market_operator = market_operator
+        # time_slot -> list of walks (None for the requests without demand), in request order
+        self.walks = {}
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
+    def add_request(self, time_slot, request_info):
+        """
+        Walk the merit order of a new request.
+        """
+        if time_slot not in self.walks:
+            self.walks[time_slot] = []
+        if request_info['requested_power'] <= 0:
+            self.walks[time_slot].append(None)  # Skipped by the clearing, as buyers with zero demand
+            return
+        walk = {'request': request_info, 'steps': [], 'remaining': request_info['requested_power']}
+        self.walks[time_slot].append(walk)
+        self.walk_from(time_slot, walk, 0)
+
+    def add_bid(self, time_slot, bid_info):
+        """
+        Update the walks of the requests of a buyer after a new bid was added to the bid book.
+        """
+        merit_order = self.market_operator.bid_book.merit_orders[time_slot][bid_info['buyer_id']]
+        # Position of the new bid, inserted after the bids with the same price
+        position = bisect.bisect_right(merit_order[0], bid_info['price']) - 1
+        for walk in self.walks.get(time_slot, []):
+            if walk is None or walk['request']['id'] != bid_info['buyer_id']:
+                continue
+            if bid_info['price'] > walk['request']['wtp']:
+                continue
+            if walk['remaining'] <= 0 and position >= len(walk['steps']):
+                continue  # The demand is satisfied before reaching the new bid
+            self.walk_from(time_slot, walk, position)
+
+    def add_bids(self, time_slots, bid_infos):
+        """
+        Update the walks after several bids were merged together into the bid book (BidBook.add_bids).
+
+        The positions of the new bids are only known in the final merit orders, hence every affected walk is
+        walked again once, from the first position of a new bid of its merit order.
+        """
+        groups = {}
+        for time_slot, bid_info in zip(time_slots, bid_infos):
+            groups.setdefault((time_slot, bid_info['buyer_id']), set()).add(bid_info['bid_id'])
+
+        for (time_slot, buyer_id), new_ids in groups.items():
+            prices, bid_ids = self.market_operator.bid_book.merit_orders[time_slot][buyer_id]
+            position = next(i for i, bid_id in enumerate(bid_ids) if bid_id in new_ids)
+            for walk in self.walks.get(time_slot, []):
+                if walk is None or walk['request']['id'] != buyer_id:
+                    continue
+                if prices[position] > walk['request']['wtp']:
+                    continue
+                if walk['remaining'] <= 0 and position >= len(walk['steps']):
+                    continue  # The demand is satisfied before reaching the new bids
+                self.walk_from(time_slot, walk, position)
+
+    def update_bidder(self, bidder_id, time_slot=None):
+        """
+        Update the walks visiting a bid of a bidder after its baseline or actual changed.
+
+        :param bidder_id: Identifier of the bidder
+        :param time_slot: The time slot of the new value, None if all the time slots could be affected
+        """
+        time_slots = list(self.walks.keys()) if time_slot is None else [time_slot]
+        bids = self.market_operator.bid_book.bids
+        for ts in time_slots:
+            for walk in self.walks.get(ts, []):
+                if walk is None:
+                    continue
+                for position, step in enumerate(walk['steps']):
+                    if bids[step[0]]['bidder_id'] == bidder_id:
+                        self.walk_from(ts, walk, position)
+                        break
+
+    def walk_from(self, time_slot, walk, position):
+        """
+        Walk again the merit order of a request starting from the given position.
+        """
+        market_operator = self.market_operator
+        request = walk['request']
+        steps = walk['steps']
+        remaining_demand = steps[position][2] if position < len(steps) else walk['remaining']
+        del steps[position:]
+
+        prices, bid_ids = market_operator.bid_book.merit_orders.get(time_slot, {}).get(request['id'], ([], []))
+        end = bisect.bisect_right(prices, request['wtp'])
+        for bid_id in bid_ids[position:end]:
+            bid = market_operator.bid_book.bids[bid_id]
+            baseline_value = market_operator.get_bidder_baseline(bid['bidder_id'], time_slot)
+            actual_value = market_operator.get_bidder_actual(bid['bidder_id'], time_slot)
+            real_flexibility = baseline_value - actual_value
+
+            allocated_power = min(real_flexibility, remaining_demand)
+            if allocated_power > 0:
+                reward = market_operator.calculate_reward(price=bid['price'],
+                                                          bidded_flexibility=bid['power'],
+                                                          provided_flexibility=real_flexibility,
+                                                          requested_flexibility=request['requested_power'])
+                steps.append((bid_id, {
+                    'bidder_id': bid['bidder_id'],
+                    'buyer_id': request['id'],
+                    'requested_flexibility': request['requested_power'],
+                    'bidded_flexibility': bid['power'],
+                    'provided_flexibility': real_flexibility,
+                    'allocated_flexibility': allocated_power,
+                    'baseline_value': baseline_value,
+                    'actual_value': actual_value,
+                    'remaining_demand': remaining_demand,
+                    'price': bid['price'],
+                    'reward': reward
+                }, remaining_demand))
+                remaining_demand -= allocated_power
+                if remaining_demand <= 0:
+                    break  # Demand is fully satisfied
+            else:
+                steps.append((bid_id, None, remaining_demand))
+        walk['remaining'] = remaining_demand
+
+    # -------------------------------------------------------------------------
+    # Results
+    # -------------------------------------------------------------------------
+    def get_allocations(self, time_slot):
+        """
+        Return the provisional clearing results of an open time slot, without clearing it.
+        """
+        return [{'buyer_id': walk['request']['id'],
+                 'allocations': [step[1] for step in walk['steps'] if step[1] is not None],
+                 'unfulfilled_demand': walk['remaining']}
+                for walk in self.walks.get(time_slot, []) if walk is not None]
+
+    def clear(self, time_slots_to_clear):
+        """
+        Clear the given time slots emitting their current walks and discard their state.
+        Return the clearing results, the accepted bids and the non-accepted bids for each time slot.
+        """
+        market_operator = self.market_operator
+        bids = market_operator.bid_book.bids
+        accepted_bids = {}
+        non_accepted_bids = {}
+        clearing_results = {}
+
+        for time_slot in time_slots_to_clear:
+            clearing_results[time_slot] = []
+            accepted_bids[time_slot] = []
+            non_accepted_bids[time_slot] = []
+            accepted_bid_ids = set()
+
+            for walk in self.walks.pop(time_slot, []):
+                if walk is None:
+                    continue
+                allocations = []
+                for bid_id, allocation, _ in walk['steps']:
+                    bid = bids[bid_id]
+                    if allocation is not None:
+                        bid['reward'] = allocation['reward']
+                        allocations.append(allocation)
+                        accepted_bids[time_slot].append(bid)
+                        accepted_bid_ids.add(bid_id)
+                        market_operator.accepted_prices.append(bid['price'])
+                    else:
+                        non_accepted_bids[time_slot].append(bid)
+                clearing_results[time_slot].append({
+                    'buyer_id': walk['request']['id'],
+                    'allocations': allocations,
+                    'unfulfilled_demand': walk['remaining']
+                })
+
+            # Add remaining non-accepted bids
+            for bid in market_operator.bidder_bids.get(time_slot, []):
+                if bid['bid_id'] not in accepted_bid_ids:
+                    non_accepted_bids[time_slot].append(bid)
+
+            market_operator.tag_time_slot_as_cleared(time_slot)
+
+        return clearing_results, accepted_bids, non_accepted_bids
@@ -1,5 +1,32 @@
+import bisect
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
+from classes.bid_book import BidBook
+from classes.clearing_engine import ClearingEngine
+from classes.clearing_history import ClearingHistory
+from classes.event_sink import NULL_SINK
+from classes.incremental_clearing import IncrementalClearing
+from classes.rolling_statistics import RollingStatistics
+from classes.slot_store import SlotStore
+
+CLEARING_ENGINES = ('loop', 'vectorized', 'incremental')
+
+def table_to_dataframe(table):
+    """
+    Return a tabular input (pandas DataFrame, NumPy record/structured array or Arrow table) as a DataFrame.
+    """
+    if isinstance(table, pd.DataFrame):
+        return table
+    if isinstance(table, np.ndarray) and table.dtype.names is not None:
+        return pd.DataFrame(table)
+    if hasattr(table, 'to_pandas'):
+        return table.to_pandas()
+    raise ValueError("Table must be a DataFrame, a record array or an Arrow table")
+
+
 class MarketOperator:
     """
     A class representing the market operator that:
@@ -9,10 +36,38 @@ class MarketOperator:
       4) Settles/Remunerates based on the approach described in the attached PDF (Chapter 4).
     """
 
-    def __init__(self, alpha_rem, beta_rem, gamma_rem, threshold_rem, threshold_rem_bid_inf, power_ref, price_ref):
+    def __init__(self, alpha_rem, beta_rem, gamma_rem, threshold_rem, threshold_rem_bid_inf, power_ref, price_ref,
+                 clearing_engine='loop', slot_resolution='15min', statistics_window=672, history_hot_window=None,
+                 history_folder=None, clearing_workers=None, event_sink=None):
         """
         Initialize the MarketOperator with remuneration parameters.
+
+        The clearing_engine parameter selects how the market is solved: 'loop' walks the bids of every
+        request in Python, 'vectorized' uses the array based ClearingEngine and returns identical results,
+        'incremental' keeps the allocations of the open time slots up to date as requests, bids, baselines and
+        actuals arrive (see IncrementalClearing), so that clearing only emits them.
+        The slot_resolution parameter is the duration of a time slot, used to index baselines and actuals: their
+        time slots must be datetime-like and aligned to it (see SlotStore), other keys are rejected.
+        The statistics_window parameter is the number of last values kept for the average_last_n_* methods, a
+        larger N averages all the values if there are not more, otherwise the last statistics_window ones.
+        The history_hot_window parameter is the number of most recent cleared time slots kept in
+        clearing_results_history (None keeps all of them), the older ones are spilled as segments in
+        history_folder (if given) and can be read with clearing_history.query.
+        The clearing_workers parameter ('vectorized' engine only) is the number of worker processes clearing
+        a batch of time slots in parallel, None (or 1) clears in the current process. Call close to release them.
+        The event_sink parameter receives the 'request', 'bid' and 'clearing_result' events (see
+        classes.event_sink), None discards them.
         """
+        if clearing_engine not in CLEARING_ENGINES:
+            raise ValueError("Clearing engine must be one of %s" % (CLEARING_ENGINES,))
+        if clearing_workers is not None and clearing_workers > 1 and clearing_engine != 'vectorized':
+            raise ValueError("Parallel clearing is available only with the 'vectorized' engine")
+        self.clearing_engine = clearing_engine
+        self.clearing_workers = clearing_workers
+        self.clearing_executor = None
+        self.event_sink = event_sink if event_sink is not None else NULL_SINK
+        self.engine = ClearingEngine(alpha_rem, beta_rem, gamma_rem, threshold_rem, threshold_rem_bid_inf)
+
         self.alpha_rem = alpha_rem
         self.beta_rem = beta_rem
         self.gamma_rem = gamma_rem
@@ -23,6 +78,9 @@ class MarketOperator:
         self.buyer_requests = {}
         self.bidder_bids = {}
 
+        # Bids indexed by (time_slot, buyer_id) and sorted by price
+        self.bid_book = BidBook()
+
         # Data structures for accepted outcomes (post market-solving)
         self.time_slot_data = {}
         self.time_slot_baseline = {}
@@ -32,21 +90,27 @@ class MarketOperator:
         self.power_ref = power_ref
         self.price_ref = price_ref
 
-        # Fields to store the accepted prices and requested powers
-        self.requested_powers = []
-        self.accepted_prices = []
+        # Rolling statistics of the requested powers and of the accepted prices (bounded memory)
+        self.requested_powers = RollingStatistics(statistics_window)
+        self.accepted_prices = RollingStatistics(statistics_window)
 
-        # Store time slots that have been cleared
+        # Store time slots that have been cleared, and the sorted time slots with requests still to clear
         self.cleared_time_slots = set()
+        self.open_time_slots = []
 
-        # Store bidder baselines
-        self.bidder_baselines = {}
+        # Provisional allocations of the open time slots, maintained only by the incremental engine
+        self.incremental_clearing = IncrementalClearing(self) if clearing_engine == 'incremental' else None
+
+        # Store bidder baselines, with the number of updates that changed the values of every bidder
+        self.bidder_baselines = SlotStore(resolution=slot_resolution)
+        self.baseline_versions = {}
 
         # Store bidder actuals
-        self.bidder_actuals = {}
+        self.bidder_actuals = SlotStore(resolution=slot_resolution)
 
-        # Clearing results history
-        self.clearing_results_history = {}
+        # Clearing results history, clearing_results_history holds the time slots of the hot window
+        self.clearing_history = ClearingHistory(hot_window=history_hot_window, segments_folder=history_folder)
+        self.clearing_results_history = self.clearing_history.results
 
     # -------------------------------------------------------------------------
     # Receiving Buyer Requests and Bidder Bids
@@ -68,10 +132,16 @@ class MarketOperator:
                   ... (and any other relevant fields)
                 }
         """
+        if self.event_sink.enabled:
+            self.event_sink.emit('request', time_slot=time_slot, **request_info)
         self.requested_powers.append(request_info['requested_power'])
         if time_slot not in self.buyer_requests:
             self.buyer_requests[time_slot] = []
+            if not self.is_time_slot_cleared(time_slot):
+                bisect.insort(self.open_time_slots, time_slot)
         self.buyer_requests[time_slot].append(request_info)
+        if self.incremental_clearing is not None and not self.is_time_slot_cleared(time_slot):
+            self.incremental_clearing.add_request(time_slot, request_info)
 
     def receive_bid_from_bidder(self, time_slot, bid_info):
         """
@@ -90,10 +160,87 @@ class MarketOperator:
                   "utilization_price": <float>,
                   ... (and any other relevant fields)
                 }
+
+        Returns
+        -------
+        int
+            The stable identifier assigned to the bid (also stored in bid_info['bid_id']).
         """
+        bid_id = self.bid_book.add_bid(time_slot, bid_info)
+        if self.event_sink.enabled:
+            self.event_sink.emit('bid', time_slot=time_slot, **bid_info)
         if time_slot not in self.bidder_bids:
             self.bidder_bids[time_slot] = []
         self.bidder_bids[time_slot].append(bid_info)
+        if self.incremental_clearing is not None:
+            self.incremental_clearing.add_bid(time_slot, bid_info)
+        return bid_id
+
+    def receive_buyer_requests(self, requests):
+        """
+        Receive several Buyer requests at once, for one or many time slots.
+
+        Parameters
+        ----------
+        requests : pandas.DataFrame, record array or Arrow table
+            One row per request with the columns 'time_slot', 'id', 'requested_power' and 'wtp',
+            any other column is stored in the request dicts as well.
+        """
+        requests = table_to_dataframe(requests)
+        missing = {'time_slot', 'id', 'requested_power', 'wtp'}.difference(requests.columns)
+        if missing:
+            raise ValueError("Missing request columns: %s" % sorted(missing))
+        self.requested_powers.extend(requests['requested_power'].tolist())
+        fields = [column for column in requests.columns if column != 'time_slot']
+        values = [requests[field].tolist() for field in fields]
+        for time_slot, row in zip(requests['time_slot'], zip(*values)):
+            request_info = dict(zip(fields, row))
+            if self.event_sink.enabled:
+                self.event_sink.emit('request', time_slot=time_slot, **request_info)
+            if time_slot not in self.buyer_requests:
+                self.buyer_requests[time_slot] = []
+                if not self.is_time_slot_cleared(time_slot):
+                    bisect.insort(self.open_time_slots, time_slot)
+            self.buyer_requests[time_slot].append(request_info)
+            if self.incremental_clearing is not None and not self.is_time_slot_cleared(time_slot):
+                self.incremental_clearing.add_request(time_slot, request_info)
+
+    def receive_bids_from_table(self, bids):
+        """
+        Receive several bids at once, e.g. the offer table built by Bidder.build_offers.
+        The bids are merged into the merit orders once per (time_slot, buyer_id) couple.
+
+        Parameters
+        ----------
+        bids : pandas.DataFrame, record array or Arrow table
+            One row per bid with the columns 'time_slot', 'bidder_id', 'buyer_id', 'power' and 'price',
+            any other column is stored in the bid dicts as well.
+
+        Returns
+        -------
+        list
+            The identifiers assigned to the bids, in row order.
+        """
+        bids = table_to_dataframe(bids)
+        missing = {'time_slot', 'bidder_id', 'buyer_id', 'power', 'price'}.difference(bids.columns)
+        if missing:
+            raise ValueError("Missing bid columns: %s" % sorted(missing))
+        fields = [column for column in bids.columns if column != 'time_slot']
+        values = [bids[field].tolist() for field in fields]
+        time_slots = bids['time_slot'].tolist()
+        bid_infos = [dict(zip(fields, row)) for row in zip(*values)]
+
+        bid_ids = self.bid_book.add_bids(time_slots, bid_infos)
+        if self.event_sink.enabled:
+            for time_slot, bid_info in zip(time_slots, bid_infos):
+                self.event_sink.emit('bid', time_slot=time_slot, **bid_info)
+        for time_slot, bid_info in zip(time_slots, bid_infos):
+            if time_slot not in self.bidder_bids:
+                self.bidder_bids[time_slot] = []
+            self.bidder_bids[time_slot].append(bid_info)
+        if self.incremental_clearing is not None:
+            self.incremental_clearing.add_bids(time_slots, bid_infos)
+        return bid_ids
 
     def receive_baseline_from_bidder(self, time_slot, bidder_id, baseline_value):
         """
@@ -112,19 +259,42 @@ class MarketOperator:
         - accepted_bids: Dictionary of accepted bids for each time slot.
         - non_accepted_bids: Dictionary of non-accepted bids for each time slot.
         """
+        time_slots_to_clear = self.open_time_slots[-steps_to_clear:]
+
+        if self.clearing_engine == 'incremental':
+            clearing_results, accepted_bids, non_accepted_bids = self.incremental_clearing.clear(time_slots_to_clear)
+        elif self.clearing_engine == 'vectorized':
+            clearing_results, accepted_bids, non_accepted_bids = self.vectorized_market_solving(time_slots_to_clear)
+        else:
+            clearing_results, accepted_bids, non_accepted_bids = self.loop_market_solving(time_slots_to_clear)
+
+        if self.event_sink.enabled:
+            for time_slot, results in clearing_results.items():
+                for result in results:
+                    self.event_sink.emit('clearing_result', time_slot=time_slot, **result)
+
+        # Append the clearing_results to the history (and to clearing_results_history)
+        self.clearing_history.add_results(clearing_results)
+
+        return accepted_bids, non_accepted_bids
+
+    def loop_market_solving(self, time_slots_to_clear):
+        """
+        Solve the given time slots walking the merit order of every request in Python.
+        The merit orders come already sorted by price from the bid book.
+        Return the clearing results, the accepted bids and the non-accepted bids for each time slot.
+        """
         accepted_bids = {}
         non_accepted_bids = {}
         clearing_results = {}
 
-        time_slots_to_clear = [ts for ts in sorted(self.buyer_requests.keys()) if not self.is_time_slot_cleared(ts)][
-                              -steps_to_clear:]
-
         for time_slot in time_slots_to_clear:
             bids_list = self.bidder_bids.get(time_slot, [])
 
             clearing_results[time_slot] = []
             accepted_bids[time_slot] = []
             non_accepted_bids[time_slot] = []
+            accepted_bid_ids = set()
 
             for request in self.buyer_requests[time_slot]:
                 buyer_id = request['id']
@@ -134,8 +304,7 @@ class MarketOperator:
                 if demand <= 0:
                     continue  # Skip buyers with zero demand
 
-                buyer_bids = [bid for bid in bids_list if bid['buyer_id'] == buyer_id and bid['price'] <= max_price]
-                buyer_bids.sort(key=lambda x: x['price'])
+                buyer_bids = self.bid_book.get_merit_order(time_slot, buyer_id, max_price)
 
                 allocations = []
                 remaining_demand = demand
@@ -166,6 +335,7 @@ class MarketOperator:
                         })
                         remaining_demand -= allocated_power
                         accepted_bids[time_slot].append(bid)
+                        accepted_bid_ids.add(bid['bid_id'])
                         self.accepted_prices.append(bid['price'])
                         if remaining_demand <= 0:
                             break  # Demand is fully satisfied
@@ -180,21 +350,147 @@ class MarketOperator:
 
             # Add remaining non-accepted bids
             for bid in bids_list:
-                if bid not in accepted_bids[time_slot]:
+                if bid['bid_id'] not in accepted_bid_ids:
                     non_accepted_bids[time_slot].append(bid)
 
             # Tag the time slot as cleared
             self.tag_time_slot_as_cleared(time_slot)
 
-        for time_slot, results in clearing_results.items():
-            print(f"Clearing results for {time_slot}:")
-            for result in results:
-                print(result)
+        return clearing_results, accepted_bids, non_accepted_bids
+
+    def vectorized_market_solving(self, time_slots_to_clear):
+        """
+        Solve the given time slots with the array based ClearingEngine.
+        Bids, requests, baselines and actuals are collected as NumPy columns and all the slots are cleared in a
+        single pass. Return the same clearing results, accepted and non-accepted bids of loop_market_solving.
+        """
+        bids = []
+        requests = []
+        bids_per_slot = []
+        requests_per_slot = []
+        for time_slot in time_slots_to_clear:
+            slot_bids = self.bidder_bids.get(time_slot, [])
+            slot_requests = self.buyer_requests[time_slot]
+            bids.extend(slot_bids)
+            requests.extend(slot_requests)
+            bids_per_slot.append(len(slot_bids))
+            requests_per_slot.append(len(slot_requests))
+
+        bid_slot_index = np.repeat(np.arange(len(time_slots_to_clear)), bids_per_slot)
+        request_slot_index = np.repeat(np.arange(len(time_slots_to_clear)), requests_per_slot)
+        bid_slots = [time_slots_to_clear[i] for i in bid_slot_index]
+        bidder_ids = [bid['bidder_id'] for bid in bids]
+
+        # Group bids and requests by (time_slot, buyer_id)
+        buyer_codes, buyer_ids = pd.factorize(pd.Series([bid['buyer_id'] for bid in bids] +
+                                                        [request['id'] for request in requests], dtype=object))
+        bid_group = bid_slot_index * len(buyer_ids) + buyer_codes[:len(bids)]
+        request_group = request_slot_index * len(buyer_ids) + buyer_codes[len(bids):]
+
+        baseline_values = self.bidder_baselines.get_values(bidder_ids, bid_slots, default=0.0)
+        actual_values = self.bidder_actuals.get_values(bidder_ids, bid_slots, default=0.0)
+        real_flexibility = baseline_values - actual_values
+
+        columns = {
+            'bid_group': bid_group,
+            'bid_price': [bid['price'] for bid in bids],
+            'bid_power': [bid['power'] for bid in bids],
+            'bid_flexibility': real_flexibility,
+            'request_group': request_group,
+            'request_demand': [request['requested_power'] for request in requests],
+            'request_wtp': [request['wtp'] for request in requests],
+        }
+        if self.clearing_workers is not None and self.clearing_workers > 1 and len(time_slots_to_clear) > 1:
+            if self.clearing_executor is None:
+                self.clearing_executor = ProcessPoolExecutor(max_workers=self.clearing_workers)
+            result = self.engine.solve_parallel(self.clearing_executor, self.clearing_workers,
+                                                bid_slot=bid_slot_index, request_slot=request_slot_index, **columns)
+        else:
+            result = self.engine.solve(**columns)
+
+        # Only the pairs visited by the merit order walks produce an output
+        visited = np.flatnonzero(result['accepted'] | result['rejected'])
+        visited_request = result['pair_request'][visited]
+        first_pair = np.searchsorted(visited_request, np.arange(len(requests)), side='left').tolist()
+        last_pair = np.searchsorted(visited_request, np.arange(len(requests)), side='right').tolist()
+        pair_bid = result['pair_bid'][visited].tolist()
+        pair_accepted = result['accepted'][visited].tolist()
+        allocated = result['allocated'][visited].tolist()
+        remaining = result['remaining'][visited].tolist()
+        reward = result['reward'][visited].tolist()
+        unfulfilled = result['unfulfilled'].tolist()
+        baseline_values = baseline_values.tolist()
+        actual_values = actual_values.tolist()
+        real_flexibility = real_flexibility.tolist()
+
+        accepted_bids = {}
+        non_accepted_bids = {}
+        clearing_results = {}
+        for time_slot in time_slots_to_clear:
+            clearing_results[time_slot] = []
+            accepted_bids[time_slot] = []
+            non_accepted_bids[time_slot] = []
+
+        for r, request in enumerate(requests):
+            if not request['requested_power'] > 0:
+                continue  # Skip buyers with zero demand
+            time_slot = time_slots_to_clear[request_slot_index[r]]
+
+            allocations = []
+            for p in range(first_pair[r], last_pair[r]):
+                b = pair_bid[p]
+                bid = bids[b]
+                if pair_accepted[p]:
+                    bid['reward'] = reward[p]
+                    allocations.append({
+                        'bidder_id': bid['bidder_id'],
+                        'buyer_id': request['id'],
+                        'requested_flexibility': request['requested_power'],
+                        'bidded_flexibility': bid['power'],
+                        'provided_flexibility': real_flexibility[b],
+                        'allocated_flexibility': allocated[p],
+                        'baseline_value': baseline_values[b],
+                        'actual_value': actual_values[b],
+                        'remaining_demand': remaining[p],
+                        'price': bid['price'],
+                        'reward': bid['reward']
+                    })
+                    accepted_bids[time_slot].append(bid)
+                    self.accepted_prices.append(bid['price'])
+                else:
+                    non_accepted_bids[time_slot].append(bid)
+
+            clearing_results[time_slot].append({
+                'buyer_id': request['id'],
+                'allocations': allocations,
+                'unfulfilled_demand': unfulfilled[r]
+            })
+
+        # Add remaining non-accepted bids
+        for b in np.flatnonzero(~result['bid_accepted']).tolist():
+            non_accepted_bids[bid_slots[b]].append(bids[b])
+
+        for time_slot in time_slots_to_clear:
+            self.tag_time_slot_as_cleared(time_slot)
+
+        return clearing_results, accepted_bids, non_accepted_bids
 
-        # Append the clearing_results to clearing_results_history
-        self.clearing_results_history.update(clearing_results)
+    def __getstate__(self):
+        """
+        Return the state to pickle (e.g. for checkpoints), the worker processes of the parallel clearing are
+        restarted when needed.
+        """
+        state = self.__dict__.copy()
+        state['clearing_executor'] = None
+        return state
 
-        return accepted_bids, non_accepted_bids
+    def close(self):
+        """
+        Shut down the worker processes of the parallel clearing, if any.
+        """
+        if self.clearing_executor is not None:
+            self.clearing_executor.shutdown()
+            self.clearing_executor = None
 
     # -------------------------------------------------------------------------
     # (Optional) Helper Methods
@@ -227,19 +523,10 @@ class MarketOperator:
         """
         Compute and store the average historical power request among all Buyers.
 
-        This method loops through self.buyer_requests for all time slots,
-        collects the 'demand' values, and computes the average.
+        The global mean is maintained incrementally by the requested_powers statistics, every received
+        request contributes with its 'requested_power' value.
         """
-        demands = []
-        for time_slot, requests in self.buyer_requests.items():
-            for req in requests:
-                if "requested_power" in req:
-                    demands.append(req["requested_power"])
-
-        if len(demands) > 0:
-            self.power_ref = float(sum(demands)) / len(demands)
-        else:
-            self.power_ref = 0.0
+        self.power_ref = float(self.requested_powers.mean())
 
     def compute_price_ref(self):
         """
@@ -260,26 +547,38 @@ class MarketOperator:
         else:
             self.price_ref = 0.0
 
+    @staticmethod
+    def average_last_n(statistics, N):
+        """
+        Return the average of the last N values of a RollingStatistics, the average of all the values if N is
+        greater than their number. Only the last statistics_window values are kept, hence if N is between the
+        window and the number of values the average of the last statistics_window values is returned.
+        """
+        if N >= len(statistics):
+            return statistics.mean()
+        return statistics.mean_last(min(N, statistics.window))
+
     def average_last_n_requested_powers(self, N):
         """
         Return the average of the last N values in requested_powers.
         If N is greater than the length of requested_powers, return the average of all available values.
+        N is limited to the statistics window when more values are available (see average_last_n).
         """
-        if not self.requested_powers:
-            return 0.0
-        return sum(self.requested_powers[-N:]) / min(N, len(self.requested_powers))
+        return self.average_last_n(self.requested_powers, N)
 
     def average_last_n_accepted_prices(self, N):
         """
         Return the average of the last N values in accepted_prices.
         If N is greater than the length of accepted_prices, return the average of all available values.
+        N is limited to the statistics window when more values are available (see average_last_n).
         """
-        if not self.accepted_prices:
-            return 0.0
-        return sum(self.accepted_prices[-N:]) / min(N, len(self.accepted_prices))
+        return self.average_last_n(self.accepted_prices, N)
 
     def tag_time_slot_as_cleared(self, time_slot):
         self.cleared_time_slots.add(time_slot)
+        position = bisect.bisect_left(self.open_time_slots, time_slot)
+        if position < len(self.open_time_slots) and self.open_time_slots[position] == time_slot:
+            del self.open_time_slots[position]
 
     def is_time_slot_cleared(self, time_slot):
         return time_slot in self.cleared_time_slots
@@ -311,26 +610,50 @@ class MarketOperator:
         return base - under_delivery_penalty + over_delivery_adjustment - bid_inflation_penalty
 
     def store_bidder_baseline(self, bidder_id, baseline):
+        """
+        Store the baseline of a bidder, replacing the previous one.
+        The first column of the DataFrame is compared with the stored values and only the range of slots that
+        changed is written, in which case the baseline version of the bidder is increased.
+        Return the (first, last) time slots of the changed range, None if nothing changed.
+        """
         if isinstance(baseline, pd.DataFrame):
-            self.bidder_baselines[bidder_id] = baseline
+            changed_range = self.bidder_baselines.update_dataframe(bidder_id, baseline)
+            if changed_range is not None:
+                self.baseline_versions[bidder_id] = self.baseline_versions.get(bidder_id, 0) + 1
+                if self.incremental_clearing is not None:
+                    self.incremental_clearing.update_bidder(bidder_id)
+            return changed_range
         else:
             raise ValueError("Baseline must be a pandas DataFrame")
 
+    def store_bidder_baselines(self, baselines):
+        """
+        Store the baselines of several bidders at once, see store_bidder_baseline.
+
+        :param baselines: Either a wide DataFrame indexed by time slot with a column per bidder, or a long
+                          table (DataFrame, record array or Arrow table) with the columns 'bidder_id',
+                          'time_slot' and 'value'
+        :return: Dict bidder_id -> changed range (None if nothing changed)
+        """
+        baselines = table_to_dataframe(baselines)
+        if {'bidder_id', 'time_slot', 'value'}.issubset(baselines.columns):
+            baselines = baselines.pivot(index='time_slot', columns='bidder_id', values='value')
+        return {bidder_id: self.store_bidder_baseline(bidder_id, baselines[[bidder_id]].dropna())
+                for bidder_id in baselines.columns}
+
+    def get_baseline_version(self, bidder_id):
+        """
+        Return the number of updates that changed the baseline of a bidder (0 if never stored).
+        """
+        return self.baseline_versions.get(bidder_id, 0)
+
     def get_bidder_baseline(self, bidder_id, time_slot):
-        if bidder_id in self.bidder_baselines:
-            baseline = self.bidder_baselines[bidder_id]
-            if time_slot in baseline.index:
-                return baseline.loc[time_slot].values[0]
-        return 0.0  # Default value if the baseline is not available
+        return self.bidder_baselines.get_value(bidder_id, time_slot, default=0.0)
 
     def store_bidder_actual(self, bidder_id, time_slot, actual_value):
-        if bidder_id not in self.bidder_actuals:
-            self.bidder_actuals[bidder_id] = pd.DataFrame(columns=['actual_value'])
-        self.bidder_actuals[bidder_id].loc[time_slot] = actual_value
+        self.bidder_actuals.set_value(bidder_id, time_slot, actual_value)
+        if self.incremental_clearing is not None:
+            self.incremental_clearing.update_bidder(bidder_id, time_slot)
 
     def get_bidder_actual(self, bidder_id, time_slot):
-        if bidder_id in self.bidder_actuals:
-            actuals = self.bidder_actuals[bidder_id]
-            if time_slot in actuals.index:
-                return actuals.loc[time_slot].values[0]
-        return 0.0  # Default value if the actual value is not available
\ No newline at end of file
+        return self.bidder_actuals.get_value(bidder_id, time_slot, default=0.0)
@@ -0,0 +1,201 @@
+import numpy as np
+from classes.bidder_population import add_empty_column
+
+
+class MarketSimulation:
+    """
+    A class running the market simulation of sim01 on arrays.
+
+    Demand, baselines, bids and actual values are matrices (slot x buyer, bidder x slot). The slots are
+    simulated in chunks of clearing_steps slots: the histories of the bidders only change when the market is
+    cleared, so buyer selections and offer prices of a whole chunk are computed at once by a BidderPopulation,
+    the chunk is cleared by a ClearingEngine and the results of its last slot are fed back to the histories, as
+    sim01 does. The reference values (last requested powers, last accepted prices) are reproduced with the same
+    running totals of RollingStatistics, so the results are the ones of the per-object simulation.
+    """
+
+    def __init__(self, population, engine, buyer_ids, wtp, clearing_steps=24, bid_power_factor=0.8,
+                 actual_noise=0.1, reference_window=7):
+        """
+        Initialize the simulation.
+
+        :param population: BidderPopulation with the bidders
+        :param engine: ClearingEngine with the remuneration parameters of the market operator
+        :param buyer_ids: Identifiers of the buyers
+        :param wtp: Willingness to pay of every buyer
+        :param clearing_steps: Number of slots cleared together
+        :param bid_power_factor: Fraction of the baseline offered by the bidders
+        :param actual_noise: Standard deviation of the relative noise of the delivered flexibility
+        :param reference_window: Number of last requested powers and accepted prices of the reference values
+        """
+        if clearing_steps < 1:
+            raise ValueError("Clearing steps must be a positive number of slots")
+        self.population = population
+        self.engine = engine
+        self.buyer_ids = list(buyer_ids)
+        self.wtp = np.broadcast_to(np.asarray(wtp, dtype=float), len(self.buyer_ids))
+        self.clearing_steps = clearing_steps
+        self.bid_power_factor = bid_power_factor
+        self.actual_noise = actual_noise
+        self.reference_window = reference_window
+
+        # Results, per bidder and totals
+        n = len(population)
+        self.bidder_rewards = np.zeros(n)
+        self.bidder_accepted = np.zeros(n, dtype=np.int64)
+        self.bidder_not_accepted = np.zeros(n, dtype=np.int64)
+        self.allocated_flexibility = 0.0
+        self.provided_flexibility = 0.0
+        self.unfulfilled_demand = 0.0
+        self.cleared_slots = 0
+
+        # Running totals of the last reference_window accepted prices (and of the one before), the last one is
+        # the total of all the prices
+        self.accepted_totals = np.zeros(1)
+        self.accepted_count = 0
+
+    # -------------------------------------------------------------------------
+    # Reference values
+    # -------------------------------------------------------------------------
+    def get_requested_power_refs(self, demand):
+        """
+        Return the mean of the last reference_window requested powers seen at the beginning of every slot,
+        as MarketOperator.average_last_n_requested_powers (0.0 for the first slot).
+        """
+        totals = np.concatenate([[0.0], np.cumsum(demand.ravel())])
+        counts = np.arange(len(demand)) * demand.shape[1]
+        n = np.minimum(self.reference_window, counts)
+        return np.where(counts > 0, (totals[counts] - totals[counts - n]) / np.maximum(n, 1), 0.0)
+
+    def get_accepted_price_ref(self):
+        """
+        Return the mean of the last reference_window accepted prices, as
+        MarketOperator.average_last_n_accepted_prices.
+        """
+        if self.accepted_count == 0:
+            return 0.0
+        n = min(self.reference_window, self.accepted_count)
+        return float((self.accepted_totals[-1] - self.accepted_totals[-1 - n]) / n)
+
+    @staticmethod
+    def fill_references(values, current):
+        """
+        Return the references of the bidders in every slot, see Bidder.set_reference_values: a value replaces
+        the reference only if it is not 0.0.
+
+        :param values: Array (slot) of values
+        :param current: Array (bidder) of the references before the first slot
+        :return: Array (slot x bidder)
+        """
+        last = np.maximum.accumulate(np.where(values != 0.0, np.arange(len(values)), -1))
+        return np.where((last >= 0)[:, None], values[np.maximum(last, 0)][:, None], current[None, :])
+
+    @staticmethod
+    def get_last_reference(values):
+        """
+        Return the last value different from 0.0, 0.0 if none.
+        """
+        values = values[values != 0.0]
+        return float(values[-1]) if len(values) > 0 else 0.0
+
+    # -------------------------------------------------------------------------
+    # Simulation
+    # -------------------------------------------------------------------------
+    def run(self, demand, baselines, rng, clear_partial=False):
+        """
+        Simulate all the complete chunks of clearing_steps slots.
+
+        As in sim01, which clears the market only every clearing_steps slots, the slots of a trailing partial
+        chunk are not cleared (cleared_slots tells how many were), unless clear_partial is True: then they are
+        cleared together as a last shorter chunk.
+
+        :param demand: Array (slot x buyer) of requested powers
+        :param baselines: Array (bidder x slot) of baselines
+        :param rng: Numpy Generator of the noise, drawn slot by slot and bidder by bidder as in sim01
+        :param clear_partial: True to clear also the slots of a trailing partial chunk
+        :return: self
+        """
+        demand = np.asarray(demand, dtype=float)
+        baselines = np.asarray(baselines, dtype=float)
+        pow_req_refs = self.get_requested_power_refs(demand)
+        end = len(demand) if clear_partial else len(demand) - len(demand) % self.clearing_steps
+        for start in range(0, end, self.clearing_steps):
+            self.run_chunk(demand, baselines, pow_req_refs, start, rng, steps=min(self.clearing_steps, end - start))
+        return self
+
+    def run_chunk(self, demand, baselines, pow_req_refs, start, rng, steps=None):
+        """
+        Simulate and clear the chunk of slots beginning at start, of clearing_steps slots if steps is not given.
+        """
+        population = self.population
+        n_bidders = len(population)
+        n_buyers = len(self.buyer_ids)
+        steps = self.clearing_steps if steps is None else steps
+        chunk = slice(start, start + steps)
+
+        # STEP 3: Bidders select a buyer and build their offers, histories do not change within the chunk,
+        # hence their statistics are computed once
+        stats = population.get_buyer_stats(price_range=False)
+        pow_req_ref = self.fill_references(pow_req_refs[chunk], population.pow_req_ref)
+        acc_refs = np.full(steps, self.get_accepted_price_ref())
+        avg_acc_ref = self.fill_references(acc_refs, population.avg_acc_ref)
+        selected = population.select_buyers_batch(self.buyer_ids, demand[chunk], pow_req_ref, avg_acc_ref,
+                                                  stats=stats)
+        offer_prices = add_empty_column(population.get_offer_prices(self.buyer_ids, stats=stats))
+        population.set_reference_values(self.get_last_reference(pow_req_refs[chunk]),
+                                        self.get_last_reference(acc_refs))
+
+        slot_baselines = np.ascontiguousarray(baselines[:, chunk].T)
+        powers = slot_baselines * self.bid_power_factor
+        # Bidders without a selected buyer get the price of the padding column, flat indexes are faster
+        prices = offer_prices.ravel()[np.arange(n_bidders) * (n_buyers + 1) +
+                                      np.where(selected >= 0, selected, n_buyers)]
+
+        # STEP 4: Actual values
+        noise = rng.standard_normal((steps, n_bidders))
+        actuals = slot_baselines - powers * (1 + self.actual_noise * noise)
+        flexibility = slot_baselines - actuals
+
+        # STEP 6: Clearing, bids in ingestion order (slot by slot, bidder by bidder)
+        bids = np.flatnonzero(selected >= 0)
+        bid_slot, bid_bidder = np.divmod(bids, n_bidders)
+        bid_price = prices.ravel()[bids]
+        bid_flexibility = flexibility.ravel()[bids]
+        request_slot = np.repeat(np.arange(steps), n_buyers)
+        result = self.engine.solve(bid_group=bid_slot * n_buyers + selected.ravel()[bids],
+                                   bid_price=bid_price,
+                                   bid_power=powers.ravel()[bids],
+                                   bid_flexibility=bid_flexibility,
+                                   request_group=request_slot * n_buyers + np.tile(np.arange(n_buyers), steps),
+                                   request_demand=demand[chunk].ravel(),
+                                   request_wtp=np.tile(self.wtp, steps))
+
+        accepted = result['accepted']
+        accepted_bids = result['pair_bid'][accepted]
+        rejected_bids = result['pair_bid'][result['rejected']]
+        self.bidder_rewards += np.bincount(bid_bidder[accepted_bids], weights=result['reward'][accepted],
+                                           minlength=n_bidders)
+        self.bidder_accepted += np.bincount(bid_bidder[accepted_bids], minlength=n_bidders)
+        # As in MarketOperator, visited bids without flexibility are listed twice among the non-accepted ones
+        self.bidder_not_accepted += np.bincount(bid_bidder[rejected_bids], minlength=n_bidders) + \
+            np.bincount(bid_bidder[~result['bid_accepted']], minlength=n_bidders)
+        self.allocated_flexibility += float(result['allocated'][accepted].sum())
+        self.provided_flexibility += float(bid_flexibility[accepted_bids].sum())
+        self.unfulfilled_demand += float(np.nansum(result['unfulfilled']))
+        self.cleared_slots += steps
+
+        # The running totals are accumulated sequentially, as RollingStatistics does, only the last ones are kept
+        accepted_prices = bid_price[accepted_bids]
+        totals = np.cumsum(np.concatenate([self.accepted_totals[-1:], accepted_prices]))
+        self.accepted_totals = np.concatenate([self.accepted_totals, totals[1:]])[-(self.reference_window + 1):]
+        self.accepted_count += len(accepted_prices)
+
+        # Feedback of the results of the last slot of the chunk, as sim01 does
+        last = np.arange(np.searchsorted(bid_slot, steps - 1), len(bid_slot))
+        visits = np.bincount(rejected_bids, minlength=len(bid_slot))[last]
+        repeats = np.where(result['bid_accepted'][last], 1, 1 + visits)
+        last = np.repeat(last, repeats)
+        buyer_columns = np.array([population.add_buyer(buyer_id) for buyer_id in self.buyer_ids], dtype=np.int64)
+        population.update_history_at(bid_bidder[last], buyer_columns[selected[steps - 1, bid_bidder[last]]],
+                                     prices[steps - 1, bid_bidder[last]], powers[steps - 1, bid_bidder[last]],
+                                     result['bid_accepted'][last])
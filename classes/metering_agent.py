@@ -1,15 +1,39 @@
+import numpy as np
 import pandas as pd
 
+from classes.event_sink import NULL_SINK
+from classes.metering_archive import MeteringArchive
+from classes.slot_store import SlotStore
+
+METERING_BACKENDS = ('dataframe', 'array')
+
 class MeteringAgent:
     """
     A class to gather and store energy measures for each metering point.
     """
 
-    def __init__(self):
+    def __init__(self, backend='dataframe', slot_resolution='15min', retention_slots=None, archive_folder=None,
+                 event_sink=None):
         """
         Initialize the MeteringAgent with an empty dictionary to store energy measures.
+
+        :param backend: 'dataframe' stores a DataFrame per metering point, 'array' stores all the measures
+                        in a dense SlotStore (metering point x slot matrix, NaN for the missing values)
+        :param slot_resolution: Duration of a time slot, used by the 'array' backend
+        :param retention_slots: Number of most recent slots kept by the 'array' backend, None to keep all
+        :param archive_folder: If given ('array' backend only), every measure is also written in a memory-mapped
+                               MeteringArchive and the reads outside the retention window are served by it
+        :param event_sink: Sink of the 'energy_measure' events (see classes.event_sink), None discards them
         """
+        if backend not in METERING_BACKENDS:
+            raise ValueError("Backend must be one of %s" % (METERING_BACKENDS,))
+        if (retention_slots is not None or archive_folder is not None) and backend != 'array':
+            raise ValueError("Retention window and archive are available only with the 'array' backend")
+        self.backend = backend
         self.data = {}
+        self.store = SlotStore(resolution=slot_resolution, retention=retention_slots) if backend == 'array' else None
+        self.archive = MeteringArchive(archive_folder, slot_resolution) if archive_folder is not None else None
+        self.event_sink = event_sink if event_sink is not None else NULL_SINK
 
     def add_metering_point(self, metering_point_id):
         """
@@ -17,7 +41,9 @@ class MeteringAgent:
 
         :param metering_point_id: Identifier of the metering point
         """
-        if metering_point_id not in self.data:
+        if self.backend == 'array':
+            self.store.add_key(metering_point_id)
+        elif metering_point_id not in self.data:
             self.data[metering_point_id] = pd.DataFrame(columns=['energy'])
 
     def add_energy_measure(self, metering_point_id, time_slot, energy):
@@ -28,10 +54,65 @@ class MeteringAgent:
         :param time_slot: The time (or slot) of the energy measure
         :param energy: The energy measure to be added
         """
+        if self.event_sink.enabled:
+            self.event_sink.emit('energy_measure', metering_point_id=metering_point_id, time_slot=time_slot,
+                                 energy=energy)
+        if self.backend == 'array':
+            self.store.set_value(metering_point_id, time_slot, energy)
+            if self.archive is not None:
+                self.archive.write_value(metering_point_id, time_slot, energy)
+            return
         if metering_point_id not in self.data:
             self.add_metering_point(metering_point_id)
         self.data[metering_point_id].loc[time_slot, 'energy'] = energy
 
+    def add_energy_measures(self, df):
+        """
+        Bulk ingestion of energy measures.
+
+        :param df: Either a wide DataFrame indexed by time slot with a column per metering point, or a long
+                   DataFrame with the columns 'metering_point_id', 'time_slot' and 'energy'
+        """
+        if {'metering_point_id', 'time_slot', 'energy'}.issubset(df.columns):
+            metering_point_ids = df['metering_point_id'].tolist()
+            time_slots = df['time_slot']
+            energies = df['energy'].to_numpy(dtype=float)
+        else:
+            metering_point_ids = list(df.columns) * len(df)
+            time_slots = df.index.repeat(len(df.columns))
+            energies = df.to_numpy(dtype=float).ravel()
+
+        if self.backend == 'array':
+            if self.event_sink.enabled:
+                for metering_point_id, time_slot, energy in zip(metering_point_ids, time_slots, energies):
+                    self.event_sink.emit('energy_measure', metering_point_id=metering_point_id, time_slot=time_slot,
+                                         energy=float(energy))
+            self.store.set_points(metering_point_ids, time_slots, energies)
+            if self.archive is not None:
+                self.archive.write(metering_point_ids, time_slots, energies)
+            return
+        for metering_point_id, time_slot, energy in zip(metering_point_ids, time_slots, energies):
+            self.add_energy_measure(metering_point_id, time_slot, energy)
+
+    def get_energy_measure(self, metering_point_id, time_slot):
+        """
+        Get a single energy measure.
+
+        :param metering_point_id: Identifier of the metering point
+        :param time_slot: The time (or slot) of the energy measure
+        :return: The energy measure, or None if not available
+        """
+        if self.backend == 'array':
+            energy = self.store.get_value(metering_point_id, time_slot, default=None)
+            if energy is None and self.archive is not None:
+                energy = self.archive.read_value(metering_point_id, time_slot)
+                energy = None if np.isnan(energy) else energy
+            return energy
+        data = self.data.get(metering_point_id)
+        if data is None or time_slot not in data.index:
+            return None
+        return data.loc[time_slot, 'energy']
+
     def get_energy_data(self, metering_point_id):
         """
         Get the energy data for a specific metering point.
@@ -39,4 +120,51 @@ class MeteringAgent:
         :param metering_point_id: Identifier of the metering point
         :return: A DataFrame with the energy data for the specified metering point
         """
-        return self.data.get(metering_point_id, pd.DataFrame(columns=['energy']))
\ No newline at end of file
+        if self.backend == 'array':
+            return self.store.get_series(metering_point_id).dropna().to_frame('energy')
+        return self.data.get(metering_point_id, pd.DataFrame(columns=['energy']))
+
+    def get_energy_history(self, metering_point_id, start, end):
+        """
+        Get the archived energy measures of a metering point for the time slots in [start, end].
+
+        :param metering_point_id: Identifier of the metering point
+        :param start: First time slot
+        :param end: Last time slot
+        :return: A Series (NaN for the missing values), backed by the memory map when the window is in one month
+        """
+        if self.archive is None:
+            raise ValueError("Energy history is available only with an archive folder")
+        return self.archive.read(metering_point_id, start, end)
+
+    def get_metering_point_view(self, metering_point_id):
+        """
+        Get a zero-copy view of the energy measures of a metering point ('array' backend only).
+        The view covers the retained slots, from the oldest to the most recent one.
+
+        :param metering_point_id: Identifier of the metering point
+        :return: A NumPy array view
+        """
+        if self.backend != 'array':
+            raise ValueError("Views are available only with the 'array' backend")
+        return self.store.get_key_view(metering_point_id)
+
+    def get_slot_view(self, time_slot):
+        """
+        Get a zero-copy view of the energy measures of all the metering points for a time slot
+        ('array' backend only). The order of the values is given by get_metering_point_ids.
+
+        :param time_slot: The time (or slot) of the energy measures
+        :return: A NumPy array view, or None if the time slot is not available
+        """
+        if self.backend != 'array':
+            raise ValueError("Views are available only with the 'array' backend")
+        return self.store.get_slot_view(time_slot)
+
+    def get_metering_point_ids(self):
+        """
+        Get the identifiers of the metering points.
+        """
+        if self.backend == 'array':
+            return list(self.store.keys.keys())
+        return list(self.data.keys())
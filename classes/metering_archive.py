@@ -0,0 +1,235 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class MeteringArchive:
+    """
+    A class persisting energy measures on disk in memory-mapped monthly files.
+
+    Every month is stored in a <YYYY-MM>.npy file holding a (metering point x slot) float matrix, NaN for the
+    missing values. The rows are given by a small JSON index of the metering point identifiers. Reads are
+    served by the page cache: the history of a metering point inside a month is a zero-copy view of the
+    memory map, and reopening an existing archive only loads the index.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, folder, resolution='15min'):
+        """
+        Open (or create) an archive.
+
+        :param folder: Folder containing the archive
+        :param resolution: Duration of a time slot, must match the one of an existing archive
+        """
+        self.folder = folder
+        self.resolution = pd.Timedelta(resolution)
+        self.metering_points = {}
+        self.months = {}
+        os.makedirs(folder, exist_ok=True)
+
+        index_file = os.path.join(folder, self.INDEX_FILE)
+        if os.path.exists(index_file):
+            with open(index_file, 'r') as json_file:
+                index = json.load(json_file)
+            if pd.Timedelta(index['resolution']) != self.resolution:
+                raise ValueError("Archive %s has resolution %s" % (folder, index['resolution']))
+            for row, metering_point_id in enumerate(index['metering_points']):
+                self.metering_points[metering_point_id] = row
+        else:
+            self.save_index()
+
+    # -------------------------------------------------------------------------
+    # Index and files management
+    # -------------------------------------------------------------------------
+    def save_index(self):
+        """
+        Write the index atomically.
+        """
+        index_file = os.path.join(self.folder, self.INDEX_FILE)
+        tmp_file = '%s.tmp' % index_file
+        with open(tmp_file, 'w') as json_file:
+            json.dump({'resolution': str(self.resolution), 'metering_points': list(self.metering_points.keys())},
+                      json_file)
+        os.replace(tmp_file, index_file)
+
+    def add_metering_point(self, metering_point_id):
+        """
+        Add a metering point to the index (if not already available) and return its row.
+        """
+        if metering_point_id not in self.metering_points:
+            self.metering_points[metering_point_id] = len(self.metering_points)
+            self.save_index()
+        return self.metering_points[metering_point_id]
+
+    @staticmethod
+    def get_month_start(time_slot):
+        return pd.Timestamp(year=time_slot.year, month=time_slot.month, day=1, tz=time_slot.tz)
+
+    def get_month_file(self, month_start):
+        return os.path.join(self.folder, '%s.npy' % month_start.strftime('%Y-%m'))
+
+    def get_slots_in_month(self, month_start):
+        return (month_start + pd.DateOffset(months=1) - month_start) // self.resolution
+
+    def get_month(self, month_start, rows=0):
+        """
+        Return the memory map of a month with at least the given number of rows, creating or growing its file
+        if needed. Return None if the month does not exist and rows is 0.
+        """
+        key = month_start.strftime('%Y-%m')
+        month = self.months.get(key)
+        if month is None:
+            month_file = self.get_month_file(month_start)
+            if os.path.exists(month_file):
+                month = np.load(month_file, mmap_mode='r+')
+            elif rows == 0:
+                return None
+
+        if month is None or month.shape[0] < rows:
+            capacity = max(rows, 8) if month is None else max(rows, 2 * month.shape[0])
+            month_file = self.get_month_file(month_start)
+            tmp_file = '%s.tmp.npy' % month_file[:-len('.npy')]
+            grown = np.lib.format.open_memmap(tmp_file, mode='w+', dtype=np.float64,
+                                              shape=(capacity, self.get_slots_in_month(month_start)))
+            grown[:] = np.nan
+            if month is not None:
+                grown[:month.shape[0]] = month
+            grown.flush()
+            del grown
+            month = None
+            self.months.pop(key, None)
+            os.replace(tmp_file, month_file)
+            month = np.load(month_file, mmap_mode='r+')
+
+        self.months[key] = month
+        return month
+
+    def get_offsets_in_month(self, time_slots, month_start):
+        offsets, rest = np.divmod(pd.DatetimeIndex(time_slots).as_unit('ns').asi8 - month_start.value,
+                                  self.resolution.value)
+        if np.any(rest != 0):
+            raise ValueError("Time slots are not aligned to the resolution %s" % self.resolution)
+        return offsets
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+    def write(self, metering_point_ids, time_slots, values):
+        """
+        Store several (metering point, time slot, value) points.
+
+        :param metering_point_ids: Sequence of metering point identifiers
+        :param time_slots: Sequence of time slots, with the same length of metering_point_ids
+        :param values: Sequence of values, with the same length of metering_point_ids
+        """
+        time_slots = pd.DatetimeIndex(time_slots)
+        if len(time_slots) == 0:
+            return
+        codes, uniques = pd.factorize(pd.Series(metering_point_ids, dtype=object))
+        rows = np.array([self.add_metering_point(mp) for mp in uniques], dtype=np.int64)[codes]
+        values = np.asarray(values, dtype=float)
+
+        month_keys = time_slots.year * 12 + time_slots.month
+        for month_key in np.unique(month_keys):
+            mask = month_keys == month_key
+            month_start = self.get_month_start(time_slots[mask][0])
+            month = self.get_month(month_start, rows=len(self.metering_points))
+            month[rows[mask], self.get_offsets_in_month(time_slots[mask], month_start)] = values[mask]
+
+    def write_value(self, metering_point_id, time_slot, value):
+        """
+        Store a single value.
+        """
+        self.write([metering_point_id], [pd.Timestamp(time_slot)], [value])
+
+    def flush(self):
+        """
+        Flush the memory maps to disk.
+        """
+        for month in self.months.values():
+            month.flush()
+
+    def close(self):
+        """
+        Flush and release the memory maps.
+        """
+        self.flush()
+        self.months = {}
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+    def get_month_view(self, metering_point_id, month):
+        """
+        Return a zero-copy view of the values of a metering point for a whole month.
+
+        :param metering_point_id: Identifier of the metering point
+        :param month: Any time slot of the month
+        :return: A memory mapped NumPy array, or None if not available
+        """
+        month_start = self.get_month_start(pd.Timestamp(month))
+        data = self.get_month(month_start)
+        row = self.metering_points.get(metering_point_id)
+        # The rows of a month grow only when the month is written, later metering points may be missing
+        if data is None or row is None or row >= data.shape[0]:
+            return None
+        return data[row]
+
+    def read_value(self, metering_point_id, time_slot):
+        """
+        Return a single value, NaN if not available.
+        """
+        time_slot = pd.Timestamp(time_slot)
+        month_start = self.get_month_start(time_slot)
+        data = self.get_month(month_start)
+        row = self.metering_points.get(metering_point_id)
+        if data is None or row is None or row >= data.shape[0]:
+            return np.nan
+        return float(data[row, self.get_offsets_in_month([time_slot], month_start)[0]])
+
+    def read(self, metering_point_id, start, end):
+        """
+        Return the values of a metering point for the time slots in [start, end] as a Series.
+        The values are a zero-copy view when the window is inside a single month.
+        """
+        time_index = pd.date_range(start=pd.Timestamp(start), end=pd.Timestamp(end), freq=self.resolution)
+        row = self.metering_points.get(metering_point_id)
+        chunks = []
+        month_start = self.get_month_start(time_index[0]) if len(time_index) > 0 else None
+        while month_start is not None and month_start <= time_index[-1]:
+            next_month_start = month_start + pd.DateOffset(months=1)
+            month_index = time_index[(time_index >= month_start) & (time_index < next_month_start)]
+            data = self.get_month(month_start)
+            if len(month_index) > 0:
+                if data is None or row is None or row >= data.shape[0]:
+                    chunks.append(np.full(len(month_index), np.nan))
+                else:
+                    first = self.get_offsets_in_month(month_index[:1], month_start)[0]
+                    chunks.append(data[row, first:first + len(month_index)])
+            month_start = next_month_start
+        values = chunks[0] if len(chunks) == 1 else np.concatenate(chunks) if chunks else np.zeros(0)
+        return pd.Series(values, index=time_index, copy=False)
+
+    def read_slot(self, time_slot):
+        """
+        Return the values of all the metering points (in index order) for a time slot.
+        """
+        time_slot = pd.Timestamp(time_slot)
+        month_start = self.get_month_start(time_slot)
+        data = self.get_month(month_start)
+        values = np.full(len(self.metering_points), np.nan)
+        if data is not None:
+            n = min(len(self.metering_points), data.shape[0])
+            values[:n] = data[:n, self.get_offsets_in_month([time_slot], month_start)[0]]
+        return values
+
+    def get_months(self):
+        """
+        Return the months available in the archive, as sorted 'YYYY-MM' strings.
+        """
+        return sorted(os.path.basename(f)[:-len('.npy')] for f in glob.glob(os.path.join(self.folder, '*.npy'))
+                      if not f.endswith('.tmp.npy'))
@@ -0,0 +1,80 @@
+# import section
+import asyncio
+
+
+class AsyncNODESInterface:
+    """
+    Asyncio NODES interface class, with the request methods of NODESInterface as coroutines.
+
+    Every request is sent by the wrapped NODESInterface (same token, pooled session and retries) in a worker
+    thread, at most max_concurrency at the same time, so that many independent calls (e.g. one per portfolio)
+    wait about as long as the slowest of them instead of the sum of all of them.
+    """
+    def __init__(self, nodes_interface, max_concurrency=None):
+        """
+        Constructor
+        :param nodes_interface: NODES interface sending the requests
+        :type nodes_interface: NODESInterface object
+        :param max_concurrency: Maximum number of requests sent at the same time, if None the setting
+                                'maxConcurrentRequests' of the NODES configuration (default 8). It should not exceed
+                                the connections kept per host by the session ('poolMaxSize')
+        :type max_concurrency: int
+        """
+        if max_concurrency is None:
+            max_concurrency = nodes_interface.cfg.get('maxConcurrentRequests', 8)
+        if max_concurrency < 1:
+            raise ValueError("Maximum concurrency must be a positive number of requests")
+        self.nodes_interface = nodes_interface
+        self.max_concurrency = max_concurrency
+        self.semaphores = {}
+
+    def get_semaphore(self):
+        """
+        Return the semaphore bounding the requests of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self.semaphores:
+            # Semaphores of closed loops are not needed anymore
+            self.semaphores = {k: v for k, v in self.semaphores.items() if not k.is_closed()}
+            self.semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphores[loop]
+
+    async def send(self, function, *args):
+        async with self.get_semaphore():
+            return await asyncio.to_thread(function, *args)
+
+    async def get_request(self, endpoint):
+        return await self.send(self.nodes_interface.get_request, endpoint)
+
+    async def delete_request(self, endpoint):
+        return await self.send(self.nodes_interface.delete_request, endpoint)
+
+    async def post_csv_file_request(self, endpoint, tmp_baseline_file):
+        return await self.send(self.nodes_interface.post_csv_file_request, endpoint, tmp_baseline_file)
+
+    async def post_request(self, endpoint, data):
+        return await self.send(self.nodes_interface.post_request, endpoint, data)
+
+    async def patch_request(self, endpoint, data):
+        return await self.send(self.nodes_interface.patch_request, endpoint, data)
+
+    async def get_requests(self, endpoints):
+        """
+        Send GET requests concurrently.
+        :param endpoints: Endpoints to get
+        :type endpoints: list
+        :return: The responses (False for the failed requests), in the order of the endpoints
+        :rtype: list
+        """
+        return await asyncio.gather(*[self.get_request(endpoint) for endpoint in endpoints])
+
+    async def post_csv_file_requests(self, requests):
+        """
+        Upload CSV files concurrently.
+        :param requests: (endpoint, file name) couples
+        :type requests: list
+        :return: The responses (False for the failed requests), in the order of the requests
+        :rtype: list
+        """
+        return await asyncio.gather(*[self.post_csv_file_request(endpoint, file_name)
+                                      for endpoint, file_name in requests])
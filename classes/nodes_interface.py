@@ -3,8 +3,18 @@ import json
 import requests
 import http
 import os
+import threading
 import time
 
+from requests.adapters import HTTPAdapter
+
+from classes.retry_policy import SUCCESS, FAIL, get_retry_policy
+from classes.token_cache import TokenCache
+
+# Pooled HTTP sessions shared by the NODESInterface instances of a process, see NODESInterface.get_session
+SESSIONS = {}
+SESSIONS_LOCK = threading.Lock()
+
 
 class NODESInterface:
     """
@@ -23,35 +33,91 @@ class NODESInterface:
         self.logger = logger
         self.token_data = None
         self.headers = None
+        self.player_cfg = None
+        self.token_cache = None
+        self.session = self.get_session(cfg)
+        self.retry_policy = get_retry_policy(cfg)
+
+    @staticmethod
+    def get_session(cfg):
+        """
+        Return the HTTP session of the current process for the pool settings of cfg, created when first needed.
+        The session keeps the connections alive, so that the calls to the same host reuse them instead of
+        opening a new TCP/TLS connection every time. The authorization headers are passed to every request,
+        hence a session can be shared by players with different tokens.
+        Settings (optional): 'poolConnections', number of hosts with a pool (default 10); 'poolMaxSize',
+        connections kept per host (default 10); 'poolBlock', wait for a free connection instead of opening an
+        extra one when the pool is full (default False).
+        :param cfg: Dictionary with the configurable settings
+        :type cfg: dict
+        :return: Session object
+        :rtype: requests.Session
+        """
+        pool_connections = cfg.get('poolConnections', 10)
+        pool_maxsize = cfg.get('poolMaxSize', 10)
+        pool_block = cfg.get('poolBlock', False)
+        # The connections cannot be shared with forked processes
+        key = (os.getpid(), pool_connections, pool_maxsize, pool_block)
+        with SESSIONS_LOCK:
+            if key not in SESSIONS:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                      pool_block=pool_block)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                SESSIONS[key] = session
+            return SESSIONS[key]
 
     def set_token(self, player_cfg):
+        """
+        Set the token of a player, from the token cache of the player (a JSON file in 'tokenFilesFolder') if it is
+        not going to expire, otherwise requested to NODES API and stored in the cache.
+        Settings (optional): 'tokenRefreshMargin', seconds before the expiry when a new token is requested
+        (default 300); 'tokenDefaultLifetime', lifetime in seconds of the tokens without expiry (default 3600).
+        :param player_cfg: Player settings
+        :type player_cfg: dict
+        :return: True if a token is available
+        :rtype: bool
+        """
         tkn_file_name = '%s%s%s_%s.json' % (self.cfg['tokenFilesFolder'], os.sep, player_cfg['role'], player_cfg['id'].replace(' ', '_'))
-        if os.path.exists(tkn_file_name):
-            self.get_local_token(tkn_file_name)
-
-            # Check if the already existing token is working
-            r = self.get_user_info()
-            if r is False:
-                self.logger.warning('Local token is expired, a new token will be requested to NODES API')
-                os.unlink(tkn_file_name)
-                self.get_new_token(player_cfg, tkn_file_name)
-            else:
-                self.logger.info('Token stored in %s works, no new token will be requested to NODES API' % tkn_file_name)
-        else:
-            self.logger.info('File %s does not exist or work, a new token will be requested to NODES API' % tkn_file_name)
-            self.get_new_token(player_cfg, tkn_file_name)
+        self.player_cfg = player_cfg
+        self.token_cache = TokenCache(tkn_file_name, refresh_margin=self.cfg.get('tokenRefreshMargin', 300),
+                                      default_lifetime=self.cfg.get('tokenDefaultLifetime', 3600))
+        return self.update_token()
 
-    def get_local_token(self, tkn_file_name):
-        with open(tkn_file_name, "r") as json_file:
-            self.token_data = json.load(json_file)
-            self.headers = {'Authorization': f'Bearer {self.token_data["access_token"]}'}
+    def update_token(self, force=False):
+        """
+        Update the token from the token cache, requesting a new one if needed.
+        :param force: If True, a new token is requested even if the cached one is not expired (e.g. if rejected),
+                      unless another process has already replaced the current one in the cache
+        :type force: bool
+        :return: True if a token is available
+        :rtype: bool
+        """
+        token_data = self.token_cache.get_token(lambda: self.request_new_token(self.player_cfg), force=force,
+                                                current=self.token_data)
+        if token_data is None:
+            self.logger.error('Unable to get a token from NODES API for %s' % self.player_cfg['id'])
+            return False
+        if self.token_data is None or token_data['access_token'] != self.token_data['access_token']:
+            self.logger.info('Token of %s valid until %s' % (self.player_cfg['id'],
+                                                             time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                                                           time.gmtime(token_data['expires_at']))))
+        self.token_data = token_data
+        self.headers = {'Authorization': f'Bearer {self.token_data["access_token"]}'}
+        return True
 
     def test_token(self):
         with open(self.cfg['tokenFile'], "r") as json_file:
             self.token_data = json.load(json_file)
             self.headers = {'Authorization': f'Bearer {self.token_data["access_token"]}'}
 
-    def get_new_token(self, player_cfg, tkn_file_name):
+    def request_new_token(self, player_cfg):
+        """
+        Request a new token to NODES API.
+        :return: The token data, None if the request failed
+        :rtype: dict
+        """
         payload = {
             'grant_type': self.cfg['grantType'],
             'client_id': self.cfg['players'][player_cfg['id']]['clientId'],
@@ -59,25 +125,20 @@ class NODESInterface:
             'scope': self.cfg['scope'],
         }
 
+        self.logger.info('A new token will be requested to NODES API for %s' % player_cfg['id'])
         try:
-            response = requests.post(self.cfg['tokenEndpoint'], data=payload,
-                                     headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            response = self.session.post(self.cfg['tokenEndpoint'], data=payload,
+                                         headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                                         timeout=self.cfg['requestTimeout'])
 
             if response.status_code == http.HTTPStatus.OK:
-                self.token_data = response.json()
-                self.headers = {'Authorization': f'Bearer {self.token_data["access_token"]}'}
-                self.logger.info("Access Token: %s" % self.token_data['access_token'])
-
-                # Save token data locally
-                with open(tkn_file_name, "w") as json_file:
-                    json.dump(self.token_data, json_file)
-                return True
+                return response.json()
             else:
                 self.logger.error("Failed to retrieve token: %i; %s" % (response.status_code, response.text))
-                return False
+                return None
         except Exception as e:
             self.logger.error('EXCEPTION: %s' % str(e))
-            return False
+            return None
 
     def get_user_info(self):
         return self.get_request('%sme' % self.cfg['mainEndpoint'])
@@ -86,112 +147,107 @@ class NODESInterface:
         return self.get_request('%sapi-version-info' % self.cfg['mainEndpoint'])
 
     def get_request(self, endpoint):
-        for i in range(0, self.cfg['retries']):
-            self.logger.info('GET endpoint (attempt n. %i): %s' % (i+1, endpoint))
-            try:
-                response = requests.get(endpoint, headers=self.headers, timeout=self.cfg['requestTimeout'])
-
-                if response.status_code == http.HTTPStatus.OK:
-                    self.logger.info('GET endpoint (attempt n. %i): %s, status code: %i' % (i+1, endpoint,
-                                                                                            response.status_code))
-                    return json.loads(response.text)
-                else:
-                    self.logger.warning('GET endpoint (attempt n. %i): %s, status code: %i' % (i+1, endpoint,
-                                                                                               response.status_code))
-                    time.sleep(1)
-            except Exception as e:
-                self.logger.warning('GET endpoint (attempt n. %i): %s: %s' % (i+1, endpoint,  str(e)))
-                time.sleep(1)
-
-        self.logger.error('Failing reaching GET endpoint : %s' % endpoint)
-        return False
+        return self.send_request('GET', endpoint)
 
     def delete_request(self, endpoint):
-        for i in range(0, self.cfg['retries']):
-            self.logger.info('DELETE endpoint (attempt n. %i): %s' % (i+1, endpoint))
-            try:
-                response = requests.delete(endpoint, headers=self.headers)
-
-                if response.status_code == http.HTTPStatus.OK:
-                    self.logger.info('DELETE endpoint (attempt n. %i): %s, status code: %i' % (i + 1, endpoint,
-                                                                                               response.status_code))
-                    return json.loads(response.text)
-                else:
-                    self.logger.warning('DELETE endpoint (attempt n. %i): %s, status code: %i' % (i + 1, endpoint,
-                                                                                                  response.status_code))
-                    time.sleep(1)
-            except Exception as e:
-                self.logger.warning('DELETE endpoint (attempt n. %i): %s: %s' % (i + 1, endpoint, str(e)))
-                time.sleep(1)
-
-        self.logger.error('Failing reaching DELETE endpoint: %s' % endpoint)
-        return False
+        return self.send_request('DELETE', endpoint)
 
     def post_csv_file_request(self, endpoint, tmp_baseline_file):
-        for i in range(0, self.cfg['retries']):
-            self.logger.info('POST endpoint (attempt n. %i): %s' % (i+1, endpoint))
-            try:
-                headers = self.headers
-                headers['accept'] = 'application/json'
-                files = {'file': (tmp_baseline_file.split(os.sep)[-1], open(tmp_baseline_file, 'rb'), 'text/csv')}
-                response = requests.post(endpoint, headers=headers, files=files, timeout=self.cfg['requestTimeout'])
-
-                if response.status_code == http.HTTPStatus.OK:
-                    self.logger.info('POST endpoint (attempt n. %i): %s, status code: %i' % (i + 1, endpoint,
-                                                                                             response.status_code))
-                    return json.loads(response.text)
-                else:
-                    self.logger.warning('POST endpoint (attempt n. %i): %s, status code: %i' % (i + 1, endpoint,
-                                                                                                response.status_code))
-                    time.sleep(1)
-            except Exception as e:
-                self.logger.warning('POST endpoint (attempt n. %i): %s: %s' % (i + 1, endpoint, str(e)))
-                time.sleep(1)
-
-        self.logger.error('Failing reaching POST endpoint: %s' % endpoint)
-        return False
+        return self.send_request('POST', endpoint, file_name=tmp_baseline_file)
 
     def post_request(self, endpoint, data):
-        for i in range(0, self.cfg['retries']):
-            self.logger.info('POST endpoint (attempt n. %i): %s' % (i+1, endpoint))
-            self.logger.info('POST Body request: %s' % data)
-            try:
-                response = requests.post(endpoint, headers=self.headers, json=data, timeout=self.cfg['requestTimeout'])
-
-                if response.status_code == http.HTTPStatus.OK:
-                    self.logger.info('POST endpoint (attempt n. %i): %s, status code: %i' % (i + 1, endpoint,
-                                                                                             response.status_code))
-                    return json.loads(response.text)
-                else:
-                    self.logger.warning('POST endpoint (attempt n. %i): %s, status code: %i' % (i + 1, endpoint,
-                                                                                                response.status_code))
-                    time.sleep(1)
-            except Exception as e:
-                self.logger.warning('POST endpoint (attempt n. %i): %s: %s' % (i + 1, endpoint, str(e)))
-                time.sleep(1)
-
-        self.logger.error('Failing reaching POST endpoint: %s' % endpoint)
-        return False
+        self.logger.info('POST Body request: %s' % data)
+        return self.send_request('POST', endpoint, data=data)
 
     def patch_request(self, endpoint, data):
-        for i in range(0, self.cfg['retries']):
-            self.logger.info('PATCH endpoint (attempt n. %i): %s' % (i+1, endpoint))
-            self.logger.info('PATCH Body request: %s' % data)
+        self.logger.info('PATCH Body request: %s' % data)
+        return self.send_request('PATCH', endpoint, data=data)
+
+    def send_request(self, method, endpoint, data=None, file_name=None):
+        """
+        Send a request to the NODES API, retrying the failed attempts as allowed by the retry policy.
+        :param method: HTTP method
+        :type method: str
+        :param endpoint: Endpoint
+        :type endpoint: str
+        :param data: Body of the request, sent as JSON (optional)
+        :type data: dict
+        :param file_name: CSV file to upload (optional)
+        :type file_name: str
+        :return: The decoded JSON response, False if the request failed
+        """
+        # Refresh the token before it expires
+        if self.token_cache is not None and not self.token_cache.is_valid(self.token_data):
+            self.update_token()
+
+        if not self.retry_policy.allow_request():
+            self.logger.error('Circuit breaker open, %s endpoint not requested: %s' % (method, endpoint))
+            return False
+        try:
+            return self.send_attempts(method, endpoint, data, file_name)
+        finally:
+            # Every attempt records its outcome, a trial request interrupted before is released anyway
+            self.retry_policy.release_trial()
+
+    def send_attempts(self, method, endpoint, data, file_name):
+        """
+        Send the attempts of a request allowed by the retry policy, recording their outcomes.
+        :return: The decoded JSON response, False if the request failed
+        """
+        token_refreshed = False
+        for i in range(0, self.retry_policy.max_attempts):
+            self.logger.info('%s endpoint (attempt n. %i): %s' % (method, i+1, endpoint))
+            retry_after = None
             try:
-                response = requests.patch(endpoint, headers=self.headers, json=data, timeout=self.cfg['requestTimeout'])
-
-                if response.status_code == http.HTTPStatus.OK:
-                    self.logger.info('PATCH endpoint (attempt n. %i): %s, status code: %i' % (i + 1, endpoint,
-                                                                                              response.status_code))
-                    return json.loads(response.text)
-                else:
-                    self.logger.warning('PATCH endpoint (attempt n. %i): %s, status code: %i' % (i + 1, endpoint,
-                                                                                                 response.status_code))
-                    time.sleep(1)
+                response = self.send_attempt(method, endpoint, data, file_name)
+
+                # A rejected token (e.g. revoked) is replaced once, the request is sent again in the same attempt
+                if response.status_code == http.HTTPStatus.UNAUTHORIZED and self.token_cache is not None and \
+                        not token_refreshed:
+                    token_refreshed = True
+                    self.logger.warning('Token rejected by NODES API, a new token will be requested')
+                    if self.update_token(force=True):
+                        response = self.send_attempt(method, endpoint, data, file_name)
+
+                outcome = self.retry_policy.classify(response.status_code)
+                if outcome == SUCCESS:
+                    self.logger.info('%s endpoint (attempt n. %i): %s, status code: %i' % (method, i+1, endpoint,
+                                                                                           response.status_code))
+                    self.retry_policy.record_success()
+                    try:
+                        return json.loads(response.text)
+                    except ValueError as e:
+                        # The request was processed, sending it again could duplicate it
+                        self.logger.error('%s endpoint: %s, invalid JSON response: %s' % (method, endpoint, str(e)))
+                        return False
+                self.logger.warning('%s endpoint (attempt n. %i): %s, status code: %i' % (method, i+1, endpoint,
+                                                                                          response.status_code))
+                if outcome == FAIL:
+                    # The API is reachable, the request is not retried
+                    self.retry_policy.record_success()
+                    break
+                retry_after = self.retry_policy.parse_retry_after(response.headers.get('Retry-After'))
             except Exception as e:
-                self.logger.warning('PATCH endpoint (attempt n. %i): %s: %s' % (i + 1, endpoint, str(e)))
-                time.sleep(1)
+                self.logger.warning('%s endpoint (attempt n. %i): %s: %s' % (method, i+1, endpoint, str(e)))
+
+            self.retry_policy.record_failure()
+            delay = self.retry_policy.get_retry_delay(i, retry_after)
+            if delay is None:
+                break
+            time.sleep(delay)
 
-        self.logger.error('Failing reaching POST endpoint: %s' % endpoint)
+        self.logger.error('Failing reaching %s endpoint: %s' % (method, endpoint))
         return False
 
+    def send_attempt(self, method, endpoint, data, file_name):
+        """
+        Send a single attempt of a request, return the response.
+        """
+        if file_name is not None:
+            headers = dict(self.headers, accept='application/json')
+            with open(file_name, 'rb') as csv_file:
+                files = {'file': (file_name.split(os.sep)[-1], csv_file, 'text/csv')}
+                return self.session.request(method, endpoint, headers=headers, files=files,
+                                            timeout=self.cfg['requestTimeout'])
+        return self.session.request(method, endpoint, headers=self.headers, json=data,
+                                    timeout=self.cfg['requestTimeout'])
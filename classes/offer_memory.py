@@ -0,0 +1,112 @@
+from collections import deque
+
+
+class OfferMemory:
+    """
+    A class storing the last L offers of a Bidder to a Buyer in a fixed-size ring buffer.
+
+    Counts and sums of the accepted and rejected prices are updated when an offer enters or leaves the
+    window, so means and success ratio are O(1). Minimum and maximum accepted prices are kept by two
+    monotonic deques of (sequence number, price) couples, amortized O(1) per offer. With L = 0 nothing is kept.
+    """
+
+    __slots__ = ('L', 'times', 'prices', 'powers', 'accepted', 'count', 'n_accepted', 'accepted_sum',
+                 'rejected_sum', 'min_prices', 'max_prices')
+
+    def __init__(self, L):
+        """
+        Initialize an empty memory.
+
+        :param L: Number of offers kept
+        """
+        if L < 0:
+            raise ValueError("History length L must be non-negative")
+        self.L = L
+        self.times = [None] * L
+        self.prices = [0.0] * L
+        self.powers = [0.0] * L
+        self.accepted = [False] * L
+        # Total number of offers stored so far, the k-th one is at position k % L
+        self.count = 0
+        self.n_accepted = 0
+        self.accepted_sum = 0.0
+        self.rejected_sum = 0.0
+        self.min_prices = deque()
+        self.max_prices = deque()
+
+    def __len__(self):
+        return min(self.count, self.L)
+
+    def append(self, time_slot, price, power, accepted):
+        """
+        Store an offer, discarding the oldest one if the memory is full.
+        """
+        if self.L == 0:
+            return
+        position = self.count % self.L
+        if self.count >= self.L:
+            # Remove the oldest offer from the running statistics
+            if self.accepted[position]:
+                self.n_accepted -= 1
+                self.accepted_sum = self.accepted_sum - self.prices[position] if self.n_accepted > 0 else 0.0
+            else:
+                n_rejected = self.L - 1 - self.n_accepted
+                self.rejected_sum = self.rejected_sum - self.prices[position] if n_rejected > 0 else 0.0
+            first_kept = self.count - self.L + 1
+            while self.min_prices and self.min_prices[0][0] < first_kept:
+                self.min_prices.popleft()
+            while self.max_prices and self.max_prices[0][0] < first_kept:
+                self.max_prices.popleft()
+
+        self.times[position] = time_slot
+        self.prices[position] = price
+        self.powers[position] = power
+        self.accepted[position] = accepted
+        if accepted:
+            self.n_accepted += 1
+            self.accepted_sum = self.accepted_sum + price
+            while self.min_prices and self.min_prices[-1][1] >= price:
+                self.min_prices.pop()
+            self.min_prices.append((self.count, price))
+            while self.max_prices and self.max_prices[-1][1] <= price:
+                self.max_prices.pop()
+            self.max_prices.append((self.count, price))
+        else:
+            self.rejected_sum = self.rejected_sum + price
+        self.count += 1
+
+    def get_stats(self):
+        """
+        Return (average_accepted_price, average_rejected_price, success_ratio, p_min, p_max),
+        see Bidder.get_buyer_stats.
+        """
+        n = len(self)
+        if n == 0:
+            return 0.0, 0.0, 0.0, 0.0, 0.0
+        n_rejected = n - self.n_accepted
+        avg_acc = self.accepted_sum / self.n_accepted if self.n_accepted > 0 else 0.0
+        avg_rej = self.rejected_sum / n_rejected if n_rejected > 0 else 0.0
+        success_ratio = self.n_accepted / n
+        p_min = self.min_prices[0][1] if self.n_accepted > 0 else 0.0
+        p_max = self.max_prices[0][1] if self.n_accepted > 0 else 0.0
+        return avg_acc, avg_rej, success_ratio, p_min, p_max
+
+    def get_record(self, k):
+        """
+        Return the k-th stored offer (0 is the oldest one) as a dict.
+        """
+        position = (self.count - len(self) + k) % self.L
+        return {"time": self.times[position], "price": self.prices[position], "power": self.powers[position],
+                "accepted": self.accepted[position]}
+
+    def get_last_record(self):
+        """
+        Return the most recent offer as a dict, or None if the memory is empty.
+        """
+        return self.get_record(len(self) - 1) if self.count > 0 else None
+
+    def get_records(self):
+        """
+        Return the stored offers as a list of dicts, from the oldest to the most recent one.
+        """
+        return [self.get_record(k) for k in range(len(self))]
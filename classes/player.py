@@ -1,9 +1,13 @@
 # import section
+import asyncio
 import random
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from urllib.parse import urljoin
 from influxdb import DataFrameClient
 
+from classes.nodes_async_interface import AsyncNODESInterface
 from classes.nodes_interface import NODESInterface
 
 
@@ -21,6 +25,7 @@ class Player:
         self.logger = logger
         self.nodes_interface = NODESInterface(main_cfg['nodesAPI'], logger)
         self.nodes_interface.set_token(player_cfg)
+        self.nodes_async_interface = AsyncNODESInterface(self.nodes_interface)
         self.markets = []
         self.grid_nodes = []
         self.organization = None
@@ -40,6 +45,21 @@ class Player:
             sys.exit(3)
         self.logger.info('Connection successful')
 
+    def get_requests(self, endpoints):
+        """
+        Return the responses of several GET requests, sent concurrently by the asyncio NODES interface
+        (one after the other if called from a running event loop, where the coroutines should be awaited instead).
+        :param endpoints: Endpoints to get
+        :type endpoints: list
+        :return: The responses (False for the failed requests), in the order of the endpoints
+        :rtype: list
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.nodes_async_interface.get_requests(endpoints))
+        return [self.nodes_interface.get_request(endpoint) for endpoint in endpoints]
+
     def set_markets(self, filter_dict=None):
         self.markets = self.get_nodes_api_info('markets', filter_dict)
 
@@ -72,13 +92,34 @@ class Player:
         return self.nodes_interface.get_request('%s%s' % (self.nodes_interface.cfg['mainEndpoint'],
                                                           'settlements/resolutions'))
 
-    def get_orders(self, filter_dict=None):
+    def get_orders(self, filter_dict=None, stream=False):
+        if stream is True:
+            return self.iter_nodes_api_info('orders', filter_dict)
         return self.get_nodes_api_info('orders', filter_dict)
 
-    def get_contracts(self, filter_dict=None):
+    def get_contracts(self, filter_dict=None, stream=False):
+        if stream is True:
+            return self.iter_nodes_api_info('longflexcontracts', filter_dict)
         return self.get_nodes_api_info('longflexcontracts', filter_dict)
 
     def get_nodes_api_info(self, request_type, filter_dict=None):
+        return list(self.iter_nodes_api_info(request_type, filter_dict))
+
+    def iter_nodes_api_info(self, request_type, filter_dict=None, prefetch=None):
+        """
+        Iterate over the items of a NODES API collection, page by page, following the link to the next page given
+        in the field 'nextPageField' of the responses (NODES API setting, default 'next'). Only the items of the
+        current page are kept in memory.
+        :param request_type: Collection (e.g. 'orders')
+        :type request_type: str
+        :param filter_dict: Filters of the query (optional)
+        :type filter_dict: dict
+        :param prefetch: If True, the next page is requested while the items of the current one are consumed; if
+                         None, NODES API setting 'prefetchPages' (default False)
+        :type prefetch: bool
+        :return: Generator of the items
+        :raises RuntimeError: If a page cannot be read, so that a partial collection is never taken for a complete one
+        """
         if filter_dict is not None:
             filter_str = '?'
             for k in filter_dict.keys():
@@ -86,12 +127,37 @@ class Player:
             filter_str = filter_str[:-1]
         else:
             filter_str = ''
-        res = self.nodes_interface.get_request('%s%s' % (self.nodes_interface.cfg['mainEndpoint'],
-                                                         '%s%s' % (request_type, filter_str)))
-        if 'items' in res.keys():
-            return res['items']
-        else:
-            return []
+        next_field = self.nodes_interface.cfg.get('nextPageField', 'next')
+        if prefetch is None:
+            prefetch = self.nodes_interface.cfg.get('prefetchPages', False)
+
+        endpoint = '%s%s' % (self.nodes_interface.cfg['mainEndpoint'], '%s%s' % (request_type, filter_str))
+        visited = set()
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            res = self.nodes_interface.get_request(endpoint)
+            while True:
+                if res is False:
+                    raise RuntimeError('Unable to read page %s of %s' % (endpoint, request_type))
+                visited.add(endpoint)
+                next_link = res.get(next_field)
+                endpoint = urljoin(self.nodes_interface.cfg['mainEndpoint'], next_link) if next_link else None
+                if endpoint in visited:
+                    self.logger.warning('Page %s of %s already read, pagination stopped' % (endpoint, request_type))
+                    endpoint = None
+                next_res = None
+                if endpoint is not None and executor is not None:
+                    next_res = executor.submit(self.nodes_interface.get_request, endpoint)
+
+                for item in res.get('items', []):
+                    yield item
+
+                if endpoint is None:
+                    return
+                res = next_res.result() if next_res is not None else self.nodes_interface.get_request(endpoint)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
 
     def demand_flexibility(self, dt_slot):
         # Get demanded quantity
@@ -200,7 +266,7 @@ class Player:
             'type': order_type,
             'quantityType': quantity_type,
         }
-        orders = self.get_orders(filter_dict=filter_dict)
+        orders = self.get_orders(filter_dict=filter_dict, stream=True)
 
         quantity_up = 0.0
         quantity_dn = 0.0
@@ -0,0 +1,216 @@
+# import section
+import email.utils
+import http
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+# Outcomes of a response
+SUCCESS = 'success'
+RETRY = 'retry'
+FAIL = 'fail'
+
+# Statuses worth retrying: timeouts, throttling and temporary server errors
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Retry policies shared by the NODESInterface instances of a process, see get_retry_policy
+POLICIES = {}
+POLICIES_LOCK = threading.Lock()
+
+
+class RetryPolicy:
+    """
+    Retry policy of the requests to an API, shared by all the requests of a process to the same API.
+
+    - The delay before a retry grows exponentially with the attempt, with full jitter (uniform between 0 and the
+      exponential delay) so that the processes failing together do not retry in lockstep. A Retry-After header
+      gives the minimum delay, if it is longer than max_delay the request is not retried.
+    - Only the retryable statuses (RETRY_STATUSES by default) and the connection errors are retried, the other
+      statuses fail at once.
+    - A retry budget limits the retries to a fraction of the requests: every request adds budget_ratio retries
+      to the budget (up to budget_max_retries), every retry takes one.
+    - A circuit breaker opens after breaker_threshold consecutive failures, then the requests fail without being
+      sent for breaker_reset_time seconds; after that a single trial request closes it if successful, otherwise
+      it opens again.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=30.0, multiplier=2.0,
+                 retry_statuses=RETRY_STATUSES, budget_ratio=0.2, budget_max_retries=10, breaker_threshold=5,
+                 breaker_reset_time=30.0, rng=None, clock=time.monotonic):
+        """
+        Constructor
+        :param max_attempts: Maximum number of attempts of a request
+        :param base_delay: Delay before the first retry, in seconds (before the jitter)
+        :param max_delay: Maximum delay before a retry, in seconds
+        :param multiplier: Growth factor of the delay at every attempt
+        :param retry_statuses: HTTP statuses to retry
+        :param budget_ratio: Retries added to the budget by every request
+        :param budget_max_retries: Maximum retries in the budget, also the budget before the first request
+        :param breaker_threshold: Consecutive failed attempts opening the circuit, None disables the breaker
+        :param breaker_reset_time: Seconds the circuit stays open
+        :param rng: random.Random object of the jitter
+        :param clock: Function returning the current time in seconds
+        """
+        if max_attempts < 1:
+            raise ValueError("Maximum attempts must be a positive number")
+        if base_delay < 0 or max_delay < 0 or multiplier < 1:
+            raise ValueError("Delays must be non-negative and multiplier at least 1")
+        if breaker_threshold is not None and breaker_threshold < 1:
+            raise ValueError("Circuit breaker threshold must be a positive number of failures")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget_ratio = budget_ratio
+        self.budget_max_retries = budget_max_retries
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_time = breaker_reset_time
+        self.rng = rng if rng is not None else random.Random()
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        # Retry budget
+        self.budget = float(budget_max_retries)
+
+        # Circuit breaker, open_until is None if the circuit is closed
+        self.consecutive_failures = 0
+        self.open_until = None
+        self.trial_running = False
+        self.trial_thread = None
+
+    @classmethod
+    def from_cfg(cls, cfg):
+        """
+        Create a policy from the NODES API settings: 'retries' (maximum attempts), 'retryBaseDelay',
+        'retryMaxDelay', 'retryMultiplier', 'retryStatuses', 'retryBudgetRatio', 'retryBudgetMaxRetries',
+        'circuitBreakerThreshold' (null disables it) and 'circuitBreakerResetTime', all optional.
+        :param cfg: Dictionary with the configurable settings
+        :type cfg: dict
+        """
+        return cls(max_attempts=cfg.get('retries', 3),
+                   base_delay=cfg.get('retryBaseDelay', 0.5),
+                   max_delay=cfg.get('retryMaxDelay', 30.0),
+                   multiplier=cfg.get('retryMultiplier', 2.0),
+                   retry_statuses=cfg.get('retryStatuses', RETRY_STATUSES),
+                   budget_ratio=cfg.get('retryBudgetRatio', 0.2),
+                   budget_max_retries=cfg.get('retryBudgetMaxRetries', 10),
+                   breaker_threshold=cfg.get('circuitBreakerThreshold', 5),
+                   breaker_reset_time=cfg.get('circuitBreakerResetTime', 30.0))
+
+    # -------------------------------------------------------------------------
+    # Classification
+    # -------------------------------------------------------------------------
+    def classify(self, status_code):
+        """
+        Return the outcome of a response status: SUCCESS, RETRY or FAIL.
+        """
+        if status_code == http.HTTPStatus.OK:
+            return SUCCESS
+        if status_code in self.retry_statuses:
+            return RETRY
+        return FAIL
+
+    @staticmethod
+    def parse_retry_after(value, now=None):
+        """
+        Return the seconds to wait of a Retry-After header (seconds or HTTP date), None if missing or invalid.
+        """
+        if value is None:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        now = now if now is not None else datetime.now(timezone.utc)
+        return max(0.0, (date - now).total_seconds())
+
+    # -------------------------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------------------------
+    def allow_request(self):
+        """
+        Return True if a request can be sent (closed circuit, or trial request of an open circuit whose reset
+        time has passed), and add it to the retry budget.
+        """
+        with self.lock:
+            if self.open_until is not None:
+                if self.clock() < self.open_until or self.trial_running:
+                    return False
+                self.trial_running = True
+                self.trial_thread = threading.get_ident()
+            self.budget = min(self.budget + self.budget_ratio, self.budget_max_retries)
+            return True
+
+    def record_success(self):
+        """
+        Record a response of the API (also a non-retryable error), closing the circuit.
+        """
+        with self.lock:
+            self.consecutive_failures = 0
+            self.open_until = None
+            self.trial_running = False
+
+    def record_failure(self):
+        """
+        Record a failed attempt (retryable status or connection error), opening the circuit if needed.
+        """
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.trial_running or (self.breaker_threshold is not None and
+                                      self.consecutive_failures >= self.breaker_threshold):
+                self.open_until = self.clock() + self.breaker_reset_time
+                self.trial_running = False
+
+    def release_trial(self):
+        """
+        Release the trial request sent by the current thread if it ended without recording an outcome (e.g. because
+        of an unexpected exception), so that the circuit does not wait forever for it.
+        """
+        with self.lock:
+            if self.trial_running and self.trial_thread == threading.get_ident():
+                self.trial_running = False
+
+    def is_open(self):
+        with self.lock:
+            return self.open_until is not None and self.clock() < self.open_until
+
+    def get_retry_delay(self, attempt, retry_after=None):
+        """
+        Return the seconds to wait before retrying a failed attempt, None if the request must not be retried
+        (last attempt, open circuit, exhausted budget or Retry-After longer than max_delay).
+        :param attempt: Index of the failed attempt, starting from 0
+        :param retry_after: Seconds requested by the Retry-After header, if any
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if retry_after is not None and retry_after > self.max_delay:
+            return None
+        with self.lock:
+            if self.open_until is not None or self.budget < 1:
+                return None
+            self.budget -= 1
+            delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+
+def get_retry_policy(cfg):
+    """
+    Return the retry policy of the current process for the API of cfg ('mainEndpoint'), created when first needed,
+    so that the budget and the circuit breaker are shared by all the players of the process.
+    :param cfg: Dictionary with the configurable settings of the NODES API
+    :type cfg: dict
+    :return: RetryPolicy object
+    """
+    key = (os.getpid(), cfg.get('mainEndpoint'))
+    with POLICIES_LOCK:
+        if key not in POLICIES:
+            POLICIES[key] = RetryPolicy.from_cfg(cfg)
+        return POLICIES[key]
@@ -0,0 +1,63 @@
+class RollingStatistics:
+    """
+    A class computing reference statistics over a stream of values with bounded memory.
+
+    A ring buffer keeps the running totals of the last `window` values, so that the mean of the last N
+    values (N <= window) is computed in O(1) as the difference of two totals. The global count and sum
+    are updated incrementally, hence also the global mean is O(1).
+    """
+
+    def __init__(self, window=672):
+        """
+        Initialize an empty stream.
+
+        :param window: Maximum number N of last values that can be averaged
+        """
+        if window < 1:
+            raise ValueError("Window must be a positive number of values")
+        self.window = window
+        # totals[k % (window + 1)] is the sum of the first k values
+        self.totals = [0.0] * (window + 1)
+        self.count = 0
+        self.total = 0.0
+        self.last_value = None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        """
+        Add a value to the stream.
+        """
+        self.count += 1
+        self.total += value
+        self.totals[self.count % (self.window + 1)] = self.total
+        self.last_value = value
+
+    def extend(self, values):
+        """
+        Add several values to the stream.
+        """
+        for value in values:
+            self.append(value)
+
+    def mean(self):
+        """
+        Return the mean of all the values, 0.0 if the stream is empty.
+        """
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def mean_last(self, N):
+        """
+        Return the mean of the last N values.
+        If N is greater than the number of values, return the mean of all the available values.
+        """
+        if N > self.window:
+            raise ValueError("Only the last %i values are available" % self.window)
+        if self.count == 0:
+            return 0.0
+        n = min(N, self.count)
+        first_total = self.totals[(self.count - n) % (self.window + 1)]
+        return (self.total - first_total) / n
@@ -0,0 +1,359 @@
+import numpy as np
+import pandas as pd
+
+
+class SlotStore:
+    """
+    A class storing time series of several keys (e.g. bidders or metering points) in a preallocated
+    (key x slot) float matrix.
+
+    Time slots are mapped to integer offsets from a market epoch (the first stored slot by default),
+    missing values are NaN. The matrix grows geometrically along both axes, so the insertion is amortized
+    O(1), scalar lookups are O(1) and range or multi-key lookups are plain NumPy indexing.
+
+    With a retention window only the last `retention` slots (with respect to the most recent written slot)
+    are kept and the matrix never grows beyond 2 * retention columns, so the memory stays bounded.
+
+    Time slots must be datetime-like (Timestamps, datetimes, datetime64 or date strings) and aligned to the
+    resolution: unlike the dict of DataFrames it replaces, other hashable keys (e.g. integer slot numbers) are
+    rejected with a TypeError and unaligned times with a ValueError when writing; reading them returns the default.
+    """
+
+    def __init__(self, resolution='15min', epoch=None, initial_keys=8, initial_slots=96, retention=None):
+        """
+        Initialize an empty store.
+
+        :param resolution: Duration of a time slot
+        :param epoch: Reference time slot of the offsets, if None the first stored slot is used
+        :param initial_keys: Number of rows preallocated
+        :param initial_slots: Number of columns preallocated
+        :param retention: Number of slots to keep, if None all the slots are kept
+        """
+        if retention is not None and retention < 1:
+            raise ValueError("Retention must be a positive number of slots")
+        self.retention = retention
+        self.resolution = pd.Timedelta(resolution)
+        self.epoch = None if epoch is None else pd.Timestamp(epoch)
+        self.keys = {}
+        self.values = np.full((max(initial_keys, 1), max(initial_slots, 1)), np.nan)
+        # Offset (from the epoch) of the first column of the matrix
+        self.first_offset = 0
+        # Range [min_offset, max_offset] of the offsets written so far
+        self.min_offset = None
+        self.max_offset = None
+
+    # -------------------------------------------------------------------------
+    # Time slots <-> offsets
+    # -------------------------------------------------------------------------
+    def get_offset(self, time_slot):
+        """
+        Return the integer offset of a time slot from the epoch.
+        Raise TypeError if the time slot is not datetime-like, ValueError if it is not aligned to the resolution.
+        """
+        if isinstance(time_slot, (bool, int, float, np.number)):
+            # Numbers would be taken as nanoseconds from 1970
+            raise TypeError("Time slot %r is not datetime-like" % (time_slot,))
+        time_slot = pd.Timestamp(time_slot)
+        if self.epoch is None:
+            self.epoch = time_slot
+        offset, rest = divmod(time_slot - self.epoch, self.resolution)
+        if rest != pd.Timedelta(0):
+            raise ValueError("Time slot %s is not aligned to the resolution %s" % (time_slot, self.resolution))
+        return offset
+
+    def get_offsets(self, time_slots):
+        """
+        Vectorized version of get_offset.
+        """
+        if len(time_slots) == 0:
+            return np.zeros(0, dtype=np.int64)
+        if pd.Index(time_slots).dtype.kind in 'biuf':
+            raise TypeError("Time slots are not datetime-like")
+        time_slots = pd.DatetimeIndex(time_slots)
+        if self.epoch is None:
+            self.epoch = time_slots[0]
+        if (time_slots.tz is None) != (self.epoch.tz is None):
+            raise TypeError("Cannot mix timezone naive and timezone aware time slots")
+        offsets, rest = np.divmod(time_slots.as_unit('ns').asi8 - self.epoch.value, self.resolution.value)
+        if np.any(rest != 0):
+            raise ValueError("Time slots are not aligned to the resolution %s" % self.resolution)
+        return offsets
+
+    def get_time_slot(self, offset):
+        """
+        Return the time slot of an offset.
+        """
+        return self.epoch + offset * self.resolution
+
+    def get_time_index(self, first_offset, last_offset):
+        """
+        Return the time slots of the offsets range [first_offset, last_offset].
+        """
+        return pd.date_range(start=self.get_time_slot(first_offset), periods=last_offset - first_offset + 1,
+                             freq=self.resolution)
+
+    # -------------------------------------------------------------------------
+    # Storage management
+    # -------------------------------------------------------------------------
+    def add_key(self, key):
+        """
+        Add a key (if not already available) and return its row.
+        """
+        if key not in self.keys:
+            row = len(self.keys)
+            if row >= self.values.shape[0]:
+                grown = np.full((2 * self.values.shape[0], self.values.shape[1]), np.nan)
+                grown[:self.values.shape[0]] = self.values
+                self.values = grown
+            self.keys[key] = row
+        return self.keys[key]
+
+    def reserve(self, first_offset, last_offset):
+        """
+        Make sure that the columns of the offsets range [first_offset, last_offset] are allocated.
+        With a retention window, the slots falling out of the window are discarded.
+        """
+        capacity = self.values.shape[1]
+        if first_offset >= self.first_offset and last_offset < self.first_offset + capacity:
+            return
+
+        if self.retention is None:
+            lo = min(first_offset, self.first_offset)
+            hi = max(last_offset, self.first_offset + capacity - 1)
+            new_capacity = max(2 * capacity, hi - lo + 1)
+        else:
+            hi = last_offset if self.max_offset is None else max(last_offset, self.max_offset)
+            lo = first_offset if self.min_offset is None else min(first_offset, self.min_offset)
+            lo = max(lo, hi - self.retention + 1)
+            new_capacity = max(min(2 * capacity, 2 * self.retention), hi - lo + 1)
+            if self.min_offset is not None and self.min_offset < lo:
+                self.min_offset = lo
+
+        # Growing backwards, leave the spare room before the current slots
+        new_first = lo if first_offset >= self.first_offset else hi - new_capacity + 1
+        grown = np.full((self.values.shape[0], new_capacity), np.nan)
+        copy_lo = max(self.first_offset, new_first, lo)
+        copy_hi = min(self.first_offset + capacity, new_first + new_capacity)
+        if copy_lo < copy_hi:
+            grown[:, copy_lo - new_first:copy_hi - new_first] = \
+                self.values[:, copy_lo - self.first_offset:copy_hi - self.first_offset]
+        self.values = grown
+        self.first_offset = new_first
+
+    def update_written_range(self, first_offset, last_offset):
+        self.min_offset = first_offset if self.min_offset is None else min(self.min_offset, first_offset)
+        self.max_offset = last_offset if self.max_offset is None else max(self.max_offset, last_offset)
+        if self.retention is not None:
+            self.min_offset = max(self.min_offset, self.max_offset - self.retention + 1)
+
+    def get_retained_from(self, last_offset):
+        """
+        Return the first offset kept by the retention window after writing last_offset.
+        """
+        if self.retention is None:
+            return None
+        hi = last_offset if self.max_offset is None else max(last_offset, self.max_offset)
+        return hi - self.retention + 1
+
+    def is_available(self, offset):
+        """
+        Return True if the offset is inside the range of the written (and retained) slots.
+        """
+        return self.min_offset is not None and self.min_offset <= offset <= self.max_offset
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+    def set_value(self, key, time_slot, value):
+        """
+        Store a single value.
+
+        :param key: Identifier of the time series
+        :param time_slot: The time slot of the value
+        :param value: The value to store
+        """
+        offset = self.get_offset(time_slot)
+        retained_from = self.get_retained_from(offset)
+        if retained_from is not None and offset < retained_from:
+            return  # Older than the retention window
+        row = self.add_key(key)
+        self.reserve(offset, offset)
+        self.values[row, offset - self.first_offset] = value
+        self.update_written_range(offset, offset)
+
+    def set_values(self, key, time_slots, values):
+        """
+        Store several values of a key at once.
+
+        :param key: Identifier of the time series
+        :param time_slots: Sequence of time slots
+        :param values: Sequence of values, with the same length of time_slots
+        """
+        self.set_points([key] * len(time_slots), time_slots, values)
+
+    def set_points(self, keys, time_slots, values):
+        """
+        Store several (key, time slot, value) points at once.
+
+        :param keys: Sequence of keys
+        :param time_slots: Sequence of time slots, with the same length of keys
+        :param values: Sequence of values, with the same length of keys
+        """
+        offsets = self.get_offsets(time_slots)
+        values = np.asarray(values, dtype=float)
+        if len(offsets) == 0:
+            return
+        retained_from = self.get_retained_from(offsets.max())
+        if retained_from is not None and offsets.min() < retained_from:
+            # Discard the points older than the retention window
+            keep = offsets >= retained_from
+            keys = [key for key, k in zip(keys, keep) if k]
+            offsets = offsets[keep]
+            values = values[keep]
+            if len(offsets) == 0:
+                return
+        codes, uniques = pd.factorize(pd.Series(keys, dtype=object))
+        rows = np.array([self.add_key(key) for key in uniques], dtype=np.int64)[codes]
+        first_offset, last_offset = offsets.min(), offsets.max()
+        self.reserve(first_offset, last_offset)
+        self.values[rows, offsets - self.first_offset] = values
+        self.update_written_range(first_offset, last_offset)
+
+    def store_dataframe(self, key, df, column=None, replace=True):
+        """
+        Bulk ingestion of a time indexed DataFrame (or Series).
+
+        :param key: Identifier of the time series
+        :param df: DataFrame indexed by time slot, or Series
+        :param column: Column to store, the first one if None
+        :param replace: If True, the values previously stored for the key are discarded
+        """
+        if isinstance(df, pd.DataFrame):
+            series = df.iloc[:, 0] if column is None else df[column]
+        else:
+            series = df
+        if replace:
+            self.clear_key(key)
+        self.set_values(key, series.index, series.to_numpy(dtype=float))
+
+    def update_dataframe(self, key, df, column=None, replace=True):
+        """
+        Store a time indexed DataFrame (or Series) writing only the range of slots whose values changed.
+
+        :param key: Identifier of the time series
+        :param df: DataFrame indexed by time slot, or Series
+        :param column: Column to store, the first one if None
+        :param replace: If True, the values previously stored for the key outside the index become missing
+        :return: The (first, last) time slots of the changed range, or None if nothing changed
+        """
+        if isinstance(df, pd.DataFrame):
+            series = df.iloc[:, 0] if column is None else df[column]
+        else:
+            series = df
+        offsets = self.get_offsets(series.index)
+        if len(offsets) == 0:
+            if replace and key in self.keys:
+                self.clear_key(key)
+            return None
+        lo, hi = offsets.min(), offsets.max()
+        if replace and key in self.keys and self.min_offset is not None:
+            lo, hi = min(lo, self.min_offset), max(hi, self.max_offset)
+
+        current = self.get_range(key, self.get_time_slot(lo), self.get_time_slot(hi)).to_numpy()
+        target = np.full(hi - lo + 1, np.nan) if replace else current.copy()
+        target[offsets - lo] = series.to_numpy(dtype=float)
+        changed = np.flatnonzero(~((target == current) | (np.isnan(target) & np.isnan(current))))
+        if len(changed) == 0:
+            return None
+
+        first, last = changed[0], changed[-1]
+        self.set_values(key, self.get_time_index(lo + first, lo + last), target[first:last + 1])
+        return self.get_time_slot(lo + first), self.get_time_slot(lo + last)
+
+    def clear_key(self, key):
+        """
+        Discard the values stored for a key.
+        """
+        if key in self.keys:
+            self.values[self.keys[key]] = np.nan
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+    def get_value(self, key, time_slot, default=np.nan):
+        """
+        Return the value of a key for a time slot, or default if it is not available.
+        """
+        if key not in self.keys or self.epoch is None:
+            return default
+        try:
+            offset = self.get_offset(time_slot)
+        except (ValueError, TypeError):
+            return default
+        if not self.is_available(offset):
+            return default
+        value = self.values[self.keys[key], offset - self.first_offset]
+        return default if np.isnan(value) else float(value)
+
+    def get_values(self, keys, time_slots, default=np.nan):
+        """
+        Vectorized lookup of (key, time slot) pairs.
+
+        :param keys: Sequence of keys
+        :param time_slots: Sequence of time slots, with the same length of keys
+        :param default: Value returned for the pairs not available
+        :return: Array of values
+        """
+        values = np.full(len(keys), default, dtype=float)
+        if len(keys) == 0 or self.min_offset is None:
+            return values
+        rows = np.array([self.keys.get(key, -1) for key in keys], dtype=np.int64)
+        offsets = self.get_offsets(time_slots)
+        valid = (rows >= 0) & (offsets >= self.min_offset) & (offsets <= self.max_offset)
+        found = self.values[rows[valid], offsets[valid] - self.first_offset]
+        values[valid] = np.where(np.isnan(found), default, found)
+        return values
+
+    def get_range(self, key, start, end, default=np.nan):
+        """
+        Return the values of a key for the time slots in [start, end] as a Series.
+        """
+        first_offset, last_offset = self.get_offset(start), self.get_offset(end)
+        values = np.full(max(last_offset - first_offset + 1, 0), default, dtype=float)
+        if key in self.keys and len(values) > 0 and self.min_offset is not None:
+            lo = max(first_offset, self.min_offset)
+            hi = min(last_offset, self.max_offset)
+            if lo <= hi:
+                stored = self.values[self.keys[key], lo - self.first_offset:hi - self.first_offset + 1]
+                values[lo - first_offset:hi - first_offset + 1] = np.where(np.isnan(stored), default, stored)
+        return pd.Series(values, index=self.get_time_index(first_offset, last_offset))
+
+    def get_series(self, key):
+        """
+        Return all the values written for a key as a Series (NaN where missing).
+        """
+        if key not in self.keys or self.min_offset is None:
+            return pd.Series(dtype=float)
+        return self.get_range(key, self.get_time_slot(self.min_offset), self.get_time_slot(self.max_offset))
+
+    def get_key_view(self, key):
+        """
+        Return a zero-copy view of the values written for a key, from the first to the last written slot.
+        The view is invalidated when the matrix is reallocated.
+        """
+        if key not in self.keys or self.min_offset is None:
+            return np.zeros(0)
+        return self.values[self.keys[key], self.min_offset - self.first_offset:self.max_offset - self.first_offset + 1]
+
+    def get_slot_view(self, time_slot):
+        """
+        Return a zero-copy view of the values of all the keys (in insertion order) for a time slot,
+        or None if the time slot is not available.
+        The view is invalidated when the matrix is reallocated.
+        """
+        if self.min_offset is None:
+            return None
+        offset = self.get_offset(time_slot)
+        if not self.is_available(offset):
+            return None
+        return self.values[:len(self.keys), offset - self.first_offset]
@@ -0,0 +1,114 @@
+# import section
+import json
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No file locking on this platform, the writes are still atomic
+    fcntl = None
+
+
+class TokenCache:
+    """
+    OAuth token cache stored in a JSON file, shared by the processes of the same player.
+
+    The token data are stored with their expiry time ('expires_at', epoch seconds, computed from the
+    'expires_in' of the token response), so that a token is used without checking it against the API until
+    refresh_margin seconds before its expiry, then a new one is requested. The reads take a shared lock and the
+    refreshes an exclusive lock of a lock file next to the cache file: when many processes start together only
+    the first one requests a new token, the other ones read it once it is written. The file is replaced
+    atomically, hence a reader never sees a partially written token.
+    """
+    def __init__(self, file_name, refresh_margin=300, default_lifetime=3600, clock=time.time):
+        """
+        Constructor
+        :param file_name: JSON file of the token data
+        :type file_name: str
+        :param refresh_margin: Seconds before the expiry when a new token is requested
+        :type refresh_margin: float
+        :param default_lifetime: Lifetime in seconds of the tokens without 'expires_in'
+        :type default_lifetime: float
+        :param clock: Function returning the current epoch time in seconds
+        """
+        self.file_name = file_name
+        self.lock_file_name = '%s.lock' % file_name
+        self.refresh_margin = refresh_margin
+        self.default_lifetime = default_lifetime
+        self.clock = clock
+
+    def lock(self, exclusive):
+        """
+        Open the lock file and lock it, return the file object (closing it releases the lock).
+        """
+        lock_file = open(self.lock_file_name, 'a')
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return lock_file
+
+    def is_valid(self, token_data):
+        """
+        Return True if the token data can be used for at least refresh_margin seconds.
+        """
+        return token_data is not None and 'access_token' in token_data and \
+            token_data.get('expires_at', 0) - self.refresh_margin > self.clock()
+
+    def read(self):
+        """
+        Return the cached token data, None if the file does not exist or is not valid JSON.
+        """
+        try:
+            with open(self.file_name, 'r') as json_file:
+                return json.load(json_file)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, token_data):
+        """
+        Replace atomically the cached token data.
+        """
+        folder = os.path.dirname(os.path.abspath(self.file_name))
+        fd, tmp_file_name = tempfile.mkstemp(dir=folder, prefix='.token_', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as json_file:
+                json.dump(token_data, json_file)
+            os.chmod(tmp_file_name, 0o600)
+            os.replace(tmp_file_name, self.file_name)
+        except BaseException:
+            os.unlink(tmp_file_name)
+            raise
+
+    def get_token(self, request_token, force=False, current=None):
+        """
+        Return valid token data, from the cache or requested with request_token and stored in the cache.
+        :param request_token: Function returning new token data (the JSON response of the token endpoint), None if
+                              the request failed
+        :param force: If True, a new token is requested even if the cached one is valid (e.g. when it has been
+                      revoked), unless another process has already replaced the current token of the caller
+        :param current: Token data currently used by the caller, the cached ones if not given
+        :type current: dict
+        :return: The token data with 'expires_at', None if a new token was needed and the request failed
+        :rtype: dict
+        """
+        if not force or current is None:
+            with self.lock(exclusive=False):
+                cached = self.read()
+            if not force and self.is_valid(cached):
+                return cached
+            current = cached
+
+        with self.lock(exclusive=True):
+            # Another process may have refreshed the token (or replaced the rejected one) while waiting for the lock
+            token_data = self.read()
+            if self.is_valid(token_data) and (not force or current is None or
+                                              token_data['access_token'] != current.get('access_token')):
+                return token_data
+            token_data = request_token()
+            if token_data is None:
+                return None
+            token_data = dict(token_data)
+            token_data['expires_at'] = self.clock() + token_data.get('expires_in', self.default_lifetime)
+            self.write(token_data)
+            return token_data
@@ -0,0 +1,241 @@
+# Importing section
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from classes.market_operator import MarketOperator, CLEARING_ENGINES
+from scripts.utils_baselines import (RESIDENTIAL_SEGMENTS, OFFICE_SEGMENTS, COMMERCIAL_SEGMENTS1,
+                                     COMMERCIAL_SEGMENTS2, BATTERY_SEGMENTS, generate_fleet_patterns)
+
+BASELINE_PATTERNS = [RESIDENTIAL_SEGMENTS, OFFICE_SEGMENTS, COMMERCIAL_SEGMENTS1, COMMERCIAL_SEGMENTS2,
+                     BATTERY_SEGMENTS]
+PRICE_DISTRIBUTIONS = ('uniform', 'normal', 'discrete')
+
+
+def generate_prices(rng, size, distribution, low=20.0, high=60.0):
+    """
+    Generate bid prices with the given distribution in the range [low, high].
+    """
+    if distribution == 'uniform':
+        return rng.uniform(low, high, size)
+    if distribution == 'normal':
+        return np.clip(rng.normal((low + high) / 2, (high - low) / 6, size), low, high)
+    if distribution == 'discrete':
+        return rng.choice(np.linspace(low, high, 5), size)
+    raise ValueError("Price distribution must be one of %s" % (PRICE_DISTRIBUTIONS,))
+
+
+def generate_market(n_buyers, n_bidders, n_slots, price_distribution='uniform', seed=0):
+    """
+    Generate a synthetic market.
+
+    Buyers request a random power with a random willingness to pay for every slot, every bidder bids once per slot
+    to a random buyer. Baselines reuse the patterns of utils_baselines (randomly scaled), the actual values are the
+    baselines minus the bidded power with some noise.
+
+    :param n_buyers: Number of buyers
+    :param n_bidders: Number of bidders
+    :param n_slots: Number of 15 minutes time slots
+    :param price_distribution: Distribution of the bid prices, one of PRICE_DISTRIBUTIONS
+    :param seed: Seed of the random generator
+    :return: A dict with time_index, requests, bids, baselines and actuals
+    """
+    rng = np.random.default_rng(seed)
+    time_index = pd.date_range(start='2025-01-01', periods=n_slots, freq='15min')
+    buyer_ids = ['BUYER_%i' % i for i in range(n_buyers)]
+    bidder_ids = ['BIDDER_%i' % i for i in range(n_bidders)]
+
+    demands = rng.uniform(0, 10.0 * n_bidders / n_buyers, (n_slots, n_buyers))
+    wtps = rng.uniform(40.0, 60.0, n_buyers)
+    requests = [(time_slot, {'id': buyer_id, 'requested_power': float(demands[s, i]), 'wtp': float(wtps[i])})
+                for s, time_slot in enumerate(time_index) for i, buyer_id in enumerate(buyer_ids)]
+
+    patterns = generate_fleet_patterns(BASELINE_PATTERNS, np.arange(n_bidders) % len(BASELINE_PATTERNS), n_slots,
+                                       scale=rng.uniform(10.0, 30.0, n_bidders))
+    baselines = {bidder_id: pd.DataFrame({'value': patterns[i]}, index=time_index)
+                 for i, bidder_id in enumerate(bidder_ids)}
+
+    prices = generate_prices(rng, (n_slots, n_bidders), price_distribution)
+    bid_buyers = rng.integers(0, n_buyers, (n_slots, n_bidders))
+    noise = rng.normal(1.0, 0.1, (n_slots, n_bidders))
+    bids = []
+    actuals = []
+    for j, bidder_id in enumerate(bidder_ids):
+        baseline = baselines[bidder_id]['value'].to_numpy()
+        powers = np.abs(baseline) * 0.8
+        for s, time_slot in enumerate(time_index):
+            bids.append((time_slot, {'bidder_id': bidder_id, 'buyer_id': buyer_ids[bid_buyers[s, j]],
+                                     'power': float(powers[s]), 'price': float(prices[s, j])}))
+            actuals.append((bidder_id, time_slot, float(baseline[s] - powers[s] * noise[s, j])))
+    bids.sort(key=lambda bid: bid[0])
+
+    return {'time_index': time_index, 'requests': requests, 'bids': bids, 'baselines': baselines,
+            'actuals': actuals}
+
+
+def run_benchmark(market, clearing_engine, clearing_workers=None):
+    """
+    Ingest and clear a synthetic market, timing every phase.
+
+    :param market: A market generated by generate_market
+    :param clearing_engine: One of CLEARING_ENGINES
+    :param clearing_workers: Number of worker processes ('vectorized' engine only)
+    :return: A dict with the timings (s), the throughputs and the number of accepted bids
+    """
+    market_operator = MarketOperator(alpha_rem=1.0, beta_rem=0.5, gamma_rem=0.5, threshold_rem=0.1,
+                                     threshold_rem_bid_inf=0.25, power_ref=100, price_ref=20,
+                                     clearing_engine=clearing_engine, clearing_workers=clearing_workers)
+    n_slots = len(market['time_index'])
+    n_bids = len(market['bids'])
+
+    start = time.perf_counter()
+    for time_slot, request in market['requests']:
+        market_operator.receive_buyer_request(time_slot, dict(request))
+    for bidder_id, baseline in market['baselines'].items():
+        market_operator.store_bidder_baseline(bidder_id, baseline)
+    for time_slot, bid in market['bids']:
+        market_operator.receive_bid_from_bidder(time_slot, dict(bid))
+    for bidder_id, time_slot, actual_value in market['actuals']:
+        market_operator.store_bidder_actual(bidder_id, time_slot, actual_value)
+    ingestion_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        accepted_bids, _ = market_operator.pay_as_bid_market_solving(n_slots)
+    clearing_time = time.perf_counter() - start
+    market_operator.close()
+
+    # Reward computation of the accepted allocations, scalar and vectorized
+    allocations = [allocation for results in market_operator.clearing_results_history.values()
+                   for result in results for allocation in result['allocations']]
+    columns = {name: np.array([allocation[key] for allocation in allocations], dtype=float)
+               for name, key in [('price', 'price'), ('bidded_flexibility', 'bidded_flexibility'),
+                                 ('provided_flexibility', 'provided_flexibility'),
+                                 ('requested_flexibility', 'requested_flexibility')]}
+    start = time.perf_counter()
+    for allocation in allocations:
+        market_operator.calculate_reward(allocation['price'], allocation['bidded_flexibility'],
+                                         allocation['provided_flexibility'], allocation['requested_flexibility'])
+    reward_time = time.perf_counter() - start
+    start = time.perf_counter()
+    market_operator.engine.calculate_rewards(**columns)
+    vectorized_reward_time = time.perf_counter() - start
+
+    return {
+        'ingestion_time': ingestion_time,
+        'clearing_time': clearing_time,
+        'reward_time': reward_time,
+        'vectorized_reward_time': vectorized_reward_time,
+        'ingested_bids_per_second': n_bids / ingestion_time if ingestion_time > 0 else None,
+        'cleared_bids_per_second': n_bids / clearing_time if clearing_time > 0 else None,
+        'cleared_slots_per_second': n_slots / clearing_time if clearing_time > 0 else None,
+        'accepted_bids': sum(len(bids) for bids in accepted_bids.values()),
+    }
+
+
+def measure_peak_memory(market, clearing_engine, clearing_workers=None):
+    """
+    Return the peak memory (bytes) allocated by Python while ingesting and clearing a market.
+    It is measured in a separate run, since tracemalloc slows down the execution.
+    """
+    tracemalloc.start()
+    run_benchmark(market, clearing_engine, clearing_workers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def get_environment():
+    """
+    Return the information identifying the benchmarked code and the machine.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare_results(results, baseline_results, logger):
+    """
+    Log the clearing time ratios with respect to the runs of a previous results file.
+    """
+    previous = {(r['engine'], r['workers'], r['buyers'], r['bidders'], r['slots']): r for r in baseline_results['runs']}
+    for run in results['runs']:
+        key = (run['engine'], run['workers'], run['buyers'], run['bidders'], run['slots'])
+        if key in previous:
+            logger.info('%s: clearing time %.4fs (previous %.4fs, ratio %.2f)' %
+                        (key, run['clearing_time'], previous[key]['clearing_time'],
+                         run['clearing_time'] / previous[key]['clearing_time']))
+
+
+if __name__ == "__main__":
+    # --------------------------------------------------------------------------- #
+    # Configuration
+    # --------------------------------------------------------------------------- #
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--sizes', nargs='+', default=['2:10:96', '4:50:96', '8:200:192'],
+                            help='market sizes as buyers:bidders:slots (one scaling point per size)')
+    arg_parser.add_argument('--engines', nargs='+', default=list(CLEARING_ENGINES), choices=CLEARING_ENGINES,
+                            help='clearing engines to benchmark')
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help='worker processes of the parallel clearing (vectorized engine only)')
+    arg_parser.add_argument('--prices', default='uniform', choices=PRICE_DISTRIBUTIONS, help='price distribution')
+    arg_parser.add_argument('--repeats', type=int, default=3, help='runs per point, the fastest one is kept')
+    arg_parser.add_argument('--seed', type=int, default=0, help='seed of the market generator')
+    arg_parser.add_argument('--memory', action='store_true', help='measure the peak memory with tracemalloc')
+    arg_parser.add_argument('--output_file', default='benchmark_clearing.json', help='JSON results file')
+    arg_parser.add_argument('--compare_file', help='previous JSON results file to compare with (optional)')
+    arg_parser.add_argument('--log_file', help='log file (optional, if empty log redirected on stdout)')
+    args = arg_parser.parse_args()
+
+    # Logger object
+    logger = logging.getLogger()
+    logging.basicConfig(format='%(asctime)-15s::%(levelname)s::%(funcName)s::%(message)s', level=logging.INFO,
+                        filename=args.log_file)
+
+    logger.info('Starting program')
+
+    results = {'environment': get_environment(), 'prices': args.prices, 'seed': args.seed, 'runs': []}
+    for size in args.sizes:
+        n_buyers, n_bidders, n_slots = [int(v) for v in size.split(':')]
+        market = generate_market(n_buyers, n_bidders, n_slots, args.prices, args.seed)
+        for engine in args.engines:
+            workers = args.workers if engine == 'vectorized' else None
+            runs = [run_benchmark(market, engine, workers) for _ in range(args.repeats)]
+            run = min(runs, key=lambda r: r['clearing_time'])
+            run.update({'engine': engine, 'workers': workers, 'buyers': n_buyers, 'bidders': n_bidders,
+                        'slots': n_slots, 'bids': len(market['bids'])})
+            if args.memory:
+                run['peak_memory'] = measure_peak_memory(market, engine, workers)
+            results['runs'].append(run)
+            logger.info('%s %s: ingestion %.4fs, clearing %.4fs (%.0f bids/s), rewards %.4fs' %
+                        (engine, size, run['ingestion_time'], run['clearing_time'], run['cleared_bids_per_second'],
+                         run['reward_time']))
+
+    with open(args.output_file, 'w') as json_file:
+        json.dump(results, json_file, indent=2)
+    logger.info('Results saved in %s' % args.output_file)
+
+    if args.compare_file is not None:
+        compare_results(results, json.loads(open(args.compare_file).read()), logger)
+
+    logger.info('Ending program')
@@ -52,10 +52,10 @@ if __name__ == "__main__":
     dso = DSO(cfg['fm']['actors']['dso'], cfg['nodesAPI'], logger)
     dso.set_organization(filter_dict={'name': dso.cfg['id']})
 
-    # Print orders performed by DSO
+    # Print orders performed by DSO, read page by page
     dso_orders = dso.get_orders(filter_dict={'ownerOrganizationId': dso.organization['id'],
                                              'periodFrom.GreaterThanOrEqual': from_str,
-                                             'periodFrom.LessThanOrEqual': to_str})
+                                             'periodFrom.LessThanOrEqual': to_str}, stream=True)
     logger.info('DSO ORDERS:')
     for dso_order in dso_orders:
         logger.info('Created: %s, ValidFrom: %s, ValidTo: %s, Side: %s, Type: %s, Quantity: %s, completionType: %s' %
@@ -69,7 +69,7 @@ if __name__ == "__main__":
 
         fsp_orders = fsp.get_orders(filter_dict={'ownerOrganizationId': fsp.organization['id'],
                                                  'periodFrom.GreaterThanOrEqual': from_str,
-                                                 'periodFrom.LessThanOrEqual': to_str})
+                                                 'periodFrom.LessThanOrEqual': to_str}, stream=True)
 
         logger.info('FSP ORDERS:')
         for fsp_order in fsp_orders:
@@ -0,0 +1,127 @@
+# Importing section
+import argparse
+import itertools
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.sim01 import get_params, run_market_simulation, summarize_simulation
+
+
+def parse_grid(grid_file=None, grid_params=None):
+    """
+    Return the parameter grid as a dict name -> list of values.
+
+    :param grid_file: JSON file with a dict name -> list of values (optional)
+    :param grid_params: List of 'name=value1,value2,...' strings (optional), values are parsed as JSON if possible
+    :return: The grid dict
+    """
+    grid = {}
+    if grid_file is not None:
+        with open(grid_file) as json_file:
+            grid.update(json.load(json_file))
+    for grid_param in grid_params or []:
+        name, values = grid_param.split('=', 1)
+        grid[name] = [parse_value(value) for value in values.split(',')]
+    return grid
+
+
+def parse_value(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def build_scenarios(grid, n_seeds, base_seed=0):
+    """
+    Return the scenarios of the cartesian product of the grid, each run with n_seeds seeds. The same seeds are used
+    for every grid point, so that the points are compared on the same noise realizations.
+
+    :param grid: Dict name -> list of values
+    :param n_seeds: Number of seeded runs per grid point
+    :param base_seed: Seed of the sequence generating the seeds of the runs
+    :return: A list of (scenario_id, overrides, seed) tuples
+    """
+    seeds = np.random.SeedSequence(base_seed).generate_state(n_seeds).tolist()
+    names = list(grid.keys())
+    scenarios = []
+    for values in itertools.product(*[grid[name] for name in names]):
+        for seed in seeds:
+            scenarios.append((len(scenarios), dict(zip(names, values)), seed))
+    return scenarios
+
+
+def run_scenario(scenario):
+    """
+    Run a scenario quietly and return its parameters and summary metrics as a flat dict.
+    Module-level, so that it can be run by worker processes.
+    """
+    scenario_id, overrides, seed = scenario
+    start = time.perf_counter()
+    result = run_market_simulation(get_params(overrides), seed=seed, verbose=False)
+    row = {'scenario_id': scenario_id, 'seed': seed}
+    row.update(overrides)
+    row.update(summarize_simulation(result))
+    row['run_time'] = time.perf_counter() - start
+    return row
+
+
+def run_scenarios(scenarios, workers=None, chunksize=1):
+    """
+    Run the scenarios, in worker processes if workers is greater than 1.
+
+    :return: A DataFrame with a row per scenario, sorted by scenario_id
+    """
+    if workers is None or workers <= 1:
+        rows = [run_scenario(scenario) for scenario in scenarios]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(run_scenario, scenarios, chunksize=chunksize))
+    return pd.DataFrame(rows).sort_values('scenario_id', ignore_index=True)
+
+
+if __name__ == "__main__":
+    # --------------------------------------------------------------------------- #
+    # Configuration
+    # --------------------------------------------------------------------------- #
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--grid_file', help='JSON file with the parameter grid (name -> list of values)')
+    arg_parser.add_argument('--param', action='append', default=[],
+                            help='grid parameter as name=value1,value2,... (e.g. alpha_rem=0.5,1 or '
+                                 'bidders.gamma=0,0.5), can be repeated')
+    arg_parser.add_argument('--seeds', type=int, default=1, help='seeded runs per grid point')
+    arg_parser.add_argument('--base_seed', type=int, default=0, help='seed of the runs seeds')
+    arg_parser.add_argument('--workers', type=int, default=None, help='worker processes')
+    arg_parser.add_argument('--chunksize', type=int, default=1, help='scenarios sent at once to a worker')
+    arg_parser.add_argument('--output_file', default='scenarios.csv', help='CSV results file')
+    arg_parser.add_argument('--log_file', help='log file (optional, if empty log redirected on stdout)')
+    args = arg_parser.parse_args()
+
+    # Logger object
+    logger = logging.getLogger()
+    logging.basicConfig(format='%(asctime)-15s::%(levelname)s::%(funcName)s::%(message)s', level=logging.INFO,
+                        filename=args.log_file)
+
+    logger.info('Starting program')
+
+    grid = parse_grid(args.grid_file, args.param)
+    scenarios = build_scenarios(grid, args.seeds, args.base_seed)
+    logger.info('Running %i scenarios (%i grid points, %i seeds)' %
+                (len(scenarios), len(scenarios) // args.seeds, args.seeds))
+
+    start = time.perf_counter()
+    results = run_scenarios(scenarios, args.workers, args.chunksize)
+    results.to_csv(args.output_file, index=False)
+    logger.info('Results of %i scenarios saved in %s (%.1fs)' %
+                (len(results), args.output_file, time.perf_counter() - start))
+
+    if len(grid) > 0:
+        metrics = ['total_reward', 'unfulfilled_demand', 'acceptance_ratio']
+        logger.info('Mean metrics per grid point:\n%s' % results.groupby(list(grid.keys()))[metrics].mean())
+
+    logger.info('Ending program')
@@ -1,68 +1,260 @@
+import argparse
+import logging
 import numpy as np
 import pandas as pd
 import os
 from classes.buyer import Buyer
 from classes.bidder import Bidder
+from classes.bidder_population import BidderPopulation
+from classes.checkpoint import Checkpoint
+from classes.clearing_engine import ClearingEngine
+from classes.event_sink import NULL_SINK, JsonLinesSink, LoggingSink
+from classes.market_simulation import MarketSimulation
 from classes.market_operator import MarketOperator
 from classes.metering_agent import MeteringAgent
 from scripts.utils import (plot_successful_bids_per_bidder, plot_unsuccessful_bids_per_bidder,
                            plot_combined_bids_per_bidder, plot_all_accepted_bids, plot_buyer_requests_and_wtp,
                            plot_rewards_per_bidder, plot_all_bidders_rewards, plot_flexibility_from_history,
-                           plot_flexibility_and_rewards_from_history, plot_flexibility_requested_and_rewards_from_history)
-from scripts.utils_baselines import create_residential_like_pattern, create_office_like_pattern, create_battery_pattern
+                           plot_flexibility_and_rewards_from_history, plot_flexibility_requested_and_rewards_from_history,
+                           write_report, bids_to_table, history_to_table, buyers_to_table)
+from scripts.utils_baselines import (create_residential_like_pattern, create_office_like_pattern,
+                                     create_battery_pattern, generate_fleet_patterns, PATTERN_SEGMENTS)
 from utils_baselines import create_duck_curve_pattern, create_bus_curve_pattern
 
-def test_market_simulation():
+# Default scenario, see run_market_simulation
+DEFAULT_PARAMS = {
+    'num_days': 2,
+    'clearing_steps': 24,
+    'alpha_rem': 1,
+    'beta_rem': 0,
+    'gamma_rem': 0,
+    'threshold_rem': 0.1,
+    'threshold_rem_bid_inf': 0.25,
+    'power_ref': 100,
+    'price_ref': 20,
+    'clearing_engine': 'loop',
+    # 'loop' (per-object simulation) or 'vectorized' (MarketSimulation)
+    'kernel': 'loop',
+    # If given, number of bidders, the templates in 'bidders' are repeated
+    'fleet_size': None,
+    # If given, the state is saved in this folder every checkpoint_interval slots ('loop' kernel only)
+    'checkpoint_folder': None,
+    'checkpoint_interval': 96,
+    # If given, the events of the simulation are written in this JSON lines file instead of being logged
+    'event_file': None,
+    'wtp_duck': 50.0,
+    'wtp_bus': 55.0,
+    'bid_power_factor': 0.8,
+    'actual_noise': 0.1,
+    'bidders': [
+        # {'id': 'BIDDER_01', 'alpha': 0.02, 'beta': 0.02, 'gamma': 0.5, 'L': 7, 'w1': 1.0, 'w2': 1.0, 'w3': 1.0,
+        #  'pattern': 'residential'},
+        # {'id': 'BIDDER_02', 'alpha': 0.05, 'beta': 0.03, 'gamma': 0.7, 'L': 10, 'w1': 1.5, 'w2': 0.8, 'w3': 0.8,
+        #  'pattern': 'office'},
+        # {'id': 'BIDDER_03', 'alpha': 0.03, 'beta': 0.03, 'gamma': 0.4, 'L': 5, 'w1': 1.0, 'w2': 1.2, 'w3': 1.0,
+        #  'pattern': 'battery'},
+        {'id': 'BIDDER_01', 'alpha': 0, 'beta': 0, 'gamma': 0, 'L': 7, 'w1': 1.0, 'w2': 1.0, 'w3': 1.0,
+         'pattern': 'residential'},
+        {'id': 'BIDDER_02', 'alpha': 0, 'beta': 0, 'gamma': 0, 'L': 10, 'w1': 1.0, 'w2': 1.0, 'w3': 1.0,
+         'pattern': 'office'},
+        {'id': 'BIDDER_03', 'alpha': 0, 'beta': 0, 'gamma': 0, 'L': 5, 'w1': 1.0, 'w2': 1.0, 'w3': 1.0,
+         'pattern': 'battery'},
+    ],
+}
+KERNELS = ('loop', 'vectorized')
+# Per-bidder summary metrics are reported only for fleets up to this size
+MAX_BIDDER_METRICS = 20
+# Dicts of the state stored in chunks by the checkpoints, the owners of the bids and requests first
+CHECKPOINT_CHUNKED = ('market_operator.bid_book.bids', 'market_operator.buyer_requests',
+                      'market_operator.bidder_bids', 'market_operator.bid_book.merit_orders',
+                      'market_operator.clearing_history.results', 'accepted_bids', 'not_accepted_bids')
+BASELINE_PATTERNS = {
+    'residential': create_residential_like_pattern,
+    'office': create_office_like_pattern,
+    'battery': create_battery_pattern,
+}
+
+def get_params(overrides=None):
+    """
+    Return a copy of DEFAULT_PARAMS updated with the overrides. A key 'bidders.<name>' sets the parameter <name> of
+    all the bidders (e.g. 'bidders.gamma').
+    """
+    params = dict(DEFAULT_PARAMS, bidders=[dict(bidder) for bidder in DEFAULT_PARAMS['bidders']])
+    for key, value in (overrides or {}).items():
+        if key.startswith('bidders.'):
+            for bidder in params['bidders']:
+                bidder[key[len('bidders.'):]] = value
+        elif key in params:
+            params[key] = value
+        else:
+            raise ValueError("Unknown simulation parameter %s" % key)
+    return params
+
+def get_bidder_params(params):
+    """
+    Return the parameters of the bidders, the templates of params['bidders'] repeated up to params['fleet_size'].
+    """
+    if params.get('fleet_size') is None:
+        return params['bidders']
+    templates = params['bidders']
+    return [dict(templates[i % len(templates)], id='BIDDER_%05i' % (i + 1)) for i in range(params['fleet_size'])]
+
+def run_market_simulation(params=None, seed=None, verbose=True, event_sink=None):
+    """
+    Run a market simulation.
+
+    :param params: Simulation parameters, DEFAULT_PARAMS if None (see get_params)
+    :param seed: Seed of the random generator of the actual values noise
+    :param verbose: If False, the events are discarded (see get_event_sink)
+    :param event_sink: Sink of the events of the simulation, if None the one of get_event_sink (closed at the end)
+    :return: With the 'loop' kernel, a dict with market_operator, buyers, bidders, accepted_bids and
+             not_accepted_bids; with the 'vectorized' kernel, a dict with simulation (the MarketSimulation)
+    """
+    params = params or DEFAULT_PARAMS
+    if params.get('kernel', 'loop') not in KERNELS:
+        raise ValueError("Simulation kernel must be one of %s" % (KERNELS,))
+    if params.get('kernel', 'loop') == 'vectorized':
+        return simulate_vectorized(params, np.random.default_rng(seed))
+    checkpoint = None
+    if params.get('checkpoint_folder') is not None:
+        checkpoint = Checkpoint(params['checkpoint_folder'])
+    sink = event_sink if event_sink is not None else get_event_sink(params, verbose)
+    state = create_simulation_state(params, np.random.default_rng(seed), sink)
+    try:
+        return simulate_steps(state, 0, checkpoint)
+    finally:
+        if event_sink is None:
+            sink.close()
+
+def resume_market_simulation(checkpoint_folder, verbose=True, event_sink=None):
+    """
+    Resume a simulation from the last checkpoint saved in a folder, new checkpoints are saved in the same folder.
+
+    :param checkpoint_folder: Folder of the checkpoints
+    :param verbose: If False, the events are discarded (see get_event_sink)
+    :param event_sink: Sink of the events of the simulation, if None the one of get_event_sink (closed at the end)
+    :return: The dict returned by run_market_simulation
+    """
+    checkpoint = Checkpoint(checkpoint_folder)
+    state, step = checkpoint.load()
+    sink = event_sink if event_sink is not None else get_event_sink(state['params'], verbose)
+    set_event_sink(state, sink)
+    try:
+        return simulate_steps(state, step, checkpoint)
+    finally:
+        if event_sink is None:
+            sink.close()
+
+def get_event_sink(params, verbose=True):
+    """
+    Return the sink of the events of a simulation: a JsonLinesSink if params['event_file'] is given, a LoggingSink
+    of the root logger (INFO level) if verbose, NULL_SINK otherwise.
+    """
+    if params.get('event_file') is not None:
+        return JsonLinesSink(params['event_file'])
+    return LoggingSink() if verbose else NULL_SINK
+
+def set_event_sink(state, event_sink):
+    """
+    Set the sink of the events of the components of a simulation state (e.g. after loading a checkpoint).
+    """
+    state['market_operator'].event_sink = event_sink
+    state['metering_agent'].event_sink = event_sink
+    for bidder in state['bidders']:
+        bidder.event_sink = event_sink
+
+def simulate_vectorized(params, rng):
+    """
+    Run the simulation of simulate on arrays with a MarketSimulation, the results are the same.
+    """
+    num_days = params['num_days']
+    time_index = pd.date_range(start="2025-01-01", periods=num_days * 96, freq="15min")
+    demand = np.column_stack([create_duck_curve_pattern(time_index, num_days)['demand'].to_numpy(),
+                              create_bus_curve_pattern(time_index, num_days)['demand'].to_numpy()])
+
+    bidders = get_bidder_params(params)
+    population = BidderPopulation(ids=[b['id'] for b in bidders], alpha=[b['alpha'] for b in bidders],
+                                  beta=[b['beta'] for b in bidders], gamma=[b['gamma'] for b in bidders],
+                                  L=[b['L'] for b in bidders], w1=[b['w1'] for b in bidders],
+                                  w2=[b['w2'] for b in bidders], w3=[b['w3'] for b in bidders])
+    pattern_names = list(PATTERN_SEGMENTS)
+    baselines = generate_fleet_patterns([PATTERN_SEGMENTS[name] for name in pattern_names],
+                                        [pattern_names.index(b['pattern']) for b in bidders], len(time_index))
+
+    engine = ClearingEngine(alpha_rem=params['alpha_rem'], beta_rem=params['beta_rem'], gamma_rem=params['gamma_rem'],
+                            threshold_rem=params['threshold_rem'],
+                            threshold_rem_bid_inf=params['threshold_rem_bid_inf'])
+    simulation = MarketSimulation(population, engine, buyer_ids=["BUYER_1", "BUYER_2"],
+                                  wtp=[params['wtp_duck'], params['wtp_bus']], clearing_steps=params['clearing_steps'],
+                                  bid_power_factor=params['bid_power_factor'], actual_noise=params['actual_noise'])
+    return {'simulation': simulation.run(demand, baselines, rng)}
+
+def create_simulation_state(params, rng, event_sink=None):
+    """
+    Create the objects of a simulation, returned as a dict (the state saved by the checkpoints).
+    The components emit their events to event_sink (discarded if None).
+    """
     # Initialize simulation parameters
-    num_days = 2
+    num_days = params['num_days']
     slots_per_day = 96
     num_slots = num_days * slots_per_day
-    clearing_steps = 24
+    clearing_steps = params['clearing_steps']
     time_index = pd.date_range(start="2025-01-01", periods=num_slots, freq="15min")
 
-    # Create directory for saving plots
-    plot_dir = "../data/plots"
-    os.makedirs(plot_dir, exist_ok=True)
-
     # Create Buyers with demand curves
     duck_curve_data = create_duck_curve_pattern(time_index, num_days)
     bus_curve_data = create_bus_curve_pattern(time_index, num_days)
 
     buyers = [
-        Buyer("BUYER_1", duck_curve_data, willingness_to_pay=50.0),
-        Buyer("BUYER_2", bus_curve_data, willingness_to_pay=55.0)
+        Buyer("BUYER_1", duck_curve_data, willingness_to_pay=params['wtp_duck']),
+        Buyer("BUYER_2", bus_curve_data, willingness_to_pay=params['wtp_bus'])
     ]
 
-    # Generate baselines for bidders
-    residential_baseline = create_residential_like_pattern(time_index)
-    office_baseline = create_office_like_pattern(time_index)
-    battery_baseline = create_battery_pattern(time_index)
-
-    # Create Bidders
-    # b1 = Bidder(id="BIDDER_01", alpha=0.02, beta=0.02, gamma=0.5, L=7, w1=1.0, w2=1.0, w3=1.0, baseline=residential_baseline)
-    # b2 = Bidder(id="BIDDER_02", alpha=0.05, beta=0.03, gamma=0.7, L=10, w1=1.5, w2=0.8, w3=0.8, baseline=office_baseline)
-    # b3 = Bidder(id="BIDDER_03", alpha=0.03, beta=0.03, gamma=0.4, L=5, w1=1.0, w2=1.2, w3=1.0, baseline=battery_baseline)
-    b1 = Bidder(id="BIDDER_01", alpha=0, beta=0, gamma=0, L=7, w1=1.0, w2=1.0, w3=1.0, baseline=residential_baseline)
-    b2 = Bidder(id="BIDDER_02", alpha=0, beta=0, gamma=0, L=10, w1=1.0, w2=1.0, w3=1.0, baseline=office_baseline)
-    b3 = Bidder(id="BIDDER_03", alpha=0, beta=0, gamma=0, L=5, w1=1.0, w2=1.0, w3=1.0, baseline=battery_baseline)
-
-    bidders = [b1, b2, b3]
+    # Create Bidders with their baselines
+    bidders = [Bidder(id=b['id'], alpha=b['alpha'], beta=b['beta'], gamma=b['gamma'], L=b['L'], w1=b['w1'],
+                      w2=b['w2'], w3=b['w3'], baseline=BASELINE_PATTERNS[b['pattern']](time_index),
+                      event_sink=event_sink)
+               for b in get_bidder_params(params)]
 
     # Initialize MeteringAgent
-    metering_agent = MeteringAgent()
+    metering_agent = MeteringAgent(backend='array', event_sink=event_sink)
     # todo: Now we cycle only on the bidders but other meter point, not related to the bidders, could be added
     for bidder in bidders:
         metering_agent.add_metering_point(bidder.id)
 
     # Initialize MarketOperator
-    # market_op = MarketOperator(alpha_rem=5.0, beta_rem=-2.0, gamma_rem=0.5, threshold_rem=0.1, threshold_rem_bid_inf=0.25, power_ref=100, price_ref=20)
-    market_op = MarketOperator(alpha_rem=1, beta_rem=0, gamma_rem=0, threshold_rem=0.1, threshold_rem_bid_inf=0.25, power_ref=100, price_ref=20)
+    market_op = MarketOperator(alpha_rem=params['alpha_rem'], beta_rem=params['beta_rem'],
+                               gamma_rem=params['gamma_rem'], threshold_rem=params['threshold_rem'],
+                               threshold_rem_bid_inf=params['threshold_rem_bid_inf'], power_ref=params['power_ref'],
+                               price_ref=params['price_ref'], clearing_engine=params['clearing_engine'],
+                               event_sink=event_sink)
+
+    return {'params': params, 'rng': rng, 'time_index': time_index, 'buyers': buyers, 'bidders': bidders,
+            'metering_agent': metering_agent, 'market_operator': market_op, 'accepted_bids': {},
+            'not_accepted_bids': {}}
+
+def simulate_steps(state, start_step=0, checkpoint=None):
+    """
+    Simulate the time slots of a state from start_step, saving a checkpoint every checkpoint_interval slots.
+    The events are emitted to the sink of the market operator.
+    """
+    params = state['params']
+    rng = state['rng']
+    time_index = state['time_index']
+    clearing_steps = params['clearing_steps']
+    buyers = state['buyers']
+    bidders = state['bidders']
+    metering_agent = state['metering_agent']
+    market_op = state['market_operator']
+    all_accepted_bids = state['accepted_bids']
+    all_not_accepted_bids = state['not_accepted_bids']
+    events = market_op.event_sink
 
     # Main simulation loop
-    all_accepted_bids = {}
-    all_not_accepted_bids = {}
-    for step, time_slot in enumerate(time_index):
-        print(f"*** Starting simulating time slot: {time_slot}")
+    for step in range(start_step, len(time_index)):
+        time_slot = time_index[step]
+        if events.enabled:
+            events.emit('slot_started', time_slot=time_slot)
         # Update reference values for each bidder
         pow_req_ref = market_op.average_last_n_requested_powers(7)
         avg_acc_ref = market_op.average_last_n_accepted_prices(7)
@@ -71,13 +263,11 @@ def test_market_simulation():
         # Baselines update in the market operator is now reusing always the same values. This is a simplification,
         # in a real scenario, the baselines about the future steps should be updated considering the last forecast.
         # todo: Change the code below in order to update the baselines, considering the last forecast for the future steps
-        print("Baselines updating")
         for bidder in bidders:
             market_op.store_bidder_baseline(bidder.id, bidder.baseline)
 
         # STEP 2: Buyers requesting flexibility
         current_buyer_requests = []
-        print("Flexibility requests storage")
         for buyer in buyers:
             request_info = {
                 'id': buyer.id,
@@ -86,39 +276,37 @@ def test_market_simulation():
             }
             market_op.receive_buyer_request(time_slot, request_info)
             current_buyer_requests.append(request_info)
-            print("Request info:", request_info)
 
         # STEP 3: Bidders offering flexibility to the buyers
         # Store bidding in market operator
-        print("Flexibility bidding storage")
         for bidder in bidders:
             bidder.set_reference_values(pow_req_ref, avg_acc_ref)
             best_buyer = bidder.select_buyer(current_buyer_requests)
             p_start, final_power = bidder.build_offer(buyer_id=best_buyer['id'],
                                                       pow_req=best_buyer['requested_power'],
-                                                      pow_bid=bidder.baseline.loc[time_slot, 'value']*0.8)
+                                                      pow_bid=bidder.baseline.loc[time_slot, 'value']*params['bid_power_factor'])
             bidder.update_current_bidding(buyer_id=best_buyer['id'], offered_power=final_power, offered_price=p_start)
             market_op.receive_bid_from_bidder(time_slot=time_slot, bid_info=bidder.current_bidding)
-            print("Bid info:", bidder.current_bidding)
 
         # STEP 4: Metering agent stores actual values
         # Store actual values in metering agent
-        print("Actual values storage")
         # todo: Now we cycle only on the bidders but other actual values for the market operator should be added
         for bidder in bidders:
-            actual_value = bidder.baseline.loc[time_slot, 'value'] - bidder.current_bidding['power'] * (1 + 0.1 * np.random.randn())
+            actual_value = bidder.baseline.loc[time_slot, 'value'] - bidder.current_bidding['power'] * (1 + params['actual_noise'] * rng.standard_normal())
             metering_agent.add_energy_measure(bidder.id, time_slot, actual_value)
 
         # STEP 5: Send information about the actual values to the bidders and the market operator
         # Store actual values related to the bidding in market operator and bidders
         for bidder in bidders:
-            bidder.add_actual_value(time_slot, metering_agent.get_energy_data(bidder.id).loc[time_slot, 'energy'])
-            market_op.store_bidder_actual(bidder.id, time_slot, metering_agent.get_energy_data(bidder.id).loc[time_slot, 'energy'])
+            energy = metering_agent.get_energy_measure(bidder.id, time_slot)
+            bidder.add_actual_value(time_slot, energy)
+            market_op.store_bidder_actual(bidder.id, time_slot, energy)
 
         # Solve the market every clearing_steps steps
         if (step + 1) % clearing_steps == 0:
             # STEP 6: Market clearing
-            print(f"Time slot: {time_slot}: Starting clearing the last {clearing_steps} steps.")
+            if events.enabled:
+                events.emit('clearing_started', time_slot=time_slot, steps=clearing_steps)
             accepted_bids, non_accepted_bids = market_op.pay_as_bid_market_solving(clearing_steps)
 
             # Update global bids dictionaries
@@ -139,10 +327,99 @@ def test_market_simulation():
                 for bid in non_accepted_bids.get(time_slot, []):
                     if bid['bidder_id'] == bidder.id:
                         bidder.update_history(bid['buyer_id'], time_slot, bid['price'], bid['power'], False)
-            print(f"Time slot: {time_slot}: Ending clearing the last {clearing_steps} steps.")
-        print(f"*** Ending simulating time slot: {time_slot}")
+            if events.enabled:
+                events.emit('clearing_ended', time_slot=time_slot, steps=clearing_steps)
+        if events.enabled:
+            events.emit('slot_ended', time_slot=time_slot)
+
+        if checkpoint is not None and (step + 1) % params['checkpoint_interval'] == 0:
+            written = checkpoint.save(state, step + 1, CHECKPOINT_CHUNKED)
+            if events.enabled:
+                events.emit('checkpoint', step=step + 1, **written)
+
+    events.flush()
+    return {'market_operator': market_op, 'buyers': buyers, 'bidders': bidders, 'accepted_bids': all_accepted_bids,
+            'not_accepted_bids': all_not_accepted_bids}
+
+def summarize_simulation(result):
+    """
+    Return the summary metrics of a simulation: rewards, allocated and unfulfilled demand, acceptance ratio,
+    total and per bidder (for fleets of up to MAX_BIDDER_METRICS bidders).
+
+    :param result: A dict returned by run_market_simulation
+    :return: A flat dict of metrics
+    """
+    if 'simulation' in result:
+        return summarize_vectorized_simulation(result['simulation'])
+
+    bids = bids_to_table(result['accepted_bids'], result['not_accepted_bids'])
+    history = history_to_table(result['market_operator'])
+    demands = result['market_operator'].clearing_history.query(table='demands')
+    summary = {
+        'n_bids': len(bids),
+        'n_accepted': int(bids['accepted'].sum()),
+        'acceptance_ratio': float(bids['accepted'].mean()) if len(bids) > 0 else 0.0,
+        'total_reward': float(bids['reward'].sum()),
+        'allocated_flexibility': float(history['allocated_flexibility'].sum()) if len(history) > 0 else 0.0,
+        'provided_flexibility': float(history['provided_flexibility'].sum()) if len(history) > 0 else 0.0,
+        'unfulfilled_demand': float(demands['unfulfilled_demand'].sum()) if len(demands) > 0 else 0.0,
+    }
+    if len(result['bidders']) <= MAX_BIDDER_METRICS:
+        for bidder in result['bidders']:
+            bidder_bids = bids[bids['bidder_id'] == bidder.id]
+            summary['reward_%s' % bidder.id] = float(bidder_bids['reward'].sum())
+            summary['acceptance_ratio_%s' % bidder.id] = float(bidder_bids['accepted'].mean()) \
+                if len(bidder_bids) > 0 else 0.0
+    return summary
+
+def summarize_vectorized_simulation(simulation):
+    """
+    Return the metrics of summarize_simulation for a MarketSimulation.
+    """
+    n_rows = simulation.bidder_accepted + simulation.bidder_not_accepted
+    summary = {
+        'n_bids': int(n_rows.sum()),
+        'n_accepted': int(simulation.bidder_accepted.sum()),
+        'acceptance_ratio': float(simulation.bidder_accepted.sum() / n_rows.sum()) if n_rows.sum() > 0 else 0.0,
+        'total_reward': float(simulation.bidder_rewards.sum()),
+        'allocated_flexibility': simulation.allocated_flexibility,
+        'provided_flexibility': simulation.provided_flexibility,
+        'unfulfilled_demand': simulation.unfulfilled_demand,
+    }
+    if len(simulation.population) <= MAX_BIDDER_METRICS:
+        for b, bidder_id in enumerate(simulation.population.ids):
+            summary['reward_%s' % bidder_id] = float(simulation.bidder_rewards[b])
+            summary['acceptance_ratio_%s' % bidder_id] = float(simulation.bidder_accepted[b] / n_rows[b]) \
+                if n_rows[b] > 0 else 0.0
+    return summary
+
+def test_market_simulation(params=None):
+    # Resume from the last checkpoint, if available
+    checkpoint_folder = (params or DEFAULT_PARAMS)['checkpoint_folder']
+    if checkpoint_folder is not None and Checkpoint(checkpoint_folder).exists():
+        result = resume_market_simulation(checkpoint_folder)
+    else:
+        result = run_market_simulation(params)
 
-    print("Printing plots in", plot_dir)
+    # Create directory for saving plots
+    plot_dir = "../data/plots"
+    os.makedirs(plot_dir, exist_ok=True)
+
+    if 'simulation' in result:
+        # The vectorized kernel keeps only the aggregated metrics, there are no bids or history to plot
+        summary = summarize_simulation(result)
+        for name, value in summary.items():
+            logging.getLogger().info('%s: %s' % (name, value))
+        os.makedirs(os.path.join(plot_dir, 'report'), exist_ok=True)
+        pd.Series(summary, name='value').to_csv(os.path.join(plot_dir, 'report', 'summary.csv'), index_label='metric')
+        return
+
+    market_op = result['market_operator']
+    buyers = result['buyers']
+    all_accepted_bids = result['accepted_bids']
+    all_not_accepted_bids = result['not_accepted_bids']
+
+    logging.getLogger().info('Printing plots in %s' % plot_dir)
 
     # # Plot and save the successful bids for each bidder
     # plot_successful_bids_per_bidder(all_accepted_bids, plot_dir)
@@ -174,7 +451,29 @@ def test_market_simulation():
     # Plot and save flexibility requested and rewards for each bidder
     plot_flexibility_requested_and_rewards_from_history(market_op, plot_dir)
 
+    # Save the tidy tables as CSV files and a single HTML report
+    write_report(os.path.join(plot_dir, 'report'), bids_to_table(all_accepted_bids, all_not_accepted_bids),
+                 history_to_table(market_op), buyers_to_table(buyers))
+
 if __name__ == "__main__":
     # todo (listed by priority):
     #   - Marginal costs analysis: how much would my flexibility activation cost? (Bidder)
-    test_market_simulation()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--kernel', choices=KERNELS, default=DEFAULT_PARAMS['kernel'],
+                            help='simulation kernel, per-object (loop) or vectorized (only summary metrics)')
+    arg_parser.add_argument('--checkpoint_folder', help='folder of the checkpoints, the simulation is resumed from '
+                                                        'the last one if available (optional)')
+    arg_parser.add_argument('--checkpoint_interval', type=int, default=DEFAULT_PARAMS['checkpoint_interval'],
+                            help='slots between two checkpoints')
+    arg_parser.add_argument('--event_file', help='JSON lines file of the events (optional, if empty events logged)')
+    arg_parser.add_argument('--quiet', action='store_true', help='log only warnings and errors')
+    arg_parser.add_argument('--log_file', help='log file (optional, if empty log redirected on stdout)')
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)-15s::%(levelname)s::%(funcName)s::%(message)s',
+                        level=logging.WARNING if args.quiet else logging.INFO, filename=args.log_file)
+
+    test_market_simulation(get_params({'kernel': args.kernel,
+                                       'checkpoint_folder': args.checkpoint_folder,
+                                       'checkpoint_interval': args.checkpoint_interval,
+                                       'event_file': args.event_file}))
\ No newline at end of file
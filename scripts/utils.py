@@ -1,372 +1,435 @@
+import base64
+import html
 import os
-import matplotlib.pyplot as plt
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.dates as mdates
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Figures are created with the object oriented API on an Agg canvas: the rendering is headless and does not
+# depend on the pyplot state machine. Every plot is described by a spec dict, rendered for every group (bidder or
+# buyer) of a tidy table reusing the same figure and artists, optionally in parallel worker processes.
+#
+# Spec keys: 'file' and 'title' (formatted with the group identifier as {key}), 'xlabel', 'ylabel', 'ylabel2'
+# (second y axis), 'figsize', 'legend', 'grid', 'tight' and 'series', a list of dicts with:
+#   - 'column': column of the y values ('x' is the column of the x values, 'time_slot' by default)
+#   - 'label', 'color', 'marker', 'cmap' (scatter colored by the 'c' column, with a colorbar)
+#   - 'kind': 'line' or 'scatter'
+#   - 'axis': 1 or 2
+#   - 'filter': optional boolean column selecting the rows of the series
+
+BID_COLUMNS = ['time_slot', 'bidder_id', 'buyer_id', 'power', 'price', 'reward', 'accepted']
+# Renderers kept across calls (see get_cached_renderer), the least recently used ones are released beyond the size
+FIGURE_CACHE = OrderedDict()
+FIGURE_CACHE_SIZE = 8
+
+
+# -----------------------------------------------------------------------------
+# Tidy tables
+# -----------------------------------------------------------------------------
+def bids_to_table(all_accepted_bids, all_not_accepted_bids=None):
+    """
+    Aggregate the bids dictionaries (time_slot -> list of bid dicts) in a single tidy table.
 
-def plot_requests(time_index, df_duck, df_bus, plot_dir, step):
-    plt.figure()
-    plt.plot(df_duck.index, df_duck['demand'], label='Duck Demand')
-    plt.plot(df_bus.index, df_bus['demand'], label='Bus Demand')
-    plt.xlabel('Time')
-    plt.ylabel('Demand')
-    plt.title(f'Demand Curves at Time Slot {time_index[step]}')
-    plt.legend()
-    plt.savefig(os.path.join(plot_dir, f'demand_plot_{step + 1}.png'))
-    plt.close()
-
-def plot_bids_per_bidder(accepted_bids, non_accepted_bids, plot_dir):
-    for bidder_id in accepted_bids.keys():
-        plt.figure()
-        accepted = accepted_bids[bidder_id]
-        non_accepted = non_accepted_bids[bidder_id]
-
-        if accepted:
-            times = [bid['time_slot'] for bid in accepted]
-            powers = [bid['power'] for bid in accepted]
-            prices = [bid['price'] for bid in accepted]
-            plt.scatter(times, powers, c=prices, cmap='viridis', label='Accepted Bids')
-            plt.colorbar(label='Price')
-
-        if non_accepted:
-            times = [bid['time_slot'] for bid in non_accepted]
-            powers = [bid['power'] for bid in non_accepted]
-            prices = [bid['price'] for bid in non_accepted]
-            plt.scatter(times, powers, c=prices, cmap='coolwarm', label='Non-Accepted Bids', marker='x')
-            plt.colorbar(label='Price')
-
-        plt.xlabel('Time')
-        plt.ylabel('Power')
-        plt.title(f'Bids for {bidder_id}')
-        plt.legend()
-        plt.savefig(os.path.join(plot_dir, f'bids_{bidder_id}.png'))
-        plt.close()
-
-def plot_successful_bids_per_bidder(all_accepted_bids, plot_dir):
-    bidders = set()
-    for bids in all_accepted_bids.values():
-        for bid in bids:
-            bidders.add(bid['bidder_id'])
-
-    for bidder_id in bidders:
-        times = []
-        powers = []
-        for time_slot, bids in all_accepted_bids.items():
-            power = None
-            for bid in bids:
-                if bid['bidder_id'] == bidder_id:
-                    power = bid['power']
-                    break
-            times.append(time_slot)
-            powers.append(power)
-
-        plt.figure()
-        plt.plot(times, powers, label=f'Successful Bids for {bidder_id}')
-        plt.xlabel('Time')
-        plt.ylabel('Power')
-        plt.title(f'Successful Bids for {bidder_id}')
-        # plt.legend()
-        plt.grid()
-        plt.savefig(os.path.join(plot_dir, f'successful_bids_{bidder_id}.png'))
-        plt.close()
-
-def plot_unsuccessful_bids_per_bidder(all_not_accepted_bids, plot_dir):
-    bidders = set()
-    for bids in all_not_accepted_bids.values():
-        for bid in bids:
-            bidders.add(bid['bidder_id'])
-
-    for bidder_id in bidders:
-        times = []
-        powers = []
-        for time_slot, bids in all_not_accepted_bids.items():
-            power = None
-            for bid in bids:
-                if bid['bidder_id'] == bidder_id:
-                    power = bid['power']
-                    break
-            times.append(time_slot)
-            powers.append(power)
-
-        plt.figure()
-        plt.plot(times, powers, label=f'Unsuccessful Bids for {bidder_id}')
-        plt.xlabel('Time')
-        plt.ylabel('Power')
-        plt.title(f'Unsuccessful Bids for {bidder_id}')
-        # plt.legend()
-        plt.grid()
-        plt.savefig(os.path.join(plot_dir, f'unsuccessful_bids_{bidder_id}.png'))
-        plt.close()
-
-def plot_combined_bids_per_bidder(all_accepted_bids, all_not_accepted_bids, plot_dir):
-    bidders = set()
-    for bids in all_accepted_bids.values():
-        for bid in bids:
-            bidders.add(bid['bidder_id'])
-    for bids in all_not_accepted_bids.values():
-        for bid in bids:
-            bidders.add(bid['bidder_id'])
-
-    for bidder_id in bidders:
-        accepted_times = []
-        accepted_powers = []
-        non_accepted_times = []
-        non_accepted_powers = []
-
-        for bids in all_accepted_bids.values():
+    :param all_accepted_bids: Accepted bids for each time slot
+    :param all_not_accepted_bids: Non-accepted bids for each time slot (optional)
+    :return: A DataFrame with the columns of BID_COLUMNS, one row per bid
+    """
+    rows = []
+    for bids_dict, accepted in [(all_accepted_bids, True), (all_not_accepted_bids or {}, False)]:
+        for time_slot, bids in bids_dict.items():
             for bid in bids:
-                if bid['bidder_id'] == bidder_id:
-                    accepted_times.append(bid['time_slot'])
-                    accepted_powers.append(bid['power'])
+                rows.append((time_slot, bid['bidder_id'], bid.get('buyer_id'), bid.get('power'), bid.get('price'),
+                             bid.get('reward', np.nan) if accepted else np.nan, accepted))
+    return pd.DataFrame(rows, columns=BID_COLUMNS)
+
+
+def history_to_table(market_operator):
+    """
+    Return the allocations of the clearing history of a MarketOperator as a tidy table, including the time slots
+    already spilled to disk.
+    """
+    return market_operator.clearing_history.query()
+
+
+def buyers_to_table(buyers):
+    """
+    Return the demand curves and the willingness to pay of the buyers as a tidy table
+    (time_slot, buyer_id, demand, wtp).
+    """
+    frames = []
+    for buyer in buyers:
+        demand = buyer.demand_curve.iloc[:, 0]
+        wtp = buyer.willingness_to_pay
+        wtp = wtp.iloc[:, 0].reindex(demand.index).to_numpy() if isinstance(wtp, pd.DataFrame) else wtp
+        frames.append(pd.DataFrame({'time_slot': demand.index, 'buyer_id': buyer.id, 'demand': demand.to_numpy(),
+                                    'wtp': wtp}))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['time_slot', 'buyer_id', 'demand', 'wtp'])
+
+
+# -----------------------------------------------------------------------------
+# Rendering
+# -----------------------------------------------------------------------------
+def to_plot_values(values):
+    """
+    Return the values as floats, datetimes are converted to Matplotlib date numbers.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return mdates.date2num(values.dt.tz_localize(None) if values.dt.tz is not None else values)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+
+def set_limits(axis, xs, ys):
+    """
+    Set the limits of an axis around the given values, with a 5% margin.
+    """
+    for values, setter in [(xs, axis.set_xlim), (ys, axis.set_ylim)]:
+        values = np.concatenate([v[np.isfinite(v)] for v in values]) if values else np.zeros(0)
+        if len(values) == 0:
+            continue
+        lo, hi = values.min(), values.max()
+        margin = (hi - lo) * 0.05 if hi > lo else max(abs(lo) * 0.05, 0.5)
+        setter(lo - margin, hi + margin)
+
+
+class FigureRenderer:
+    """
+    A figure with the artists of a spec, whose data is replaced for every rendered group.
+    """
+
+    def __init__(self, spec, dates):
+        self.spec = spec
+        self.figure = Figure(figsize=spec.get('figsize', (6.4, 4.8)))
+        FigureCanvasAgg(self.figure)
+        self.axes = {1: self.figure.add_subplot()}
+        if any(series.get('axis', 1) == 2 for series in spec['series']):
+            self.axes[2] = self.axes[1].twinx()
+        if dates:
+            self.axes[1].xaxis_date()
+
+        self.artists = []
+        self.colorbars = {}
+        for i, series in enumerate(spec['series']):
+            axis = self.axes[series.get('axis', 1)]
+            if series.get('kind', 'line') == 'scatter' and 'cmap' in series:
+                artist = axis.scatter([], [], c=np.zeros(0), cmap=series['cmap'], label=series.get('label'),
+                                      marker=series.get('marker'))
+                self.colorbars[i] = self.figure.colorbar(artist, ax=axis, label=series.get('clabel', 'Price'))
+            elif series.get('kind', 'line') == 'scatter':
+                artist = axis.scatter([], [], color=series.get('color'), label=series.get('label'),
+                                      marker=series.get('marker'))
+            else:
+                artist, = axis.plot([], [], color=series.get('color'), label=series.get('label'))
+            self.artists.append(artist)
+
+        self.axes[1].set_xlabel(spec.get('xlabel', 'Time'))
+        self.axes[1].set_ylabel(spec.get('ylabel', ''))
+        if 2 in self.axes:
+            self.axes[2].set_ylabel(spec.get('ylabel2', ''))
+        for axis_id, name in [(1, 'ylabel_color'), (2, 'ylabel2_color')]:
+            if axis_id in self.axes and name in spec:
+                self.axes[axis_id].yaxis.label.set_color(spec[name])
+                self.axes[axis_id].tick_params(axis='y', labelcolor=spec[name])
+        if spec.get('grid', True):
+            self.axes[1].grid(True)
+        if spec.get('legend', True):
+            self.axes[1].legend(loc=spec.get('legend_loc', 'best'))
+        self.title = self.axes[1].set_title('')
+
+    def render(self, key, table, path):
+        """
+        Replace the data of the artists with the rows of a group and save the figure.
+        """
+        xs = {axis: [] for axis in self.axes}
+        ys = {axis: [] for axis in self.axes}
+        for i, (series, artist) in enumerate(zip(self.spec['series'], self.artists)):
+            rows = table[table[series['filter']]] if 'filter' in series else table
+            x = to_plot_values(rows[series.get('x', 'time_slot')])
+            y = to_plot_values(rows[series['column']])
+            if series.get('kind', 'line') == 'scatter':
+                artist.set_offsets(np.column_stack([x, y]) if len(x) > 0 else np.zeros((0, 2)))
+                if 'cmap' in series:
+                    c = to_plot_values(rows[series['c']])
+                    artist.set_array(c)
+                    if len(c) > 0:
+                        artist.set_clim(np.nanmin(c), np.nanmax(c))
+                    self.colorbars[i].update_normal(artist)
+            else:
+                artist.set_data(x, y)
+            xs[series.get('axis', 1)].append(x)
+            ys[series.get('axis', 1)].append(y)
+        for axis_id, axis in self.axes.items():
+            set_limits(axis, [x for values in xs.values() for x in values], ys[axis_id])
+        self.title.set_text(self.spec['title'].format(key=key))
+        if self.spec.get('tight', False):
+            self.figure.tight_layout()
+        self.figure.savefig(path)
+
+
+def render_groups(spec, groups, plot_dir, dates):
+    """
+    Render a spec for a list of (key, table) groups with a single reused figure.
+    Module-level, so that it can be run by worker processes.
+    """
+    renderer = FigureRenderer(spec, dates)
+    paths = []
+    for key, table in groups:
+        path = os.path.join(plot_dir, spec['file'].format(key=key))
+        renderer.render(key, table, path)
+        paths.append(path)
+    return paths
+
 
-        for bids in all_not_accepted_bids.values():
+def render_per_group(table, spec, plot_dir, key='bidder_id', workers=None):
+    """
+    Render a spec for every group of a tidy table.
+
+    :param table: Tidy table
+    :param spec: Plot spec (see the module comment)
+    :param plot_dir: Directory to save the plots
+    :param key: Column identifying the groups, None to render the whole table in a single plot
+    :param workers: If greater than 1, the groups are split among this number of worker processes
+    :return: The paths of the saved plots
+    """
+    if key is None:
+        groups = [(None, table)]
+    else:
+        groups = [(group_key, group) for group_key, group in table.groupby(key, sort=False)]
+    if len(groups) == 0:
+        return []
+    dates = 'time_slot' in table.columns and pd.api.types.is_datetime64_any_dtype(table['time_slot'])
+    if workers is None or workers <= 1 or len(groups) == 1:
+        return render_groups(spec, groups, plot_dir, dates)
+    chunks = [groups[i::workers] for i in range(min(workers, len(groups)))]
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        results = executor.map(render_groups, [spec] * len(chunks), chunks, [plot_dir] * len(chunks),
+                               [dates] * len(chunks))
+        return [path for paths in results for path in paths]
+
+
+def render_overlay(table, spec, plot_dir, key='bidder_id'):
+    """
+    Render all the groups of a tidy table in a single plot, a series per group (e.g. all the bidders rewards).
+    The series of the spec is used as a template, its label is formatted with the group identifier as {key}.
+    """
+    template = spec['series'][0]
+    series = []
+    for group_key in pd.unique(table[key]):
+        column = '%s__%s' % (template['column'], group_key)
+        series.append(dict(template, column=column, label=template.get('label', '{key}').format(key=group_key)))
+    wide = table.copy()
+    for group_key in pd.unique(table[key]):
+        wide['%s__%s' % (template['column'], group_key)] = table[template['column']].where(table[key] == group_key)
+    return render_per_group(wide, dict(spec, series=series), plot_dir, key=None)
+
+
+def get_cached_renderer(name, spec, dates):
+    """
+    Return a renderer kept across calls, e.g. for the plots written at every simulation step.
+    At most FIGURE_CACHE_SIZE renderers are kept, releasing the least recently used ones.
+    """
+    if name in FIGURE_CACHE:
+        FIGURE_CACHE.move_to_end(name)
+        return FIGURE_CACHE[name]
+    FIGURE_CACHE[name] = FigureRenderer(spec, dates)
+    while len(FIGURE_CACHE) > FIGURE_CACHE_SIZE:
+        FIGURE_CACHE.popitem(last=False)
+    return FIGURE_CACHE[name]
+
+
+def clear_figure_cache():
+    """
+    Release all the renderers kept by get_cached_renderer, e.g. at the end of a simulation.
+    """
+    FIGURE_CACHE.clear()
+
+
+# -----------------------------------------------------------------------------
+# Reports
+# -----------------------------------------------------------------------------
+def write_report(report_dir, bids=None, history=None, buyers=None, plots=()):
+    """
+    Write a single HTML report (summary tables and embedded plots) and the tidy tables as CSV files, instead of a
+    PNG per bidder.
+
+    :param report_dir: Directory of the report
+    :param bids: Tidy table of the bids (see bids_to_table)
+    :param history: Tidy table of the clearing history (see history_to_table)
+    :param buyers: Tidy table of the buyers (see buyers_to_table)
+    :param plots: Paths of PNG files to embed in the report
+    :return: The path of the HTML report
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    sections = []
+    for name, table in [('bids', bids), ('history', history), ('buyers', buyers)]:
+        if table is None:
+            continue
+        table.to_csv(os.path.join(report_dir, '%s.csv' % name), index=False)
+        if name == 'bids' and len(table) > 0:
+            summary = table.groupby('bidder_id').agg(bids=('accepted', 'size'), accepted=('accepted', 'sum'),
+                                                     mean_price=('price', 'mean'), total_reward=('reward', 'sum'))
+        elif name == 'history' and len(table) > 0:
+            summary = table.groupby('bidder_id').agg(allocations=('reward', 'size'),
+                                                     allocated=('allocated_flexibility', 'sum'),
+                                                     provided=('provided_flexibility', 'sum'),
+                                                     total_reward=('reward', 'sum'))
+        elif name == 'buyers' and len(table) > 0:
+            summary = table.groupby('buyer_id').agg(total_demand=('demand', 'sum'), mean_wtp=('wtp', 'mean'))
+        else:
+            continue
+        sections.append('<h2>%s</h2>\n%s' % (html.escape(name.capitalize()), summary.to_html(float_format='%.3f')))
+
+    for path in plots:
+        with open(path, 'rb') as image_file:
+            data = base64.b64encode(image_file.read()).decode('ascii')
+        sections.append('<h3>%s</h3>\n<img src="data:image/png;base64,%s"/>' %
+                        (html.escape(os.path.basename(path)), data))
+
+    report_file = os.path.join(report_dir, 'report.html')
+    with open(report_file, 'w') as html_file:
+        html_file.write('<html><head><meta charset="utf-8"><title>Market report</title></head><body>\n'
+                        '<h1>Market report</h1>\n%s\n</body></html>\n' % '\n'.join(sections))
+    return report_file
+
+
+# -----------------------------------------------------------------------------
+# Plots
+# -----------------------------------------------------------------------------
+def plot_requests(time_index, df_duck, df_bus, plot_dir, step):
+    table = pd.concat([pd.DataFrame({'time_slot': df_duck.index, 'duck': df_duck['demand'].to_numpy()}),
+                       pd.DataFrame({'time_slot': df_bus.index, 'bus': df_bus['demand'].to_numpy()})])
+    spec = {'file': 'demand_plot_{key}.png', 'title': 'Demand Curves at Time Slot {key}', 'ylabel': 'Demand',
+            'grid': False,
+            'series': [{'column': 'duck', 'label': 'Duck Demand'}, {'column': 'bus', 'label': 'Bus Demand'}]}
+    dates = pd.api.types.is_datetime64_any_dtype(table['time_slot'])
+    renderer = get_cached_renderer('plot_requests', spec, dates)
+    renderer.spec = dict(spec, title='Demand Curves at Time Slot %s' % time_index[step])
+    path = os.path.join(plot_dir, f'demand_plot_{step + 1}.png')
+    renderer.render(None, table, path)
+    return path
+
+def plot_bids_per_bidder(accepted_bids, non_accepted_bids, plot_dir, workers=None):
+    rows = []
+    for bidder_id in accepted_bids.keys():
+        for bids, accepted in [(accepted_bids[bidder_id], True), (non_accepted_bids[bidder_id], False)]:
             for bid in bids:
-                if bid['bidder_id'] == bidder_id:
-                    non_accepted_times.append(bid['time_slot'])
-                    non_accepted_powers.append(bid['power'])
-
-        plt.figure()
-        plt.scatter(accepted_times, accepted_powers, color='green', label='Accepted')
-        plt.scatter(non_accepted_times, non_accepted_powers, color='red', label='Not-Accepted', marker='x')
-        plt.xlabel('Time')
-        plt.ylabel('Power')
-        plt.title(f'Combined Bids for {bidder_id}')
-        plt.legend()
-        plt.grid()
-        plt.savefig(os.path.join(plot_dir, f'combined_bids_{bidder_id}.png'))
-        plt.close()
+                rows.append((bid['time_slot'], bidder_id, bid['power'], bid['price'], accepted))
+    table = pd.DataFrame(rows, columns=['time_slot', 'bidder_id', 'power', 'price', 'accepted'])
+    table['not_accepted'] = ~table['accepted']
+    spec = {'file': 'bids_{key}.png', 'title': 'Bids for {key}', 'ylabel': 'Power', 'grid': False,
+            'series': [{'column': 'power', 'kind': 'scatter', 'cmap': 'viridis', 'c': 'price',
+                        'filter': 'accepted', 'label': 'Accepted Bids'},
+                       {'column': 'power', 'kind': 'scatter', 'cmap': 'coolwarm', 'c': 'price', 'marker': 'x',
+                        'filter': 'not_accepted', 'label': 'Non-Accepted Bids'}]}
+    return render_per_group(table, spec, plot_dir, workers=workers)
+
+def plot_successful_bids_per_bidder(all_accepted_bids, plot_dir, workers=None):
+    return plot_first_bid_per_slot(all_accepted_bids, plot_dir, 'successful_bids_{key}.png',
+                                   'Successful Bids for {key}', workers)
+
+def plot_unsuccessful_bids_per_bidder(all_not_accepted_bids, plot_dir, workers=None):
+    return plot_first_bid_per_slot(all_not_accepted_bids, plot_dir, 'unsuccessful_bids_{key}.png',
+                                   'Unsuccessful Bids for {key}', workers)
+
+def plot_first_bid_per_slot(bids_dict, plot_dir, file, title, workers=None):
+    """
+    Plot the power of the first bid of every bidder in every time slot of the dictionary (missing if none).
+    """
+    table = bids_to_table(bids_dict).drop_duplicates(['time_slot', 'bidder_id'])
+    time_slots = pd.Index(list(bids_dict.keys()), name='time_slot')
+    wide = table.pivot(index='time_slot', columns='bidder_id', values='power').reindex(time_slots)
+    long = wide.reset_index().melt(id_vars='time_slot', var_name='bidder_id', value_name='power')
+    spec = {'file': file, 'title': title, 'ylabel': 'Power', 'legend': False,
+            'series': [{'column': 'power', 'label': title}]}
+    return render_per_group(long, spec, plot_dir, workers=workers)
+
+def plot_combined_bids_per_bidder(all_accepted_bids, all_not_accepted_bids, plot_dir, workers=None):
+    table = bids_to_table(all_accepted_bids, all_not_accepted_bids)
+    table['bid_time_slot'] = [bid['time_slot'] for bids_dict in [all_accepted_bids, all_not_accepted_bids]
+                              for bids in bids_dict.values() for bid in bids]
+    table['not_accepted'] = ~table['accepted']
+    spec = {'file': 'combined_bids_{key}.png', 'title': 'Combined Bids for {key}', 'ylabel': 'Power',
+            'series': [{'column': 'power', 'x': 'bid_time_slot', 'kind': 'scatter', 'color': 'green',
+                        'filter': 'accepted', 'label': 'Accepted'},
+                       {'column': 'power', 'x': 'bid_time_slot', 'kind': 'scatter', 'color': 'red', 'marker': 'x',
+                        'filter': 'not_accepted', 'label': 'Not-Accepted'}]}
+    return render_per_group(table, spec, plot_dir, workers=workers)
 
 def plot_all_accepted_bids(all_accepted_bids, plot_dir):
-    bidders = set()
-    for bids in all_accepted_bids.values():
-        for bid in bids:
-            bidders.add(bid['bidder_id'])
-
-    plt.figure()
-    for bidder_id in bidders:
-        times = []
-        powers = []
-        for time_slot, bids in all_accepted_bids.items():
-            for bid in bids:
-                if bid['bidder_id'] == bidder_id:
-                    times.append(bid['time_slot'])
-                    powers.append(bid['power'])
-        # plt.plot(times, powers, label=f'{bidder_id}')
-        plt.scatter(times, powers, label=f'{bidder_id}')
-
-    plt.xlabel('Time')
-    plt.ylabel('Power')
-    plt.title('Accepted Bids')
-    plt.legend()
-    plt.grid()
-    plt.savefig(os.path.join(plot_dir, 'all_accepted_bids.png'))
-    plt.close()
-
-def plot_buyer_requests_and_wtp(buyers, plot_dir):
-    for buyer in buyers:
-        power_requests = []
-        wtp = []
-        time_index = buyer.demand_curve.index
-        for time_slot in time_index:
-            power_requests.append(buyer.get_demand(time_slot).values[0])
-            wtp.append(buyer.willingness_to_pay)
-
-        fig, ax1 = plt.subplots()
-
-        color = 'tab:blue'
-        ax1.set_xlabel('Time')
-        ax1.set_ylabel('Power Request', color=color)
-        ax1.plot(time_index, power_requests, color=color)
-        ax1.tick_params(axis='y', labelcolor=color)
-        ax1.grid()
-
-        ax2 = ax1.twinx()
-        color = 'tab:red'
-        ax2.set_ylabel('Willingness to Pay', color=color)
-        ax2.plot(time_index, wtp, color=color)
-        ax2.tick_params(axis='y', labelcolor=color)
-        ax2.grid()
-
-        plt.title(f'Power Request and Willingness to Pay for {buyer.id}')
-        fig.tight_layout()
-        plt.savefig(os.path.join(plot_dir, f'buyer_requests_wtp_{buyer.id}.png'))
-        plt.close()
-
-def plot_rewards_per_bidder(all_accepted_bids, plot_dir):
-    bidders_rewards = {}
-
-    # Collect rewards for each bidder
-    for time_slot, bids in all_accepted_bids.items():
-        for bid in bids:
-            bidder_id = bid['bidder_id']
-            reward = bid['reward']
-            if bidder_id not in bidders_rewards:
-                bidders_rewards[bidder_id] = {'time_slots': [], 'rewards': []}
-            bidders_rewards[bidder_id]['time_slots'].append(time_slot)
-            bidders_rewards[bidder_id]['rewards'].append(reward)
-
-    # Plot rewards for each bidder
-    for bidder_id, data in bidders_rewards.items():
-        plt.figure()
-        plt.plot(data['time_slots'], data['rewards'], label=f'Rewards for {bidder_id}')
-        plt.xlabel('Time Step')
-        plt.ylabel('Reward')
-        plt.title(f'Rewards for {bidder_id}')
-        # plt.legend()
-        plt.grid()
-        plt.savefig(os.path.join(plot_dir, f'rewards_{bidder_id}.png'))
-        plt.close()
+    table = bids_to_table(all_accepted_bids)
+    table['time_slot'] = [bid['time_slot'] for bids in all_accepted_bids.values() for bid in bids]
+    spec = {'file': 'all_accepted_bids.png', 'title': 'Accepted Bids', 'ylabel': 'Power',
+            'series': [{'column': 'power', 'kind': 'scatter', 'label': '{key}'}]}
+    return render_overlay(table, spec, plot_dir)
+
+def plot_buyer_requests_and_wtp(buyers, plot_dir, workers=None):
+    spec = {'file': 'buyer_requests_wtp_{key}.png', 'title': 'Power Request and Willingness to Pay for {key}',
+            'ylabel': 'Power Request', 'ylabel2': 'Willingness to Pay', 'ylabel_color': 'tab:blue',
+            'ylabel2_color': 'tab:red', 'legend': False, 'tight': True,
+            'series': [{'column': 'demand', 'color': 'tab:blue'}, {'column': 'wtp', 'color': 'tab:red', 'axis': 2}]}
+    return render_per_group(buyers_to_table(buyers), spec, plot_dir, key='buyer_id', workers=workers)
+
+def plot_rewards_per_bidder(all_accepted_bids, plot_dir, workers=None):
+    spec = {'file': 'rewards_{key}.png', 'title': 'Rewards for {key}', 'xlabel': 'Time Step', 'ylabel': 'Reward',
+            'legend': False, 'series': [{'column': 'reward'}]}
+    return render_per_group(bids_to_table(all_accepted_bids), spec, plot_dir, workers=workers)
 
 
 def plot_all_bidders_rewards(all_accepted_bids, plot_dir):
-    bidders_rewards = {}
-
-    # Collect rewards for each bidder
-    for time_slot, bids in all_accepted_bids.items():
-        for bid in bids:
-            bidder_id = bid['bidder_id']
-            reward = bid['reward']
-            if bidder_id not in bidders_rewards:
-                bidders_rewards[bidder_id] = {'time_slots': [], 'rewards': []}
-            bidders_rewards[bidder_id]['time_slots'].append(time_slot)
-            bidders_rewards[bidder_id]['rewards'].append(reward)
-
-    # Plot rewards for all bidders on the same graph
-    plt.figure()
-    for bidder_id, data in bidders_rewards.items():
-        plt.plot(data['time_slots'], data['rewards'], label=f'{bidder_id}')
-
-    plt.xlabel('Time Step')
-    plt.ylabel('Reward')
-    plt.title('Rewards for All Bidders')
-    plt.legend()
-    plt.grid()
-    plt.savefig(os.path.join(plot_dir, 'all_bidders_rewards.png'))
-    plt.close()
-
-def plot_flexibility_from_history(market_operator, plot_dir):
-    """
-    Plot the bidded flexibility and the real provided flexibility for each bidder using clearing_results_history.
+    spec = {'file': 'all_bidders_rewards.png', 'title': 'Rewards for All Bidders', 'xlabel': 'Time Step',
+            'ylabel': 'Reward', 'series': [{'column': 'reward', 'label': '{key}'}]}
+    return render_overlay(bids_to_table(all_accepted_bids), spec, plot_dir)
+
+def plot_flexibility_from_history(market_operator, plot_dir, workers=None):
+    """
+    Plot the bidded flexibility and the real provided flexibility for each bidder using the clearing history.
 
     :param market_operator: MarketOperator object
     :param plot_dir: Directory to save the plots
+    :param workers: Number of worker processes rendering the plots (optional)
     """
-    bidder_data = {}
-
-    # Aggregate data for each bidder
-    for time_slot, results in market_operator.clearing_results_history.items():
-        for result in results:
-            allocations = result['allocations']
-            for allocation in allocations:
-                bidder_id = allocation['bidder_id']
-                if bidder_id not in bidder_data:
-                    bidder_data[bidder_id] = {'time_slots': [], 'bidded_flexibility': [], 'real_flexibility': []}
-                bidder_data[bidder_id]['time_slots'].append(time_slot)
-                bidder_data[bidder_id]['bidded_flexibility'].append(allocation['bidded_flexibility'])
-                bidder_data[bidder_id]['real_flexibility'].append(allocation['provided_flexibility'])
-
-    # Plot data for each bidder
-    for bidder_id, data in bidder_data.items():
-        plt.figure(figsize=(10, 6))
-        plt.plot(data['time_slots'], data['bidded_flexibility'], label='Bidded')
-        plt.plot(data['time_slots'], data['real_flexibility'], label='Provided')
-        plt.xlabel('Time Slot')
-        plt.ylabel('Flexibility (MW)')
-        plt.title(f'Flexibility {bidder_id}')
-        plt.legend()
-        plt.grid(True)
-        plt.savefig(f"{plot_dir}/flexibility_{bidder_id}.png")
-        plt.close()
-
-import matplotlib.pyplot as plt
-
-def plot_flexibility_and_rewards_from_history(market_operator, plot_dir):
-    """
-    Plot the bidded flexibility, real provided flexibility, and rewards for each bidder using clearing_results_history.
+    spec = {'file': 'flexibility_{key}.png', 'title': 'Flexibility {key}', 'xlabel': 'Time Slot',
+            'ylabel': 'Flexibility (MW)', 'figsize': (10, 6),
+            'series': [{'column': 'bidded_flexibility', 'label': 'Bidded'},
+                       {'column': 'provided_flexibility', 'label': 'Provided'}]}
+    return render_per_group(history_to_table(market_operator), spec, plot_dir, workers=workers)
+
+def plot_flexibility_and_rewards_from_history(market_operator, plot_dir, workers=None):
+    """
+    Plot the bidded flexibility, real provided flexibility, and rewards for each bidder using the clearing history.
 
     :param market_operator: MarketOperator object
     :param plot_dir: Directory to save the plots
+    :param workers: Number of worker processes rendering the plots (optional)
+    """
+    spec = {'file': 'flexibility_rewards_{key}.png', 'title': 'Flexibility and Rewards for Bidder {key}',
+            'xlabel': 'Time Slot', 'ylabel': 'Flexibility (MW)', 'ylabel2': 'Rewards', 'ylabel_color': 'tab:blue',
+            'ylabel2_color': 'tab:red', 'figsize': (10, 6), 'legend_loc': 'upper left', 'tight': True,
+            'series': [{'column': 'bidded_flexibility', 'label': 'Bidded', 'color': 'tab:blue'},
+                       {'column': 'provided_flexibility', 'label': 'Provided', 'color': 'tab:green'},
+                       {'column': 'reward', 'label': 'Rewards', 'color': 'tab:red', 'axis': 2}]}
+    return render_per_group(history_to_table(market_operator), spec, plot_dir, workers=workers)
+
+def plot_flexibility_requested_and_rewards_from_history(market_operator, plot_dir, workers=None):
     """
-    bidder_data = {}
-
-    # Aggregate data for each bidder
-    for time_slot, results in market_operator.clearing_results_history.items():
-        for result in results:
-            allocations = result['allocations']
-            for allocation in allocations:
-                bidder_id = allocation['bidder_id']
-                if bidder_id not in bidder_data:
-                    bidder_data[bidder_id] = {'time_slots': [], 'bidded_flexibility': [], 'real_flexibility': [], 'rewards': []}
-                bidder_data[bidder_id]['time_slots'].append(time_slot)
-                bidder_data[bidder_id]['bidded_flexibility'].append(allocation['bidded_flexibility'])
-                bidder_data[bidder_id]['real_flexibility'].append(allocation['provided_flexibility'])
-                bidder_data[bidder_id]['rewards'].append(allocation['reward'])
-
-    # Plot data for each bidder
-    for bidder_id, data in bidder_data.items():
-        fig, ax1 = plt.subplots(figsize=(10, 6))
-
-        ax1.set_xlabel('Time Slot')
-        ax1.set_ylabel('Flexibility (MW)', color='tab:blue')
-        ax1.plot(data['time_slots'], data['bidded_flexibility'], label='Bidded', color='tab:blue')
-        ax1.plot(data['time_slots'], data['real_flexibility'], label='Provided', color='tab:green')
-        ax1.tick_params(axis='y', labelcolor='tab:blue')
-        ax1.legend(loc='upper left')
-        ax1.grid(True)
-
-        ax2 = ax1.twinx()
-        ax2.set_ylabel('Rewards', color='tab:red')
-        ax2.plot(data['time_slots'], data['rewards'], label='Rewards', color='tab:red')
-        ax2.tick_params(axis='y', labelcolor='tab:red')
-        # ax2.legend(loc='upper right')
-
-        plt.title(f'Flexibility and Rewards for Bidder {bidder_id}')
-        fig.tight_layout()
-        plt.savefig(f"{plot_dir}/flexibility_rewards_{bidder_id}.png")
-        plt.close()
-
-import matplotlib.pyplot as plt
-
-def plot_flexibility_requested_and_rewards_from_history(market_operator, plot_dir):
-    """
-    Plot the requested flexibility, bidded flexibility, real provided flexibility, and rewards for each bidder using clearing_results_history.
+    Plot the requested flexibility, bidded flexibility, real provided flexibility, and rewards for each bidder
+    using the clearing history.
 
     :param market_operator: MarketOperator object
     :param plot_dir: Directory to save the plots
+    :param workers: Number of worker processes rendering the plots (optional)
     """
-    bidder_data = {}
-
-    # Aggregate data for each bidder
-    for time_slot, results in market_operator.clearing_results_history.items():
-        for result in results:
-            allocations = result['allocations']
-            for allocation in allocations:
-                bidder_id = allocation['bidder_id']
-                if bidder_id not in bidder_data:
-                    bidder_data[bidder_id] = {'time_slots': [], 'requested_flexibility': [], 'bidded_flexibility': [], 'real_flexibility': [], 'rewards': []}
-                bidder_data[bidder_id]['time_slots'].append(time_slot)
-                bidder_data[bidder_id]['requested_flexibility'].append(allocation['requested_flexibility'])
-                bidder_data[bidder_id]['bidded_flexibility'].append(allocation['bidded_flexibility'])
-                bidder_data[bidder_id]['real_flexibility'].append(allocation['provided_flexibility'])
-                bidder_data[bidder_id]['rewards'].append(allocation['reward'])
-
-    # Plot data for each bidder
-    for bidder_id, data in bidder_data.items():
-        fig, ax1 = plt.subplots(figsize=(10, 6))
-
-        ax1.set_xlabel('Time Slot')
-        ax1.set_ylabel('Flexibility (MW)', color='tab:blue')
-        ax1.plot(data['time_slots'], data['requested_flexibility'], label='Requested', color='tab:blue')
-        ax1.plot(data['time_slots'], data['bidded_flexibility'], label='Bidded', color='tab:orange')
-        ax1.plot(data['time_slots'], data['real_flexibility'], label='Provided', color='tab:green')
-        ax1.tick_params(axis='y', labelcolor='tab:blue')
-        ax1.legend(loc='upper left')
-        ax1.grid(True)
-
-        ax2 = ax1.twinx()
-        ax2.set_ylabel('Rewards', color='tab:red')
-        ax2.plot(data['time_slots'], data['rewards'], label='Rewards', color='tab:red')
-        ax2.tick_params(axis='y', labelcolor='tab:red')
-        # ax2.legend(loc='upper right')
-
-        plt.title(f'Flexibility and Rewards [{bidder_id}]')
-        fig.tight_layout()
-        plt.savefig(f"{plot_dir}/flexibility_requested_rewards_{bidder_id}.png")
-        plt.close()
\ No newline at end of file
+    spec = {'file': 'flexibility_requested_rewards_{key}.png', 'title': 'Flexibility and Rewards [{key}]',
+            'xlabel': 'Time Slot', 'ylabel': 'Flexibility (MW)', 'ylabel2': 'Rewards', 'ylabel_color': 'tab:blue',
+            'ylabel2_color': 'tab:red', 'figsize': (10, 6), 'legend_loc': 'upper left', 'tight': True,
+            'series': [{'column': 'requested_flexibility', 'label': 'Requested', 'color': 'tab:blue'},
+                       {'column': 'bidded_flexibility', 'label': 'Bidded', 'color': 'tab:orange'},
+                       {'column': 'provided_flexibility', 'label': 'Provided', 'color': 'tab:green'},
+                       {'column': 'reward', 'label': 'Rewards', 'color': 'tab:red', 'axis': 2}]}
+    return render_per_group(history_to_table(market_operator), spec, plot_dir, workers=workers)
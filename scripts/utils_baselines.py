@@ -1,81 +1,185 @@
+import functools
+
 import pandas as pd
 import numpy as np
 
-def generate_pattern(segments, time_index):
-    vals = []
-    for val, count in segments:
-        vals.extend([val] * count)
+# Daily shapes as (value, number of 15 minutes slots) segments
+RESIDENTIAL_SEGMENTS = (
+    (0.05, 6 * 4),  # 0:00–6:00
+    (0.20, 2 * 4),  # 6:00–8:00
+    (0.35, 8 * 4),  # 8:00–16:00
+    (0.45, 4 * 4),  # 16:00–20:00
+    (0.15, 4 * 4),  # 20:00–24:00
+)
+OFFICE_SEGMENTS = (
+    (0.01, 7 * 4),  # 0:00–7:00
+    (0.25, 1 * 4),  # 7:00–8:00
+    (0.40, 9 * 4),  # 8:00–17:00
+    (0.30, 3 * 4),  # 17:00–20:00
+    (0.10, 4 * 4),  # 20:00–24:00
+)
+COMMERCIAL_SEGMENTS1 = (
+    (0.10, 6 * 4),  # 0:00–6:00
+    (0.20, 6 * 4),  # 6:00–12:00
+    (0.45, 6 * 4),  # 12:00–18:00
+    (0.30, 6 * 4),  # 18:00–24:00
+)
+COMMERCIAL_SEGMENTS2 = (
+    (0.05, 6 * 4),
+    (0.20, 2 * 4),
+    (0.40, 8 * 4),
+    (0.35, 4 * 4),
+    (0.15, 4 * 4),
+)
+BATTERY_SEGMENTS = (
+    (0.30, 4 * 4),  # 0:00–4:00 charging
+    (-0.20, 2 * 4),  # 4:00–6:00 discharging
+    (0.25, 10 * 4),  # 6:00–16:00 charging
+    (-0.15, 4 * 4),  # 16:00–20:00 discharging
+    (0.10, 4 * 4),  # 20:00–24:00 light charging
+)
+PATTERN_SEGMENTS = {
+    'residential': RESIDENTIAL_SEGMENTS,
+    'office': OFFICE_SEGMENTS,
+    'commercial1': COMMERCIAL_SEGMENTS1,
+    'commercial2': COMMERCIAL_SEGMENTS2,
+    'battery': BATTERY_SEGMENTS,
+}
+
+@functools.lru_cache(maxsize=None)
+def get_daily_shape(segments):
+    """
+    Return the values of a daily shape, one per slot. The array is cached and read-only.
+
+    :param segments: Tuple of (value, number of slots) couples
+    :return: Numpy array
+    """
+    values, counts = zip(*segments)
+    shape = np.repeat(np.array(values, dtype=float), counts)
+    shape.flags.writeable = False
+    return shape
 
+def generate_pattern_values(segments, n_slots):
+    """
+    Return the values of a shape repeated to cover n_slots slots.
+    """
+    return np.resize(get_daily_shape(tuple(segments)), n_slots)
+
+def generate_pattern(segments, time_index):
     # Repeat the pattern if time_index is longer than the segments
-    while len(vals) < len(time_index):
-        vals.extend(vals)
+    return pd.DataFrame({"value": generate_pattern_values(segments, len(time_index))}, index=time_index)
 
-    return pd.DataFrame({"value": vals[:len(time_index)]}, index=time_index)
+def generate_fleet_patterns(shapes, shape_ids, n_slots, scale=1.0, noise=0.0, phase_shift=0, rng=None):
+    """
+    Generate the profiles of a fleet of bidders as a single matrix.
+
+    The profile of a bidder is its shape, delayed by phase_shift slots and repeated to cover n_slots slots,
+    multiplied by scale and by (1 + noise * N(0, 1)) slot by slot.
+
+    :param shapes: Sequence of shapes, as tuples of segments (see PATTERN_SEGMENTS) or arrays of slot values
+    :param shape_ids: Index in shapes of the shape of every bidder
+    :param n_slots: Number of slots
+    :param scale: Scaling factor, scalar or one per bidder
+    :param noise: Standard deviation of the relative noise, scalar or one per bidder
+    :param phase_shift: Delay in slots, scalar or one per bidder
+    :param rng: Numpy Generator, needed only if noise is not zero
+    :return: Numpy array (bidders x slots)
+    """
+    shape_ids = np.asarray(shape_ids, dtype=int)
+    n_bidders = len(shape_ids)
+    phase_shift = np.broadcast_to(np.asarray(phase_shift, dtype=int), (n_bidders,))
+    slots = np.arange(n_slots)
+
+    patterns = np.empty((n_bidders, n_slots))
+    for shape_id in np.unique(shape_ids):
+        shape = shapes[shape_id]
+        shape = get_daily_shape(tuple(shape)) if isinstance(shape[0], tuple) else np.asarray(shape, dtype=float)
+        rows = np.flatnonzero(shape_ids == shape_id)
+        patterns[rows] = shape[(slots[None, :] - phase_shift[rows, None]) % len(shape)]
+
+    patterns *= np.asarray(scale, dtype=float).reshape(-1, 1) if np.ndim(scale) > 0 else scale
+    if np.any(np.asarray(noise) != 0):
+        if rng is None:
+            raise ValueError("A random generator is needed to add noise")
+        noise = np.asarray(noise, dtype=float).reshape(-1, 1) if np.ndim(noise) > 0 else noise
+        patterns *= 1.0 + noise * rng.standard_normal((n_bidders, n_slots))
+    return patterns
+
+def create_random_fleet_patterns(n_bidders, n_slots, rng, scale_range=(10.0, 30.0), noise=0.0, max_phase_shift=0,
+                                 pattern_names=None):
+    """
+    Generate the profiles of a fleet of bidders with random shapes, scales and phase shifts.
+
+    :param n_bidders: Number of bidders
+    :param n_slots: Number of slots
+    :param rng: Numpy Generator
+    :param scale_range: Range of the uniform scaling factors
+    :param noise: Standard deviation of the relative noise
+    :param max_phase_shift: Maximum absolute phase shift in slots
+    :param pattern_names: Names of the shapes in PATTERN_SEGMENTS, all of them if None
+    :return: The matrix (bidders x slots) and the name of the shape of every bidder
+    """
+    pattern_names = list(PATTERN_SEGMENTS) if pattern_names is None else list(pattern_names)
+    shape_ids = rng.integers(0, len(pattern_names), n_bidders)
+    scale = rng.uniform(scale_range[0], scale_range[1], n_bidders)
+    phase_shift = rng.integers(-max_phase_shift, max_phase_shift + 1, n_bidders)
+    patterns = generate_fleet_patterns([PATTERN_SEGMENTS[name] for name in pattern_names], shape_ids, n_slots,
+                                       scale=scale, noise=noise, phase_shift=phase_shift, rng=rng)
+    return patterns, [pattern_names[i] for i in shape_ids]
 
 ###############################################################################
 # Residential-like pattern
 ###############################################################################
 def create_residential_like_pattern(time_index):
-    segments = [
-        (0.05, 6 * 4),  # 0:00–6:00
-        (0.20, 2 * 4),  # 6:00–8:00
-        (0.35, 8 * 4),  # 8:00–16:00
-        (0.45, 4 * 4),  # 16:00–20:00
-        (0.15, 4 * 4),  # 20:00–24:00
-    ]
-    return generate_pattern(segments, time_index)
+    return generate_pattern(RESIDENTIAL_SEGMENTS, time_index)
 
 ###############################################################################
 # Office-like pattern
 ###############################################################################
 def create_office_like_pattern(time_index):
-    segments = [
-        (0.01, 7 * 4),  # 0:00–7:00
-        (0.25, 1 * 4),  # 7:00–8:00
-        (0.40, 9 * 4),  # 8:00–17:00
-        (0.30, 3 * 4),  # 17:00–20:00
-        (0.10, 4 * 4),  # 20:00–24:00
-    ]
-    return generate_pattern(segments, time_index)
+    return generate_pattern(OFFICE_SEGMENTS, time_index)
 
 ###############################################################################
 # Commercial-like pattern 1
 ###############################################################################
 def create_commercial_like_pattern1(time_index):
-    # Bidder C: Commercial-like pattern
-    segments = [
-        (0.10, 6 * 4),  # 0:00–6:00
-        (0.20, 6 * 4),  # 6:00–12:00
-        (0.45, 6 * 4),  # 12:00–18:00
-        (0.30, 6 * 4),  # 18:00–24:00
-    ]
-    return generate_pattern(segments, time_index)
+    return generate_pattern(COMMERCIAL_SEGMENTS1, time_index)
 
 ###############################################################################
 # Commercial-like pattern 2
 ###############################################################################
 def create_commercial_like_pattern2(time_index):
-    segments = [
-        (0.05, 6 * 4),
-        (0.20, 2 * 4),
-        (0.40, 8 * 4),
-        (0.35, 4 * 4),
-        (0.15, 4 * 4),
-    ]
-    return generate_pattern(segments, time_index)
+    return generate_pattern(COMMERCIAL_SEGMENTS2, time_index)
 
 ###############################################################################
 # Battery that can discharge (negative load)
 ###############################################################################
 def create_battery_pattern(time_index):
-    segments = [
-        (0.30, 4 * 4),  # 0:00–4:00 charging
-        (-0.20, 2 * 4),  # 4:00–6:00 discharging
-        (0.25, 10 * 4),  # 6:00–16:00 charging
-        (-0.15, 4 * 4),  # 16:00–20:00 discharging
-        (0.10, 4 * 4),  # 20:00–24:00 light charging
-    ]
-    return generate_pattern(segments, time_index)
+    return generate_pattern(BATTERY_SEGMENTS, time_index)
+
+# Daily duck and bus curves, one value per 15 minutes slot
+DUCK_BASE = np.array([
+    0.4, 0.3, 0.25, 0.25, 0.3, 0.3, 0.2, 0.2, 0.2, 0.2, 0.2, 0.25,
+    0.3, 0.3, 0.35, 0.4, 0.45, 0.5, 0.6, 0.7, 0.8, 0.8, 0.8, 0.7,
+    0.6, 0.5, 0.4, 0.35, 0.3, 0.3, 0.3, 0.25, 0.2, 0.15, 0.1, 0.1,
+    0.1, 0.1, 0.2, 0.3, 0.4, 0.4, 0.5, 0.55, 0.6, 0.7, 0.8, 0.85,
+    0.9, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.9, 0.9, 0.8, 0.8,
+    0.7, 0.7, 0.7, 0.6, 0.5, 0.4, 0.4, 0.35, 0.3, 0.2, 0.2, 0.2,
+    0.25, 0.3, 0.3, 0.4, 0.5, 0.7, 0.9, 1.0, 1.1, 1.2, 1.2, 1.1,
+    1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.5, 0.4, 0.3, 0.2, 0.2, 0.2
+])
+DUCK_BASE.flags.writeable = False
+BUS_BASE = np.array([
+    0.0, 0.0, 0.0, 0.2, 0.5, 0.5, 0.5, 0.5, 0.3, 0.3, 0.3, 0.2,
+    0.2, 0.2, 0.3, 0.4, 0.5, 1.0, 1.2, 1.2, 1.2, 1.2, 1.2, 1.0,
+    0.8, 0.6, 0.3, 0.3, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.5, 0.5,
+    1.0, 1.5, 1.5, 1.5, 1.5, 1.2, 1.0, 0.8, 0.8, 0.8, 0.8, 0.8,
+    0.8, 0.8, 0.8, 0.8, 1.0, 1.0, 1.0, 1.0, 1.2, 1.2, 1.2, 1.0,
+    0.8, 0.6, 0.6, 0.5, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.8, 1.0,
+    1.0, 1.2, 1.2, 1.2, 1.2, 1.0, 0.8, 0.6, 0.5, 0.5, 0.4, 0.3,
+    0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.4, 0.6, 0.8, 1.0
+])
+BUS_BASE.flags.writeable = False
 
 def create_duck_curve_pattern(time_index, num_days):
     """
@@ -85,17 +189,7 @@ def create_duck_curve_pattern(time_index, num_days):
     :param num_days: Number of days to repeat the pattern
     :return: Pandas DataFrame with the duck curve pattern
     """
-    duck_base = np.array([
-        0.4, 0.3, 0.25, 0.25, 0.3, 0.3, 0.2, 0.2, 0.2, 0.2, 0.2, 0.25,
-        0.3, 0.3, 0.35, 0.4, 0.45, 0.5, 0.6, 0.7, 0.8, 0.8, 0.8, 0.7,
-        0.6, 0.5, 0.4, 0.35, 0.3, 0.3, 0.3, 0.25, 0.2, 0.15, 0.1, 0.1,
-        0.1, 0.1, 0.2, 0.3, 0.4, 0.4, 0.5, 0.55, 0.6, 0.7, 0.8, 0.85,
-        0.9, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.9, 0.9, 0.8, 0.8,
-        0.7, 0.7, 0.7, 0.6, 0.5, 0.4, 0.4, 0.35, 0.3, 0.2, 0.2, 0.2,
-        0.25, 0.3, 0.3, 0.4, 0.5, 0.7, 0.9, 1.0, 1.1, 1.2, 1.2, 1.1,
-        1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.5, 0.4, 0.3, 0.2, 0.2, 0.2
-    ])
-    duck_base = np.tile(duck_base, num_days)
+    duck_base = np.tile(DUCK_BASE, num_days)
     df_duck = pd.DataFrame({'demand': duck_base}, index=time_index)
     return df_duck
 
@@ -107,16 +201,6 @@ def create_bus_curve_pattern(time_index, num_days):
     :param num_days: Number of days to repeat the pattern
     :return: Pandas DataFrame with the bus curve pattern
     """
-    bus_base = np.array([
-        0.0, 0.0, 0.0, 0.2, 0.5, 0.5, 0.5, 0.5, 0.3, 0.3, 0.3, 0.2,
-        0.2, 0.2, 0.3, 0.4, 0.5, 1.0, 1.2, 1.2, 1.2, 1.2, 1.2, 1.0,
-        0.8, 0.6, 0.3, 0.3, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.5, 0.5,
-        1.0, 1.5, 1.5, 1.5, 1.5, 1.2, 1.0, 0.8, 0.8, 0.8, 0.8, 0.8,
-        0.8, 0.8, 0.8, 0.8, 1.0, 1.0, 1.0, 1.0, 1.2, 1.2, 1.2, 1.0,
-        0.8, 0.6, 0.6, 0.5, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.8, 1.0,
-        1.0, 1.2, 1.2, 1.2, 1.2, 1.0, 0.8, 0.6, 0.5, 0.5, 0.4, 0.3,
-        0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.4, 0.6, 0.8, 1.0
-    ])
-    bus_base = np.tile(bus_base, num_days)
+    bus_base = np.tile(BUS_BASE, num_days)
     df_bus = pd.DataFrame({'demand': bus_base}, index=time_index)
     return df_bus
\ No newline at end of file
@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime
+from classes.bid_book import BidBook
+
+class TestBidBook(unittest.TestCase):
+
+    def setUp(self):
+        self.bid_book = BidBook()
+        self.time_slot = datetime(2025, 1, 1, 0, 0)
+
+    def test_bid_ids(self):
+        bid_id_1 = self.bid_book.add_bid(self.time_slot, {'bidder_id': 'bidder1', 'buyer_id': 'buyer1', 'power': 50,
+                                                          'price': 40})
+        bid = {'bidder_id': 'bidder2', 'buyer_id': 'buyer1', 'power': 50, 'price': 40}
+        bid_id_2 = self.bid_book.add_bid(self.time_slot, bid)
+        self.assertNotEqual(bid_id_1, bid_id_2)
+        self.assertEqual(bid['bid_id'], bid_id_2)
+        self.assertIs(self.bid_book.get_bid(bid_id_2), bid)
+
+    def test_merit_order(self):
+        for bidder_id, buyer_id, price in [('bidder1', 'buyer1', 45), ('bidder2', 'buyer1', 40),
+                                           ('bidder3', 'buyer2', 30), ('bidder4', 'buyer1', 45),
+                                           ('bidder5', 'buyer1', 55)]:
+            self.bid_book.add_bid(self.time_slot, {'bidder_id': bidder_id, 'buyer_id': buyer_id, 'power': 10,
+                                                   'price': price})
+        merit_order = self.bid_book.get_merit_order(self.time_slot, 'buyer1')
+        self.assertEqual([bid['bidder_id'] for bid in merit_order], ['bidder2', 'bidder1', 'bidder4', 'bidder5'])
+        merit_order = self.bid_book.get_merit_order(self.time_slot, 'buyer1', max_price=45)
+        self.assertEqual([bid['bidder_id'] for bid in merit_order], ['bidder2', 'bidder1', 'bidder4'])
+        self.assertEqual(self.bid_book.get_merit_order(self.time_slot, 'buyer3'), [])
+        self.assertEqual(sorted(self.bid_book.get_buyer_ids(self.time_slot)), ['buyer1', 'buyer2'])
+
+    def test_add_bids(self):
+        bids = [('bidder%i' % i, 'buyer%i' % (i % 2), price) for i, price in enumerate([45, 40, 30, 45, 55, 40, 30])]
+        for bidder_id, buyer_id, price in bids[:3]:
+            self.bid_book.add_bid(self.time_slot, {'bidder_id': bidder_id, 'buyer_id': buyer_id, 'price': price})
+        bulk_book = BidBook()
+        bulk_book.add_bids([self.time_slot] * 3, [{'bidder_id': b, 'buyer_id': k, 'price': p} for b, k, p in bids[:3]])
+        for bidder_id, buyer_id, price in bids[3:]:
+            self.bid_book.add_bid(self.time_slot, {'bidder_id': bidder_id, 'buyer_id': buyer_id, 'price': price})
+        bid_ids = bulk_book.add_bids([self.time_slot] * 4, [{'bidder_id': b, 'buyer_id': k, 'price': p}
+                                                            for b, k, p in bids[3:]])
+        self.assertEqual(bid_ids, [3, 4, 5, 6])
+        self.assertEqual(bulk_book.merit_orders, self.bid_book.merit_orders)
+
+if __name__ == '__main__':
+    unittest.main()
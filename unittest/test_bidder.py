@@ -1,4 +1,5 @@
 import unittest
+import pandas as pd
 from classes.bidder import Bidder
 
 class TestBidder(unittest.TestCase):
@@ -64,5 +65,35 @@ class TestBidder(unittest.TestCase):
         selected_buyer = self.bidder.select_buyer(buyers_info)
         self.assertIn(selected_buyer['id'], ['buyer1', 'buyer2'])
 
+    def test_build_offers(self):
+        time_index = pd.date_range(start='2025-01-01', periods=8, freq='15min')
+        self.bidder.baseline = pd.DataFrame({'value': [float(i) for i in range(8)]}, index=time_index)
+        self.bidder.update_history('buyer1', time_index[0], 40, 100, True)
+        self.bidder.update_history('buyer2', time_index[0], 50, 150, False)
+        buyer_requests = {}
+        for i, time_slot in enumerate(time_index[:-1]):
+            buyer_requests[time_slot] = [{'id': 'buyer1', 'requested_power': 10.0 * (i % 3), 'wtp': 50},
+                                         {'id': 'buyer2', 'requested_power': 15.0 * i, 'wtp': 60},
+                                         {'id': 'buyer3', 'requested_power': 12.0 * i, 'wtp': 60}]
+        offers = self.bidder.build_offers(time_index, buyer_requests, power_factor=0.8)
+        self.assertEqual(list(offers.columns), ['time_slot', 'bidder_id', 'buyer_id', 'power', 'price'])
+        self.assertEqual(list(offers['time_slot']), list(time_index[:-1]))
+        for row in offers.itertuples():
+            best_buyer = self.bidder.select_buyer(buyer_requests[row.time_slot])
+            price, power = self.bidder.build_offer(best_buyer['id'], pow_bid=self.bidder.baseline.loc[
+                row.time_slot, 'value'] * 0.8)
+            self.assertEqual((row.buyer_id, row.price, row.power), (best_buyer['id'], price, power))
+        self.assertTrue((offers['bidder_id'] == 'bidder1').all())
+        self.assertEqual(len(self.bidder.build_offers(time_index, {})), 0)
+
+    def test_actual_values(self):
+        time_index = pd.date_range(start='2025-01-01', periods=4, freq='15min')
+        self.bidder.add_actual_value(time_index[3], 2.0)
+        self.bidder.add_actual_value(time_index[1], 1.0)
+        self.assertEqual(self.bidder.get_actual_value(time_index[1]), 1.0)
+        self.assertIsNone(self.bidder.get_actual_value(time_index[2]))
+        self.assertEqual(list(self.bidder.actual_values.index), [time_index[1], time_index[3]])
+        self.assertEqual(list(self.bidder.actual_values['value']), [1.0, 2.0])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
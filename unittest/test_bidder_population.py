@@ -0,0 +1,105 @@
+import unittest
+import numpy as np
+from classes.bidder import Bidder
+from classes.bidder_population import BidderPopulation
+
+class TestBidderPopulation(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.bidders = [Bidder(id='bidder%i' % i, alpha=float(rng.uniform(0, 1)), beta=float(rng.uniform(0, 1)),
+                               gamma=float(rng.uniform(0, 1)), L=int(rng.integers(1, 8)),
+                               w1=float(rng.uniform(0.5, 1.5)), w2=float(rng.uniform(0.5, 1.5)),
+                               w3=float(rng.uniform(0.5, 1.5))) for i in range(20)]
+        self.population = BidderPopulation.from_bidders(self.bidders, initial_buyers=1)
+        self.buyer_ids = ['buyer%i' % i for i in range(5)]
+        self.rng = rng
+
+    def random_updates(self, n):
+        updates = []
+        for _ in range(n):
+            updates.append(('bidder%i' % self.rng.integers(0, len(self.bidders)),
+                            self.buyer_ids[self.rng.integers(0, 4)],
+                            float(self.rng.choice([0.1, 0.2, 0.3, 17.3, 40.1])),
+                            float(self.rng.uniform(0, 10)),
+                            bool(self.rng.random() < 0.6)))
+        for bidder_id, buyer_id, price, power, accepted in updates:
+            self.bidders[int(bidder_id[6:])].update_history(buyer_id, None, price, power, accepted)
+        self.population.update_history(*zip(*updates))
+
+    def test_identical_stats(self):
+        self.random_updates(400)
+        stats = self.population.get_buyer_stats()
+        for b, bidder in enumerate(self.bidders):
+            for buyer_id in self.buyer_ids:
+                k = self.population.buyers.get(buyer_id, -1)
+                self.assertEqual(bidder.get_buyer_stats(buyer_id), tuple(float(stat[b, k]) for stat in stats))
+
+    def test_identical_offers(self):
+        buyers_info = [{'id': buyer_id, 'requested_power': float(self.rng.uniform(0, 100)), 'wtp': 50.0}
+                       for buyer_id in self.buyer_ids]
+        for step in range(10):
+            self.random_updates(30)
+            self.population.set_reference_values(80.0 + step, 0.0 if step % 2 else 30.0)
+            for bidder in self.bidders:
+                bidder.set_reference_values(80.0 + step, 0.0 if step % 2 else 30.0)
+
+            priorities = self.population.compute_priorities(buyers_info)
+            selected = self.population.select_buyers(buyers_info)
+            for b, bidder in enumerate(self.bidders):
+                self.assertEqual([bidder.compute_priority(info['id'], info['requested_power'], info['wtp'])
+                                  for info in buyers_info], priorities[b].tolist())
+                self.assertIs(bidder.select_buyer(buyers_info), buyers_info[selected[b]])
+
+            buyer_ids = [buyers_info[k]['id'] for k in selected]
+            pow_bids = self.rng.uniform(0, 10, len(self.bidders))
+            prices, powers = self.population.build_offers(buyer_ids, pow_bids)
+            for b, bidder in enumerate(self.bidders):
+                self.assertEqual(bidder.build_offer(buyer_ids[b], pow_bid=float(pow_bids[b])),
+                                 (float(prices[b]), float(powers[b])))
+
+    def test_no_buyers(self):
+        self.assertEqual(self.population.select_buyers([]).tolist(), [-1] * len(self.bidders))
+
+    def test_invalid_history_length(self):
+        with self.assertRaises(ValueError):
+            BidderPopulation(['bidder1'], L=-1)
+
+    def test_without_history(self):
+        # Bidders with L = 0 keep no history, as the per-object bidders
+        for bidder in self.bidders[::2]:
+            bidder.L = 0
+        self.population = BidderPopulation.from_bidders(self.bidders, initial_buyers=1)
+        self.random_updates(100)
+        stats = self.population.get_buyer_stats()
+        last_accepted, has_record = self.population.get_last_accepted()
+        for b, bidder in enumerate(self.bidders):
+            for buyer_id in self.buyer_ids:
+                k = self.population.buyers.get(buyer_id, -1)
+                self.assertEqual(bidder.get_buyer_stats(buyer_id), tuple(float(stat[b, k]) for stat in stats))
+            if bidder.L == 0:
+                self.assertFalse(has_record[b].any())
+        buyers_info = [{'id': buyer_id, 'requested_power': 10.0, 'wtp': 50.0} for buyer_id in self.buyer_ids]
+        buyer_ids = [buyers_info[k]['id'] for k in self.population.select_buyers(buyers_info)]
+        prices, powers = self.population.build_offers(buyer_ids, np.full(len(self.bidders), 5.0))
+        for b, bidder in enumerate(self.bidders):
+            self.assertEqual(bidder.build_offer(buyer_ids[b], pow_bid=5.0), (float(prices[b]), float(powers[b])))
+
+    def test_batch_selection(self):
+        self.random_updates(200)
+        pow_req = self.rng.uniform(0, 100, (6, len(self.buyer_ids)))
+        refs = self.rng.uniform(10, 100, (6, 2))
+        selected = self.population.select_buyers_batch(self.buyer_ids, pow_req,
+                                                       np.repeat(refs[:, :1], len(self.bidders), axis=1),
+                                                       np.repeat(refs[:, 1:], len(self.bidders), axis=1))
+        prices = self.population.get_offer_prices(self.buyer_ids)
+        for s in range(6):
+            buyers_info = [{'id': buyer_id, 'requested_power': float(pow_req[s, k]), 'wtp': 50.0}
+                           for k, buyer_id in enumerate(self.buyer_ids)]
+            for b, bidder in enumerate(self.bidders):
+                bidder.set_reference_values(float(refs[s, 0]), float(refs[s, 1]))
+                self.assertIs(bidder.select_buyer(buyers_info), buyers_info[selected[s, b]])
+                self.assertEqual([bidder.build_offer(buyer_id)[0] for buyer_id in self.buyer_ids], prices[b].tolist())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from classes.checkpoint import Checkpoint
+from classes.bid_book import BidBook
+
+def make_state(n_slots):
+    time_index = pd.date_range(start='2025-01-01 00:00', periods=n_slots, freq='15min')
+    bid_book = BidBook()
+    bids_by_slot = {}
+    for time_slot in time_index:
+        bids_by_slot[time_slot] = []
+        for i in range(2):
+            bid = {'bidder_id': 'bidder_%i' % i, 'buyer_id': 'buyer_1', 'power': 1.0 + i, 'price': 0.5 * (i + 1)}
+            bid_book.add_bid(time_slot, bid)
+            bids_by_slot[time_slot].append(bid)
+    return {'bid_book': bid_book, 'bids_by_slot': bids_by_slot, 'values': np.arange(n_slots, dtype=float)}
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.chunked = ('bid_book.bids', 'bids_by_slot')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        checkpoint = Checkpoint(self.folder, chunk_size=4)
+        self.assertFalse(checkpoint.exists())
+        state = make_state(10)
+        checkpoint.save(state, 10, self.chunked)
+        self.assertTrue(checkpoint.exists())
+
+        loaded, step = checkpoint.load()
+        self.assertEqual(step, 10)
+        self.assertEqual(loaded['bid_book'].bids, state['bid_book'].bids)
+        self.assertEqual(list(loaded['bids_by_slot'].keys()), list(state['bids_by_slot'].keys()))
+        np.testing.assert_array_equal(loaded['values'], state['values'])
+        self.assertTrue(loaded['values'].flags.writeable)
+
+        # The bids of the slots are the ones of the bid book
+        for time_slot, bids in loaded['bids_by_slot'].items():
+            for bid in bids:
+                self.assertIs(bid, loaded['bid_book'].bids[bid['bid_id']])
+
+    def test_incremental(self):
+        checkpoint = Checkpoint(self.folder, chunk_size=4)
+        state = make_state(8)
+        checkpoint.save(state, 8, self.chunked)
+        with open(os.path.join(self.folder, Checkpoint.MANIFEST_FILE)) as json_file:
+            chunks = [piece['hash'] for piece in json.load(json_file)['pieces'] if piece['kind'] == 'chunk']
+
+        # Unchanged state, nothing new to write
+        self.assertEqual(checkpoint.save(state, 8, self.chunked)['blobs'], 0)
+
+        # Two new slots: the old chunks are kept, a new chunk per dict is written
+        new_state = make_state(10)
+        checkpoint.save(new_state, 10, self.chunked)
+        with open(os.path.join(self.folder, Checkpoint.MANIFEST_FILE)) as json_file:
+            new_chunks = [piece['hash'] for piece in json.load(json_file)['pieces'] if piece['kind'] == 'chunk']
+        self.assertEqual(len(new_chunks), len(chunks) + 2)
+        self.assertEqual(len(set(new_chunks) - set(chunks)), 2)
+        self.assertEqual(checkpoint.load()[0]['bid_book'].bids, new_state['bid_book'].bids)
+
+        # Only the blobs of the last snapshot are kept
+        self.assertEqual(len(os.listdir(checkpoint.blobs_folder)), len(set(new_chunks)) + 4)
+
+    def test_not_a_dict(self):
+        with self.assertRaises(ValueError):
+            Checkpoint(self.folder).save(make_state(2), chunked=('values',))
+        with self.assertRaises(ValueError):
+            Checkpoint(self.folder, chunk_size=0)
+
+if __name__ == '__main__':
+    unittest.main()
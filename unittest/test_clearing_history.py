@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from classes.clearing_history import ClearingHistory, ALLOCATION_COLUMNS
+
+def make_results(time_slot, n_bidders=2):
+    allocations = []
+    for i in range(n_bidders):
+        allocations.append({
+            'bidder_id': 'bidder_%i' % ((time_slot.hour + i) % 3),
+            'buyer_id': 'buyer_1',
+            'requested_flexibility': 10.0,
+            'bidded_flexibility': 4.0,
+            'provided_flexibility': 3.5,
+            'allocated_flexibility': 4.0,
+            'baseline_value': 20.0,
+            'actual_value': 16.5,
+            'remaining_demand': 10.0 - 4.0 * i,
+            'price': 1.0 + i,
+            'reward': 2.5 * (i + 1)
+        })
+    return {time_slot: [{'buyer_id': 'buyer_1', 'allocations': allocations, 'unfulfilled_demand': 2.0}]}
+
+class TestClearingHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.time_index = pd.date_range(start='2025-01-01 00:00', periods=12, freq='h')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_unbounded(self):
+        history = ClearingHistory()
+        for time_slot in self.time_index:
+            history.add_results(make_results(time_slot))
+        self.assertEqual(list(history.results.keys()), list(self.time_index))
+        self.assertEqual(len(history.query()), 24)
+        self.assertEqual(len(history.query(table='demands')), 12)
+        self.assertEqual(history.segments, [])
+
+    def test_spill_and_query(self):
+        history = ClearingHistory(hot_window=3, segments_folder=self.folder, segment_slots=2)
+        for time_slot in self.time_index:
+            history.add_results(make_results(time_slot))
+            self.assertLessEqual(len(history.results), 4)
+        self.assertGreaterEqual(len(history.results), 3)
+        self.assertEqual(len(history.get_hot_table('allocations')['time_slot']), 2 * len(history.results))
+        self.assertTrue(all(os.path.exists(f) for s in history.segments for f in s['files'].values()))
+
+        df = history.query()
+        self.assertEqual(len(df), 24)
+        self.assertEqual(list(df.columns), ALLOCATION_COLUMNS)
+        self.assertEqual(sorted(df['time_slot'].unique()), list(self.time_index))
+        self.assertEqual(df['reward'].sum(), 12 * (2.5 + 5.0))
+
+        df = history.query(bidder_id='bidder_0', start=self.time_index[2], end=self.time_index[7])
+        self.assertTrue((df['bidder_id'] == 'bidder_0').all())
+        self.assertEqual(len(df), 4)
+        self.assertTrue(df['time_slot'].between(self.time_index[2], self.time_index[7]).all())
+        self.assertEqual(history.query(table='demands')['unfulfilled_demand'].sum(), 24.0)
+
+    def test_segments_pruned(self):
+        history = ClearingHistory(hot_window=2, segments_folder=self.folder, segment_slots=2)
+        for time_slot in self.time_index:
+            history.add_results(make_results(time_slot))
+        read_files = []
+        read_segment = history.read_segment
+        history.read_segment = lambda file_name: read_files.append(file_name) or read_segment(file_name)
+        history.query(start=self.time_index[0], end=self.time_index[1])
+        self.assertEqual(read_files, [history.segments[0]['files']['allocations']])
+
+    def test_without_folder(self):
+        history = ClearingHistory(hot_window=2, segment_slots=1)
+        for time_slot in self.time_index:
+            history.add_results(make_results(time_slot))
+        self.assertEqual(list(history.results.keys()), list(self.time_index[-2:]))
+        self.assertEqual(len(history.query()), 4)
+
+    def test_cleared_again(self):
+        # A time slot cleared again replaces its rows, also after being flushed
+        history = ClearingHistory(hot_window=2, segments_folder=self.folder, segment_slots=1)
+        for time_slot in self.time_index[:4]:
+            history.add_results(make_results(time_slot))
+        for time_slot in [self.time_index[3], self.time_index[0]]:
+            history.add_results(make_results(time_slot, n_bidders=1))
+        df = history.query()
+        self.assertEqual(len(df), 2 + 1 + 2 + 1)
+        self.assertEqual(len(df[df['time_slot'] == self.time_index[0]]), 1)
+        self.assertEqual(len(history.query(table='demands')), 4)
+
+        history = ClearingHistory()
+        history.add_results(make_results(self.time_index[0]))
+        history.add_results(make_results(self.time_index[0], n_bidders=1))
+        self.assertEqual(len(history.query()), 1)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            ClearingHistory(segment_format='xlsx')
+        with self.assertRaises(ValueError):
+            ClearingHistory(hot_window=0)
+
+if __name__ == '__main__':
+    unittest.main()
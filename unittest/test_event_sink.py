@@ -0,0 +1,84 @@
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from classes.bidder import Bidder
+from classes.event_sink import NULL_SINK, RingBufferSink, JsonLinesSink, LoggingSink
+from classes.metering_agent import MeteringAgent
+
+class TestEventSink(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.folder, 'events.jsonl')
+        self.time_slot = pd.Timestamp('2025-01-01 00:15')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read_events(self):
+        with open(self.file_name) as json_file:
+            return [json.loads(line) for line in json_file]
+
+    def test_null_sink(self):
+        self.assertFalse(NULL_SINK.enabled)
+        NULL_SINK.emit('offer', price=1.0)
+        bidder = Bidder('bidder_1')
+        self.assertIs(bidder.event_sink, NULL_SINK)
+
+    def test_ring_buffer(self):
+        sink = RingBufferSink(capacity=3)
+        for i in range(5):
+            sink.emit('offer' if i % 2 == 0 else 'bid', index=i)
+        self.assertEqual(len(sink), 3)
+        self.assertEqual([record['index'] for record in sink.get_events()], [2, 3, 4])
+        self.assertEqual(sink.get_events('offer'), [{'index': 2, 'event': 'offer'}, {'index': 4, 'event': 'offer'}])
+        with self.assertRaises(ValueError):
+            RingBufferSink(capacity=0)
+
+    def test_components(self):
+        sink = RingBufferSink()
+        bidder = Bidder('bidder_1', event_sink=sink)
+        bidder.update_current_bidding('buyer_1', offered_power=2.0, offered_price=3.0)
+        metering_agent = MeteringAgent(backend='array', event_sink=sink)
+        metering_agent.add_metering_point('bidder_1')
+        metering_agent.add_energy_measure('bidder_1', self.time_slot, 5.0)
+        self.assertEqual(sink.get_events('offer'),
+                         [{'bidder_id': 'bidder_1', 'buyer_id': 'buyer_1', 'power': 2.0, 'price': 3.0,
+                           'event': 'offer'}])
+        self.assertEqual(sink.get_events('energy_measure')[0]['energy'], 5.0)
+
+    def test_json_lines(self):
+        with JsonLinesSink(self.file_name, batch_size=2, mode='w') as sink:
+            sink.emit('energy_measure', time_slot=self.time_slot, energy=1.0)
+            self.assertFalse(os.path.exists(self.file_name))
+            sink.emit('energy_measure', time_slot=self.time_slot, energy=2.0)
+            self.assertEqual(len(self.read_events()), 2)
+            sink.emit('checkpoint', step=96)
+        events = self.read_events()
+        self.assertEqual([record['event'] for record in events], ['energy_measure', 'energy_measure', 'checkpoint'])
+        self.assertEqual(events[0]['time_slot'], str(self.time_slot))
+
+        # A pickled sink appends to the same file
+        sink = pickle.loads(pickle.dumps(JsonLinesSink(self.file_name)))
+        sink.emit('checkpoint', step=192)
+        sink.close()
+        self.assertEqual(len(self.read_events()), 4)
+
+    def test_logging(self):
+        logger = logging.getLogger('test_event_sink')
+        sink = LoggingSink(logger)
+        logger.setLevel(logging.WARNING)
+        self.assertFalse(sink.enabled)
+        logger.setLevel(logging.INFO)
+        self.assertTrue(sink.enabled)
+        with self.assertLogs(logger, level='INFO') as logs:
+            sink.emit('offer', price=1.0)
+        self.assertIn('offer', logs.output[0])
+
+if __name__ == '__main__':
+    unittest.main()
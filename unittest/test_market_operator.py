@@ -1,4 +1,8 @@
+import copy
+import shutil
+import tempfile
 import unittest
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from classes.market_operator import MarketOperator
@@ -246,5 +250,268 @@ class TestMarketOperator(unittest.TestCase):
                            self.market_operator.threshold_rem * self.power_requested), 0) * price)
         self.assertAlmostEqual(reward, expected_reward)
 
+class TestVectorizedClearing(unittest.TestCase):
+
+    def setUp(self):
+        self.time_index = pd.date_range(start='2025-01-01', periods=8, freq='15min')
+        rng = np.random.default_rng(42)
+        self.requests = []
+        self.bids = []
+        for time_slot in self.time_index:
+            for buyer_id in ['buyer1', 'buyer2', 'buyer3']:
+                self.requests.append((time_slot, {'id': buyer_id,
+                                                  'requested_power': float(rng.choice([0.0, 5.0, 20.0, 60.0])),
+                                                  'wtp': float(rng.choice([30.0, 45.0, 60.0]))}))
+            for i in range(12):
+                self.bids.append((time_slot, {'bidder_id': 'bidder%i' % i,
+                                              'buyer_id': str(rng.choice(['buyer1', 'buyer2', 'buyer3'])),
+                                              'power': float(rng.uniform(0, 20)),
+                                              'price': float(rng.choice([30.0, 35.0, 40.0, 50.0]))}))
+        self.baselines = {}
+        self.actuals = []
+        for i in range(12):
+            self.baselines['bidder%i' % i] = pd.DataFrame({'value': rng.uniform(0, 20, len(self.time_index))},
+                                                          index=self.time_index)
+            for time_slot in self.time_index[:-1]:
+                self.actuals.append(('bidder%i' % i, time_slot, float(rng.uniform(-5, 15))))
+
+    def build_market_operator(self, clearing_engine, **kwargs):
+        market_operator = MarketOperator(alpha_rem=1.0, beta_rem=0.5, gamma_rem=0.5, threshold_rem=0.1,
+                                         threshold_rem_bid_inf=0.25, power_ref=0.0, price_ref=0.0,
+                                         clearing_engine=clearing_engine, **kwargs)
+        for time_slot, request in copy.deepcopy(self.requests):
+            market_operator.receive_buyer_request(time_slot, request)
+        for time_slot, bid in copy.deepcopy(self.bids):
+            market_operator.receive_bid_from_bidder(time_slot, bid)
+        for bidder_id, baseline in self.baselines.items():
+            market_operator.store_bidder_baseline(bidder_id, baseline)
+        for bidder_id, time_slot, actual_value in self.actuals:
+            market_operator.store_bidder_actual(bidder_id, time_slot, actual_value)
+        return market_operator
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            self.build_market_operator('unknown')
+
+    def test_identical_results(self):
+        loop_operator = self.build_market_operator('loop')
+        vectorized_operator = self.build_market_operator('vectorized')
+        for steps in [3, 5]:
+            loop_accepted, loop_non_accepted = loop_operator.pay_as_bid_market_solving(steps)
+            vectorized_accepted, vectorized_non_accepted = vectorized_operator.pay_as_bid_market_solving(steps)
+            self.assertEqual(loop_accepted, vectorized_accepted)
+            self.assertEqual(loop_non_accepted, vectorized_non_accepted)
+        self.assertEqual(loop_operator.clearing_results_history, vectorized_operator.clearing_results_history)
+        self.assertEqual(loop_operator.accepted_prices.count, vectorized_operator.accepted_prices.count)
+        self.assertEqual(loop_operator.accepted_prices.total, vectorized_operator.accepted_prices.total)
+        self.assertEqual(loop_operator.cleared_time_slots, vectorized_operator.cleared_time_slots)
+
+    def test_repeated_requests(self):
+        # A buyer sending several requests in a slot, the bids are matched with all of them
+        for time_slot in self.time_index[::2]:
+            self.requests.append((time_slot, {'id': 'buyer1', 'requested_power': 15.0, 'wtp': 60.0}))
+        loop_operator = self.build_market_operator('loop')
+        vectorized_operator = self.build_market_operator('vectorized')
+        self.assertEqual(loop_operator.pay_as_bid_market_solving(8), vectorized_operator.pay_as_bid_market_solving(8))
+        self.assertEqual(loop_operator.clearing_results_history, vectorized_operator.clearing_results_history)
+
+    def test_parallel_identical_results(self):
+        vectorized_operator = self.build_market_operator('vectorized')
+        parallel_operator = self.build_market_operator('vectorized', clearing_workers=3)
+        try:
+            for steps in [1, 5, 2]:
+                vectorized_accepted, vectorized_non_accepted = vectorized_operator.pay_as_bid_market_solving(steps)
+                parallel_accepted, parallel_non_accepted = parallel_operator.pay_as_bid_market_solving(steps)
+                self.assertEqual(vectorized_accepted, parallel_accepted)
+                self.assertEqual(vectorized_non_accepted, parallel_non_accepted)
+            self.assertEqual(vectorized_operator.clearing_results_history, parallel_operator.clearing_results_history)
+            self.assertEqual(vectorized_operator.accepted_prices.total, parallel_operator.accepted_prices.total)
+            self.assertIsNotNone(parallel_operator.clearing_executor)
+        finally:
+            parallel_operator.close()
+        self.assertIsNone(parallel_operator.clearing_executor)
+        with self.assertRaises(ValueError):
+            self.build_market_operator('loop', clearing_workers=2)
+
+    def test_incremental_identical_results(self):
+        loop_operator = self.build_market_operator('loop')
+        incremental_operator = self.build_market_operator('incremental')
+        for steps in [3, 5]:
+            loop_accepted, loop_non_accepted = loop_operator.pay_as_bid_market_solving(steps)
+            incremental_accepted, incremental_non_accepted = incremental_operator.pay_as_bid_market_solving(steps)
+            self.assertEqual(loop_accepted, incremental_accepted)
+            self.assertEqual(loop_non_accepted, incremental_non_accepted)
+        self.assertEqual(loop_operator.clearing_results_history, incremental_operator.clearing_results_history)
+        self.assertEqual(loop_operator.accepted_prices.total, incremental_operator.accepted_prices.total)
+        self.assertEqual(incremental_operator.open_time_slots, [])
+        self.assertEqual(incremental_operator.incremental_clearing.walks, {})
+
+    def test_incremental_interleaved_arrivals(self):
+        # Baselines first, then requests, bids and actuals in random order
+        operators = {}
+        events = [('request', e) for e in self.requests] + [('bid', e) for e in self.bids] + \
+                 [('actual', e) for e in self.actuals]
+        order = np.random.default_rng(7).permutation(len(events))
+        for clearing_engine in ['loop', 'incremental']:
+            market_operator = MarketOperator(alpha_rem=1.0, beta_rem=0.5, gamma_rem=0.5, threshold_rem=0.1,
+                                             threshold_rem_bid_inf=0.25, power_ref=0.0, price_ref=0.0,
+                                             clearing_engine=clearing_engine)
+            for bidder_id, baseline in self.baselines.items():
+                market_operator.store_bidder_baseline(bidder_id, baseline)
+            for i in order:
+                kind, event = copy.deepcopy(events[i])
+                if kind == 'request':
+                    market_operator.receive_buyer_request(*event)
+                elif kind == 'bid':
+                    market_operator.receive_bid_from_bidder(*event)
+                else:
+                    market_operator.store_bidder_actual(*event)
+            operators[clearing_engine] = market_operator
+        loop_operator, incremental_operator = operators['loop'], operators['incremental']
+        loop_accepted, loop_non_accepted = loop_operator.pay_as_bid_market_solving(len(self.time_index))
+        incremental_accepted, incremental_non_accepted = \
+            incremental_operator.pay_as_bid_market_solving(len(self.time_index))
+        self.assertEqual(loop_operator.clearing_results_history, incremental_operator.clearing_results_history)
+        self.assertEqual({ts: [b['bid_id'] for b in bids] for ts, bids in loop_accepted.items()},
+                         {ts: [b['bid_id'] for b in bids] for ts, bids in incremental_accepted.items()})
+
+    def test_incremental_saturated_request(self):
+        market_operator = MarketOperator(alpha_rem=1.0, beta_rem=0.5, gamma_rem=0.5, threshold_rem=0.1,
+                                         threshold_rem_bid_inf=0.25, power_ref=0.0, price_ref=0.0,
+                                         clearing_engine='incremental')
+        time_slot = self.time_index[0]
+        market_operator.receive_buyer_request(time_slot, {'id': 'buyer1', 'requested_power': 5.0, 'wtp': 50.0})
+        market_operator.store_bidder_baseline('bidder1', pd.DataFrame({'value': [10.0]}, index=[time_slot]))
+        market_operator.receive_bid_from_bidder(time_slot, {'bidder_id': 'bidder1', 'buyer_id': 'buyer1',
+                                                            'power': 10.0, 'price': 30.0})
+        walk = market_operator.incremental_clearing.walks[time_slot][0]
+        self.assertEqual(walk['remaining'], 0.0)
+        walked = []
+        walk_from = market_operator.incremental_clearing.walk_from
+        market_operator.incremental_clearing.walk_from = lambda *args: walked.append(args[2]) or walk_from(*args)
+        market_operator.receive_bid_from_bidder(time_slot, {'bidder_id': 'bidder2', 'buyer_id': 'buyer1',
+                                                            'power': 10.0, 'price': 40.0})
+        self.assertEqual(walked, [])
+        market_operator.receive_bid_from_bidder(time_slot, {'bidder_id': 'bidder2', 'buyer_id': 'buyer1',
+                                                            'power': 10.0, 'price': 20.0})
+        self.assertEqual(walked, [0])
+        results = market_operator.incremental_clearing.get_allocations(time_slot)
+        self.assertEqual(results[0]['unfulfilled_demand'], 0.0)
+        self.assertEqual([a['bidder_id'] for a in results[0]['allocations']], ['bidder1'])
+        self.assertEqual(len(walk['steps']), 2)
+
+    def test_receive_bids_from_table(self):
+        bids = pd.DataFrame([dict(bid, time_slot=time_slot) for time_slot, bid in self.bids])
+        for clearing_engine in ['loop', 'incremental']:
+            with self.subTest(clearing_engine=clearing_engine):
+                market_operator = self.build_market_operator('loop')
+                table_operator = MarketOperator(alpha_rem=1.0, beta_rem=0.5, gamma_rem=0.5, threshold_rem=0.1,
+                                                threshold_rem_bid_inf=0.25, power_ref=0.0, price_ref=0.0,
+                                                clearing_engine=clearing_engine)
+                for time_slot, request in copy.deepcopy(self.requests):
+                    table_operator.receive_buyer_request(time_slot, request)
+                bid_ids = table_operator.receive_bids_from_table(bids)
+                self.assertEqual(bid_ids, list(range(len(self.bids))))
+                for bidder_id, baseline in self.baselines.items():
+                    table_operator.store_bidder_baseline(bidder_id, baseline)
+                for bidder_id, time_slot, actual_value in self.actuals:
+                    table_operator.store_bidder_actual(bidder_id, time_slot, actual_value)
+                self.assertEqual(market_operator.pay_as_bid_market_solving(8),
+                                 table_operator.pay_as_bid_market_solving(8))
+                with self.assertRaises(ValueError):
+                    table_operator.receive_bids_from_table(bids.drop(columns=['price']))
+
+    def test_receive_bids_from_table_same_price(self):
+        # Bids of the same table with the same price are merged together before the walks are updated
+        time_slot = self.time_index[0]
+        bids = pd.DataFrame([{'time_slot': time_slot, 'bidder_id': bidder_id, 'buyer_id': 'buyer1', 'power': 10.0,
+                              'price': 30.0} for bidder_id in ['bidder1', 'bidder2']])
+        results = []
+        for clearing_engine in ['loop', 'incremental']:
+            market_operator = MarketOperator(alpha_rem=1.0, beta_rem=0.5, gamma_rem=0.5, threshold_rem=0.1,
+                                             threshold_rem_bid_inf=0.25, power_ref=0.0, price_ref=0.0,
+                                             clearing_engine=clearing_engine)
+            market_operator.receive_buyer_request(time_slot, {'id': 'buyer1', 'requested_power': 15.0, 'wtp': 50.0})
+            for bidder_id in ['bidder1', 'bidder2']:
+                market_operator.store_bidder_baseline(bidder_id, pd.DataFrame({'value': [10.0]}, index=[time_slot]))
+            market_operator.receive_bids_from_table(bids)
+            results.append(market_operator.pay_as_bid_market_solving(1))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual([bid['bidder_id'] for bid in results[1][0][time_slot]], ['bidder1', 'bidder2'])
+
+    def test_bulk_ingestion(self):
+        requests = pd.DataFrame([dict(request, time_slot=time_slot) for time_slot, request in self.requests])
+        for clearing_engine in ['loop', 'incremental']:
+            with self.subTest(clearing_engine=clearing_engine):
+                market_operator = self.build_market_operator('loop')
+                bulk_operator = MarketOperator(alpha_rem=1.0, beta_rem=0.5, gamma_rem=0.5, threshold_rem=0.1,
+                                               threshold_rem_bid_inf=0.25, power_ref=0.0, price_ref=0.0,
+                                               clearing_engine=clearing_engine)
+                bulk_operator.receive_buyer_requests(requests.to_records(index=False))
+                bulk_operator.receive_bids_from_table(pd.DataFrame([dict(bid, time_slot=time_slot)
+                                                                    for time_slot, bid in self.bids]))
+                changed = bulk_operator.store_bidder_baselines(pd.DataFrame({bidder_id: baseline['value'] for
+                                                                             bidder_id, baseline in
+                                                                             self.baselines.items()}))
+                self.assertEqual(changed['bidder0'], (self.time_index[0], self.time_index[-1]))
+                for bidder_id, time_slot, actual_value in self.actuals:
+                    bulk_operator.store_bidder_actual(bidder_id, time_slot, actual_value)
+                self.assertEqual(bulk_operator.requested_powers.total, market_operator.requested_powers.total)
+                self.assertEqual(bulk_operator.open_time_slots, market_operator.open_time_slots)
+                self.assertEqual(market_operator.pay_as_bid_market_solving(8),
+                                 bulk_operator.pay_as_bid_market_solving(8))
+        with self.assertRaises(ValueError):
+            bulk_operator.receive_buyer_requests(requests.drop(columns=['wtp']))
+        with self.assertRaises(ValueError):
+            bulk_operator.receive_buyer_requests([{'id': 'buyer1'}])
+
+    def test_baseline_versions(self):
+        market_operator = self.build_market_operator('incremental')
+        baseline = self.baselines['bidder0']
+        self.assertEqual(market_operator.get_baseline_version('bidder0'), 1)
+        self.assertIsNone(market_operator.store_bidder_baseline('bidder0', baseline))
+        self.assertEqual(market_operator.get_baseline_version('bidder0'), 1)
+        updated = baseline.copy()
+        updated.iloc[2] += 1.0
+        self.assertEqual(market_operator.store_bidder_baseline('bidder0', updated),
+                         (self.time_index[2], self.time_index[2]))
+        self.assertEqual(market_operator.get_baseline_version('bidder0'), 2)
+        long_table = pd.DataFrame({'bidder_id': 'bidder0', 'time_slot': self.time_index,
+                                   'value': updated['value'].to_numpy()})
+        self.assertEqual(market_operator.store_bidder_baselines(long_table), {'bidder0': None})
+        self.assertEqual(market_operator.get_bidder_baseline('bidder0', self.time_index[2]), updated['value'].iloc[2])
+
+    def test_average_last_n_beyond_window(self):
+        market_operator = MarketOperator(alpha_rem=1.0, beta_rem=0.5, gamma_rem=0.5, threshold_rem=0.1,
+                                         threshold_rem_bid_inf=0.25, power_ref=0.0, price_ref=0.0,
+                                         statistics_window=4)
+        market_operator.accepted_prices.extend([1.0, 2.0, 3.0])
+        # N greater than the window and the number of values: all the values
+        self.assertEqual(market_operator.average_last_n_accepted_prices(4), 2.0)
+        self.assertEqual(market_operator.average_last_n_accepted_prices(10), 2.0)
+        market_operator.accepted_prices.extend([4.0, 5.0, 6.0])
+        self.assertEqual(market_operator.average_last_n_accepted_prices(2), 5.5)
+        self.assertEqual(market_operator.average_last_n_accepted_prices(6), 3.5)
+        # N between the window and the number of values: the last values of the window
+        self.assertEqual(market_operator.average_last_n_accepted_prices(5), 4.5)
+        self.assertEqual(market_operator.average_last_n_requested_powers(7), 0.0)
+
+    def test_bounded_history(self):
+        folder = tempfile.mkdtemp()
+        try:
+            unbounded_operator = self.build_market_operator('loop')
+            bounded_operator = self.build_market_operator('loop', history_hot_window=2, history_folder=folder)
+            for _ in range(4):
+                unbounded_operator.pay_as_bid_market_solving(2)
+                bounded_operator.pay_as_bid_market_solving(2)
+            self.assertLessEqual(len(bounded_operator.clearing_results_history), 3)
+            for time_slot, results in bounded_operator.clearing_results_history.items():
+                self.assertEqual(results, unbounded_operator.clearing_results_history[time_slot])
+            pd.testing.assert_frame_equal(bounded_operator.clearing_history.query(),
+                                          unbounded_operator.clearing_history.query(), check_like=True,
+                                          check_dtype=False)
+        finally:
+            shutil.rmtree(folder)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import unittest
+import numpy as np
+import pandas as pd
+from classes.bidder import Bidder
+from classes.bidder_population import BidderPopulation
+from classes.clearing_engine import ClearingEngine
+from classes.market_operator import MarketOperator
+from classes.market_simulation import MarketSimulation
+
+class TestMarketSimulation(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.n_slots = 96
+        self.clearing_steps = 24
+        self.time_index = pd.date_range(start='2025-01-01', periods=self.n_slots, freq='15min')
+        self.buyer_ids = ['buyer1', 'buyer2']
+        self.wtp = [50.0, 55.0]
+        self.demand = rng.uniform(0, 1.5, (self.n_slots, 2))
+        self.demand[rng.random(self.n_slots) < 0.1, 0] = 0.0
+        self.baselines = rng.uniform(-0.2, 0.5, (6, self.n_slots))
+        self.params = [{'alpha': float(rng.uniform(0, 0.1)), 'beta': float(rng.uniform(0, 0.1)),
+                        'gamma': float(rng.uniform(0, 1)), 'L': int(rng.integers(3, 10)), 'w1': 1.0,
+                        'w2': float(rng.uniform(0.5, 1.5)), 'w3': 1.0} for _ in range(6)]
+        self.remuneration = {'alpha_rem': 1.0, 'beta_rem': 0.5, 'gamma_rem': 0.5, 'threshold_rem': 0.1,
+                             'threshold_rem_bid_inf': 0.25}
+
+    def run_loop(self, seed, n_slots=None, clear_partial=False):
+        """
+        Per-object simulation, as in sim01, optionally clearing also the slots of a trailing partial chunk.
+        """
+        time_index = self.time_index[:n_slots]
+        rng = np.random.default_rng(seed)
+        bidders = [Bidder(id='bidder%i' % b, baseline=pd.DataFrame({'value': self.baselines[b]}, index=self.time_index),
+                          **params) for b, params in enumerate(self.params)]
+        market_operator = MarketOperator(power_ref=100, price_ref=20, **self.remuneration)
+        rewards = np.zeros(len(bidders))
+        for step, time_slot in enumerate(time_index):
+            pow_req_ref = market_operator.average_last_n_requested_powers(7)
+            avg_acc_ref = market_operator.average_last_n_accepted_prices(7)
+            requests = []
+            for k, buyer_id in enumerate(self.buyer_ids):
+                request = {'id': buyer_id, 'requested_power': float(self.demand[step, k]), 'wtp': self.wtp[k]}
+                market_operator.receive_buyer_request(time_slot, request)
+                requests.append(request)
+            for bidder in bidders:
+                market_operator.store_bidder_baseline(bidder.id, bidder.baseline)
+                bidder.set_reference_values(pow_req_ref, avg_acc_ref)
+                best_buyer = bidder.select_buyer(requests)
+                price, power = bidder.build_offer(best_buyer['id'],
+                                                  pow_bid=bidder.baseline.loc[time_slot, 'value'] * 0.8)
+                bidder.update_current_bidding(best_buyer['id'], offered_power=power, offered_price=price)
+                market_operator.receive_bid_from_bidder(time_slot, bidder.current_bidding)
+            for bidder in bidders:
+                actual_value = bidder.baseline.loc[time_slot, 'value'] - \
+                    bidder.current_bidding['power'] * (1 + 0.1 * rng.standard_normal())
+                market_operator.store_bidder_actual(bidder.id, time_slot, actual_value)
+            if (step + 1) % self.clearing_steps == 0 or (clear_partial and step == len(time_index) - 1):
+                accepted_bids, non_accepted_bids = market_operator.pay_as_bid_market_solving(
+                    step % self.clearing_steps + 1)
+                for bids in accepted_bids.values():
+                    for bid in bids:
+                        rewards[int(bid['bidder_id'][6:])] += bid['reward']
+                for bidder in bidders:
+                    for bid in accepted_bids.get(time_slot, []):
+                        if bid['bidder_id'] == bidder.id:
+                            bidder.update_history(bid['buyer_id'], time_slot, bid['price'], bid['power'], True)
+                    for bid in non_accepted_bids.get(time_slot, []):
+                        if bid['bidder_id'] == bidder.id:
+                            bidder.update_history(bid['buyer_id'], time_slot, bid['price'], bid['power'], False)
+        return bidders, market_operator, rewards
+
+    def run_simulation(self, seed, n_slots=None, clear_partial=False):
+        population = BidderPopulation(ids=['bidder%i' % b for b in range(6)],
+                                      **{name: [params[name] for params in self.params] for name in self.params[0]})
+        simulation = MarketSimulation(population, ClearingEngine(**self.remuneration), self.buyer_ids, self.wtp,
+                                      clearing_steps=self.clearing_steps)
+        return simulation.run(self.demand[:n_slots], self.baselines[:, :n_slots], np.random.default_rng(seed),
+                              clear_partial=clear_partial)
+
+    def assert_identical(self, simulation, bidders, market_operator, rewards, references=True):
+        population = simulation.population
+        np.testing.assert_allclose(simulation.bidder_rewards, rewards, rtol=1e-12)
+        history = market_operator.clearing_history.query()
+        self.assertEqual(int(simulation.bidder_accepted.sum()), len(history))
+        self.assertAlmostEqual(simulation.allocated_flexibility, history['allocated_flexibility'].sum())
+        demands = market_operator.clearing_history.query(table='demands')
+        self.assertAlmostEqual(simulation.unfulfilled_demand, demands['unfulfilled_demand'].sum())
+        self.assertEqual(simulation.get_accepted_price_ref(), market_operator.average_last_n_accepted_prices(7))
+        stats = population.get_buyer_stats()
+        for b, bidder in enumerate(bidders):
+            if references:
+                self.assertEqual(bidder.pow_req_ref, population.pow_req_ref[b])
+                self.assertEqual(bidder.avg_acc_ref, population.avg_acc_ref[b])
+            for buyer_id in self.buyer_ids:
+                k = population.buyers.get(buyer_id, -1)
+                self.assertEqual(bidder.get_buyer_stats(buyer_id), tuple(float(stat[b, k]) for stat in stats))
+
+    def test_identical_results(self):
+        bidders, market_operator, rewards = self.run_loop(seed=2)
+        simulation = self.run_simulation(seed=2)
+        self.assertEqual(simulation.cleared_slots, self.n_slots)
+        self.assert_identical(simulation, bidders, market_operator, rewards)
+
+    def test_partial_chunk(self):
+        # The slots after the last complete chunk are not cleared, as in sim01 (whose bidders still update their
+        # reference values in those slots)
+        bidders, market_operator, rewards = self.run_loop(seed=4, n_slots=90)
+        simulation = self.run_simulation(seed=4, n_slots=90)
+        self.assertEqual(simulation.cleared_slots, 72)
+        self.assert_identical(simulation, bidders, market_operator, rewards, references=False)
+
+        # Unless they are cleared as a last shorter chunk
+        bidders, market_operator, rewards = self.run_loop(seed=4, n_slots=90, clear_partial=True)
+        simulation = self.run_simulation(seed=4, n_slots=90, clear_partial=True)
+        self.assertEqual(simulation.cleared_slots, 90)
+        self.assertEqual(len(market_operator.clearing_history.results), 90)
+        self.assert_identical(simulation, bidders, market_operator, rewards)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+import pandas as pd
+from classes.metering_agent import MeteringAgent
+
+class TestMeteringAgent(unittest.TestCase):
+
+    def setUp(self):
+        self.time_index = pd.date_range(start='2025-01-01', periods=8, freq='15min')
+        self.df = pd.DataFrame({'mp1': np.arange(8, dtype=float), 'mp2': np.arange(8, dtype=float) * 10},
+                               index=self.time_index)
+
+    def test_bulk_ingestion_wide(self):
+        for backend in ['dataframe', 'array']:
+            metering_agent = MeteringAgent(backend=backend)
+            metering_agent.add_energy_measures(self.df)
+            self.assertEqual(metering_agent.get_energy_measure('mp2', self.time_index[3]), 30.0)
+            self.assertIsNone(metering_agent.get_energy_measure('mp3', self.time_index[3]))
+            self.assertEqual(list(metering_agent.get_energy_data('mp1')['energy']), list(self.df['mp1']))
+
+    def test_bulk_ingestion_long(self):
+        metering_agent = MeteringAgent(backend='array')
+        metering_agent.add_energy_measures(pd.DataFrame({'metering_point_id': ['mp1', 'mp2'],
+                                                         'time_slot': self.time_index[[2, 5]],
+                                                         'energy': [1.5, 2.5]}))
+        self.assertEqual(metering_agent.get_energy_measure('mp1', self.time_index[2]), 1.5)
+        self.assertEqual(metering_agent.get_energy_measure('mp2', self.time_index[5]), 2.5)
+        self.assertIsNone(metering_agent.get_energy_measure('mp1', self.time_index[5]))
+
+    def test_views_and_retention(self):
+        metering_agent = MeteringAgent(backend='array', retention_slots=4)
+        metering_agent.add_energy_measures(self.df)
+        np.testing.assert_array_equal(metering_agent.get_metering_point_view('mp1'), [4.0, 5.0, 6.0, 7.0])
+        np.testing.assert_array_equal(metering_agent.get_slot_view(self.time_index[6]), [6.0, 60.0])
+        self.assertEqual(metering_agent.get_metering_point_ids(), ['mp1', 'mp2'])
+        self.assertIsNone(metering_agent.get_energy_measure('mp1', self.time_index[0]))
+
+    def test_retention_requires_array_backend(self):
+        with self.assertRaises(ValueError):
+            MeteringAgent(backend='dataframe', retention_slots=4)
+
+    def test_views_require_array_backend(self):
+        metering_agent = MeteringAgent(backend='dataframe')
+        metering_agent.add_energy_measures(self.df)
+        with self.assertRaises(ValueError):
+            metering_agent.get_metering_point_view('mp1')
+        with self.assertRaises(ValueError):
+            metering_agent.get_slot_view(self.time_index[0])
+
+    def test_history_requires_archive(self):
+        metering_agent = MeteringAgent(backend='array')
+        metering_agent.add_energy_measures(self.df)
+        with self.assertRaises(ValueError):
+            metering_agent.get_energy_history('mp1', self.time_index[0], self.time_index[-1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from classes.metering_agent import MeteringAgent
+from classes.metering_archive import MeteringArchive
+
+class TestMeteringArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.time_index = pd.date_range(start='2025-01-31 23:00', periods=8, freq='15min')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write_and_reopen(self):
+        archive = MeteringArchive(self.folder)
+        archive.write(['mp1'] * 8, self.time_index, np.arange(8, dtype=float))
+        for i in range(20):
+            archive.write_value('mp%i' % (i + 2), self.time_index[0], float(i))
+        archive.close()
+        self.assertEqual(archive.get_months(), ['2025-01', '2025-02'])
+
+        archive = MeteringArchive(self.folder)
+        series = archive.read('mp1', self.time_index[0], self.time_index[-1])
+        np.testing.assert_array_equal(series.values, np.arange(8, dtype=float))
+        self.assertTrue(series.index.equals(self.time_index))
+        self.assertEqual(archive.read_value('mp21', self.time_index[0]), 19.0)
+        self.assertTrue(np.isnan(archive.read_value('mp21', self.time_index[1])))
+        self.assertTrue(np.isnan(archive.read_value('mp99', self.time_index[1])))
+        self.assertEqual(archive.read_slot(self.time_index[0])[:3].tolist(), [0.0, 0.0, 1.0])
+
+    def test_metering_point_added_later(self):
+        # Metering points first written in a later month are not available in the previous months
+        archive = MeteringArchive(self.folder)
+        archive.write_value('a', '2024-01-10', 1.0)
+        archive.write(['m%i' % i for i in range(10)], ['2024-02-10'] * 10, np.arange(10, dtype=float))
+        self.assertIsNone(archive.get_month_view('m9', '2024-01-01'))
+        self.assertEqual(len(archive.get_month_view('m9', '2024-02-01')), 29 * 96)
+        self.assertTrue(np.isnan(archive.read_value('m9', '2024-01-10')))
+
+    def test_zero_copy_read(self):
+        archive = MeteringArchive(self.folder)
+        archive.write(['mp1'] * 4, self.time_index[4:], [1.0, 2.0, 3.0, 4.0])
+        view = archive.get_month_view('mp1', self.time_index[4])
+        self.assertIsInstance(view, np.memmap)
+        self.assertEqual(view[:4].tolist(), [1.0, 2.0, 3.0, 4.0])
+        series = archive.read('mp1', self.time_index[4], self.time_index[7])
+        self.assertTrue(np.shares_memory(series.values, view))
+
+    def test_metering_agent_archive(self):
+        metering_agent = MeteringAgent(backend='array', retention_slots=2, archive_folder=self.folder)
+        for i, time_slot in enumerate(self.time_index):
+            metering_agent.add_energy_measure('mp1', time_slot, float(i))
+        self.assertEqual(metering_agent.get_energy_measure('mp1', self.time_index[0]), 0.0)
+        metering_agent.archive.close()
+
+        metering_agent = MeteringAgent(backend='array', archive_folder=self.folder)
+        self.assertEqual(metering_agent.get_energy_measure('mp1', self.time_index[3]), 3.0)
+        self.assertIsNone(metering_agent.get_energy_measure('mp2', self.time_index[3]))
+        history = metering_agent.get_energy_history('mp1', self.time_index[0], self.time_index[-1])
+        np.testing.assert_array_equal(history.values, np.arange(8, dtype=float))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+import unittest
+from classes.nodes_async_interface import AsyncNODESInterface
+
+class SlowInterface:
+    """
+    Interface answering the GET requests after a delay, counting the concurrent ones.
+    """
+
+    def __init__(self, delay=0.05):
+        self.cfg = {'maxConcurrentRequests': 4}
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def get_request(self, endpoint):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return False if endpoint == 'failing' else {'endpoint': endpoint}
+
+class TestAsyncNODESInterface(unittest.TestCase):
+
+    def test_concurrent_requests(self):
+        interface = SlowInterface()
+        async_interface = AsyncNODESInterface(interface)
+        endpoints = ['portfolio_%i' % i for i in range(8)] + ['failing']
+
+        start = time.perf_counter()
+        responses = asyncio.run(async_interface.get_requests(endpoints))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(responses[:-1], [{'endpoint': endpoint} for endpoint in endpoints[:-1]])
+        self.assertFalse(responses[-1])
+        self.assertEqual(interface.max_running, 4)
+        self.assertLess(elapsed, len(endpoints) * interface.delay)
+
+        # A new event loop gets its own semaphore
+        self.assertEqual(len(asyncio.run(async_interface.get_requests(endpoints))), len(endpoints))
+
+    def test_max_concurrency(self):
+        self.assertEqual(AsyncNODESInterface(SlowInterface(), max_concurrency=2).max_concurrency, 2)
+        with self.assertRaises(ValueError):
+            AsyncNODESInterface(SlowInterface(), max_concurrency=0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from classes import nodes_interface
+from classes.nodes_interface import NODESInterface
+from classes.retry_policy import RetryPolicy
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeResponse:
+
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.text = body if isinstance(body, str) else json.dumps(body)
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+class FakeSession:
+    """
+    Session answering the requests with the given responses (or raising the given exceptions), in order, and the
+    token requests with new tokens.
+    """
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.requests = []
+        self.token_requests = 0
+
+    def request(self, method, endpoint, headers=None, json=None, files=None, timeout=None):
+        self.requests.append((method, endpoint, headers))
+        response = self.responses.pop(0)
+        if isinstance(response, BaseException):
+            raise response
+        return response
+
+    def post(self, endpoint, data=None, headers=None, timeout=None):
+        self.token_requests += 1
+        return FakeResponse(200, {'access_token': 'token_%i' % self.token_requests, 'expires_in': 3600})
+
+class Interrupted(BaseException):
+    pass
+
+class TestNODESInterface(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cfg = {'mainEndpoint': 'https://nodes.test/api/', 'tokenEndpoint': 'https://nodes.test/token',
+                    'requestTimeout': 5, 'tokenFilesFolder': self.folder, 'grantType': 'client_credentials',
+                    'scope': 'nodes', 'players': {'FSP1': {'clientId': 'client', 'secretId': 'secret'}}}
+        self.player_cfg = {'role': 'fsp', 'id': 'FSP1'}
+        self.clock = FakeClock()
+        self.endpoint = 'https://nodes.test/api/orders'
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def build_interface(self, responses, **kwargs):
+        interface = NODESInterface(self.cfg, logging.getLogger(__name__))
+        interface.session = FakeSession(responses)
+        interface.retry_policy = RetryPolicy(**dict(dict(base_delay=0.0, clock=self.clock), **kwargs))
+        return interface
+
+    def test_retry(self):
+        interface = self.build_interface([FakeResponse(503), ConnectionError('reset'), FakeResponse(200, {'a': 1})])
+        self.assertEqual(interface.get_request(self.endpoint), {'a': 1})
+        self.assertEqual(len(interface.session.requests), 3)
+        self.assertEqual(interface.retry_policy.consecutive_failures, 0)
+
+        # Attempts are limited
+        interface = self.build_interface([FakeResponse(503)] * 3, max_attempts=2)
+        self.assertFalse(interface.get_request(self.endpoint))
+        self.assertEqual(len(interface.session.requests), 2)
+
+    def test_fail(self):
+        # Non-retryable statuses are not retried and do not open the circuit
+        interface = self.build_interface([FakeResponse(404), FakeResponse(200, {})], breaker_threshold=1)
+        self.assertFalse(interface.get_request(self.endpoint))
+        self.assertEqual(len(interface.session.requests), 1)
+        self.assertFalse(interface.retry_policy.is_open())
+
+    def test_invalid_json(self):
+        # The request was processed, it is not sent again
+        interface = self.build_interface([FakeResponse(200, 'not json'), FakeResponse(200, {})])
+        self.assertFalse(interface.post_request(self.endpoint, {'quantity': 1}))
+        self.assertEqual(len(interface.session.requests), 1)
+        self.assertEqual(interface.retry_policy.consecutive_failures, 0)
+
+    def test_retry_after(self):
+        interface = self.build_interface([FakeResponse(429, headers={'Retry-After': '0'}), FakeResponse(200, {})])
+        self.assertEqual(interface.get_request(self.endpoint), {})
+        self.assertEqual(len(interface.session.requests), 2)
+
+        # Waiting longer than the maximum delay, the request is not retried
+        interface = self.build_interface([FakeResponse(429, headers={'Retry-After': '120'}), FakeResponse(200, {})],
+                                         max_delay=1.0)
+        self.assertFalse(interface.get_request(self.endpoint))
+        self.assertEqual(len(interface.session.requests), 1)
+
+    def test_unauthorized(self):
+        # The request is sent again with a new token without using an attempt
+        interface = self.build_interface([FakeResponse(401), FakeResponse(200, {'a': 1})], max_attempts=1)
+        self.assertTrue(interface.set_token(self.player_cfg))
+        self.assertEqual(interface.get_request(self.endpoint), {'a': 1})
+        self.assertEqual([request[2]['Authorization'] for request in interface.session.requests],
+                         ['Bearer token_1', 'Bearer token_2'])
+
+        # A token is replaced only once per request
+        interface.session.responses = [FakeResponse(401)] * 3
+        self.assertFalse(interface.get_request(self.endpoint))
+        self.assertEqual(interface.session.token_requests, 3)
+        self.assertEqual(len(interface.session.responses), 1)
+
+    def test_circuit_breaker(self):
+        interface = self.build_interface([FakeResponse(503)], max_attempts=1, breaker_threshold=1,
+                                         breaker_reset_time=10.0)
+        self.assertFalse(interface.get_request(self.endpoint))
+        self.assertTrue(interface.retry_policy.is_open())
+        self.assertFalse(interface.get_request(self.endpoint))
+        self.assertEqual(len(interface.session.requests), 1)
+
+        # An interrupted trial request does not keep the circuit waiting
+        self.clock.now = 11.0
+        interface.session.responses = [Interrupted()]
+        with self.assertRaises(Interrupted):
+            interface.get_request(self.endpoint)
+        self.assertFalse(interface.retry_policy.trial_running)
+
+        # A trial request whose token is replaced closes the circuit
+        interface.set_token(self.player_cfg)
+        interface.session.responses = [FakeResponse(401), FakeResponse(200, {})]
+        self.assertEqual(interface.get_request(self.endpoint), {})
+        self.assertFalse(interface.retry_policy.is_open())
+
+    def test_token_cache(self):
+        # The token is requested once, without checking it with a request to the API
+        interface = self.build_interface([])
+        self.assertTrue(interface.set_token(self.player_cfg))
+        self.assertEqual(interface.session.token_requests, 1)
+        self.assertEqual(interface.session.requests, [])
+        token_file = os.path.join(self.folder, 'fsp_FSP1.json')
+        with open(token_file) as json_file:
+            self.assertEqual(json.load(json_file)['access_token'], 'token_1')
+
+        # Another interface of the player uses the cached token
+        other_interface = self.build_interface([])
+        self.assertTrue(other_interface.set_token(self.player_cfg))
+        self.assertEqual(other_interface.session.token_requests, 0)
+        self.assertEqual(other_interface.headers, {'Authorization': 'Bearer token_1'})
+
+        # The token is replaced before a request when it is going to expire
+        interface.token_cache.clock = lambda: time.time() + 3400
+        interface.session.responses = [FakeResponse(200, {})]
+        self.assertEqual(interface.get_request(self.endpoint), {})
+        self.assertEqual(interface.session.token_requests, 2)
+        self.assertEqual(interface.session.requests[-1][2], {'Authorization': 'Bearer token_2'})
+
+    def test_rejected_token(self):
+        # A rejected token is replaced in the cache even if it is not expired
+        interface = self.build_interface([FakeResponse(401), FakeResponse(200, {})])
+        interface.set_token(self.player_cfg)
+        self.assertEqual(interface.get_request(self.endpoint), {})
+        other_interface = self.build_interface([])
+        other_interface.set_token(self.player_cfg)
+        self.assertEqual(other_interface.session.token_requests, 0)
+        self.assertEqual(other_interface.headers, {'Authorization': 'Bearer token_2'})
+
+        # The token rejected also for another interface is not replaced again
+        other_interface.session.responses = [FakeResponse(401), FakeResponse(200, {})]
+        interface.session.responses = [FakeResponse(401), FakeResponse(200, {})]
+        self.assertEqual(interface.get_request(self.endpoint), {})
+        self.assertEqual(other_interface.get_request(self.endpoint), {})
+        self.assertEqual(other_interface.session.token_requests, 0)
+        self.assertEqual(other_interface.session.requests[-1][2], {'Authorization': 'Bearer token_3'})
+
+        # Without a token the player is not ready
+        failing_interface = self.build_interface([])
+        failing_interface.session.post = lambda *args, **kwargs: FakeResponse(400, 'invalid_client')
+        self.assertFalse(failing_interface.set_token(dict(self.player_cfg, role='dso')))
+
+    def test_sessions(self):
+        with mock.patch.dict(nodes_interface.SESSIONS, clear=True):
+            # Interfaces with the same pool settings share a session
+            session = NODESInterface.get_session(self.cfg)
+            self.assertIs(NODESInterface(self.cfg, logging.getLogger(__name__)).session, session)
+            self.assertIs(NODESInterface.get_session(dict(self.cfg, poolMaxSize=10)), session)
+
+            # Different pool settings get a different session
+            other_session = NODESInterface.get_session(dict(self.cfg, poolMaxSize=20))
+            self.assertIsNot(other_session, session)
+            self.assertEqual(other_session.get_adapter('https://nodes.test/')._pool_maxsize, 20)
+
+            # A forked process does not reuse the connections of its parent
+            with mock.patch.object(nodes_interface.os, 'getpid', return_value=os.getpid() + 1):
+                forked_session = NODESInterface.get_session(self.cfg)
+            self.assertIsNot(forked_session, session)
+            self.assertIs(NODESInterface.get_session(self.cfg), session)
+            self.assertEqual(len(nodes_interface.SESSIONS), 3)
+
+if __name__ == '__main__':
+    unittest.main()
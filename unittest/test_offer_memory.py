@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from classes.offer_memory import OfferMemory
+
+class TestOfferMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.memory = OfferMemory(L=5)
+
+    def test_empty(self):
+        self.assertEqual(len(self.memory), 0)
+        self.assertEqual(self.memory.get_stats(), (0.0, 0.0, 0.0, 0.0, 0.0))
+        self.assertIsNone(self.memory.get_last_record())
+
+    def test_stats_match_window(self):
+        rng = np.random.default_rng(1)
+        records = []
+        for i in range(200):
+            record = {'time': i, 'price': float(rng.uniform(0, 100)), 'power': 1.0,
+                      'accepted': bool(rng.random() < 0.5)}
+            records.append(record)
+            self.memory.append(record['time'], record['price'], record['power'], record['accepted'])
+
+            window = records[-5:]
+            accepted_prices = [r['price'] for r in window if r['accepted']]
+            rejected_prices = [r['price'] for r in window if not r['accepted']]
+            avg_acc, avg_rej, success_ratio, p_min, p_max = self.memory.get_stats()
+            self.assertAlmostEqual(avg_acc, np.mean(accepted_prices) if accepted_prices else 0.0)
+            self.assertAlmostEqual(avg_rej, np.mean(rejected_prices) if rejected_prices else 0.0)
+            self.assertEqual(success_ratio, len(accepted_prices) / len(window))
+            self.assertEqual(p_min, min(accepted_prices) if accepted_prices else 0.0)
+            self.assertEqual(p_max, max(accepted_prices) if accepted_prices else 0.0)
+            self.assertEqual(self.memory.get_records(), window)
+            self.assertEqual(self.memory.get_last_record(), record)
+
+    def test_sums_reset_when_empty(self):
+        for price in [0.1, 0.2, 0.3, 0.4, 0.5]:
+            self.memory.append(None, price, 1.0, True)
+        for price in [0.1, 0.2, 0.3, 0.4, 0.5]:
+            self.memory.append(None, price, 1.0, False)
+        self.assertEqual(self.memory.accepted_sum, 0.0)
+        self.assertEqual(self.memory.n_accepted, 0)
+
+    def test_without_history(self):
+        memory = OfferMemory(L=0)
+        memory.append(None, 1.0, 1.0, True)
+        self.assertEqual(len(memory), 0)
+        self.assertEqual(memory.get_stats(), (0.0, 0.0, 0.0, 0.0, 0.0))
+        self.assertIsNone(memory.get_last_record())
+        with self.assertRaises(ValueError):
+            OfferMemory(L=-1)
+
+if __name__ == '__main__':
+    unittest.main()
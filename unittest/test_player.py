@@ -0,0 +1,96 @@
+import logging
+import threading
+import unittest
+from classes.player import Player
+
+class PagedInterface:
+    """
+    NODES interface answering the GET requests with the given pages, False for the unknown endpoints.
+    """
+
+    def __init__(self, pages, **cfg):
+        self.cfg = dict({'mainEndpoint': 'https://nodes.test/api/'}, **cfg)
+        self.pages = pages
+        self.requested = []
+        self.condition = threading.Condition()
+
+    def get_request(self, endpoint):
+        with self.condition:
+            self.requested.append(endpoint)
+            self.condition.notify_all()
+        return self.pages.get(endpoint, False)
+
+    def wait_requests(self, n):
+        with self.condition:
+            return self.condition.wait_for(lambda: len(self.requested) >= n, timeout=5.0)
+
+def build_player(nodes_interface):
+    # The NODES token and the InfluxDB connection of the constructor are not needed by the pagination
+    player = Player.__new__(Player)
+    player.nodes_interface = nodes_interface
+    player.logger = logging.getLogger(__name__)
+    return player
+
+class TestPlayerPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = {
+            'https://nodes.test/api/orders?status=Active': {'items': [1, 2], 'next': 'orders?status=Active&page=2'},
+            'https://nodes.test/api/orders?status=Active&page=2': {'items': [3],
+                                                                   'next': 'https://nodes.test/api/orders?page=3'},
+            'https://nodes.test/api/orders?page=3': {'items': [4, 5]},
+        }
+
+    def test_pages(self):
+        for prefetch in [False, True]:
+            with self.subTest(prefetch=prefetch):
+                nodes_interface = PagedInterface(self.pages)
+                player = build_player(nodes_interface)
+                self.assertEqual(list(player.iter_nodes_api_info('orders', {'status': 'Active'}, prefetch=prefetch)),
+                                 [1, 2, 3, 4, 5])
+                self.assertEqual(nodes_interface.requested, list(self.pages.keys()))
+
+    def test_next_page_field(self):
+        pages = {'https://nodes.test/api/markets': {'items': ['a'], 'nextLink': 'markets?page=2', 'next': 'other'},
+                 'https://nodes.test/api/markets?page=2': {'items': ['b']}}
+        player = build_player(PagedInterface(pages, nextPageField='nextLink'))
+        self.assertEqual(player.get_nodes_api_info('markets'), ['a', 'b'])
+
+    def test_cycle(self):
+        self.pages['https://nodes.test/api/orders?page=3']['next'] = 'orders?status=Active'
+        nodes_interface = PagedInterface(self.pages)
+        self.assertEqual(build_player(nodes_interface).get_nodes_api_info('orders', {'status': 'Active'}),
+                         [1, 2, 3, 4, 5])
+        self.assertEqual(len(nodes_interface.requested), 3)
+
+    def test_failed_page(self):
+        # A failed page raises an error instead of truncating the collection, also if it is the first one
+        del self.pages['https://nodes.test/api/orders?page=3']
+        for prefetch in [False, True]:
+            with self.subTest(prefetch=prefetch):
+                items = build_player(PagedInterface(self.pages)).iter_nodes_api_info('orders', {'status': 'Active'},
+                                                                                     prefetch=prefetch)
+                self.assertEqual([next(items) for _ in range(3)], [1, 2, 3])
+                with self.assertRaises(RuntimeError):
+                    next(items)
+        with self.assertRaises(RuntimeError):
+            build_player(PagedInterface({})).get_nodes_api_info('markets')
+
+    def test_prefetch(self):
+        threads = set(threading.enumerate())
+        nodes_interface = PagedInterface(self.pages, prefetchPages=True)
+        items = build_player(nodes_interface).get_orders({'status': 'Active'}, stream=True)
+        self.assertEqual(next(items), 1)
+        # The second page is requested while the first one is consumed, the third one only when reached
+        self.assertTrue(nodes_interface.wait_requests(2))
+        self.assertEqual(nodes_interface.requested, list(self.pages.keys())[:2])
+
+        # Closing an abandoned generator stops the prefetching thread
+        items.close()
+        for thread in set(threading.enumerate()).difference(threads):
+            thread.join(timeout=5.0)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual(len(nodes_interface.requested), 2)
+
+if __name__ == '__main__':
+    unittest.main()
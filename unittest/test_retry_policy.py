@@ -0,0 +1,93 @@
+import random
+import unittest
+from datetime import datetime, timezone
+from classes.retry_policy import RetryPolicy, SUCCESS, RETRY, FAIL
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_classify(self):
+        policy = RetryPolicy()
+        self.assertEqual(policy.classify(200), SUCCESS)
+        for status_code in [429, 500, 503]:
+            self.assertEqual(policy.classify(status_code), RETRY)
+        for status_code in [400, 401, 404, 201]:
+            self.assertEqual(policy.classify(status_code), FAIL)
+        self.assertEqual(RetryPolicy(retry_statuses=[404]).classify(503), FAIL)
+
+    def test_retry_after(self):
+        now = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        self.assertEqual(RetryPolicy.parse_retry_after('120'), 120.0)
+        self.assertEqual(RetryPolicy.parse_retry_after('Wed, 01 Jan 2025 12:00:30 GMT', now=now), 30.0)
+        self.assertIsNone(RetryPolicy.parse_retry_after(None))
+        self.assertIsNone(RetryPolicy.parse_retry_after('soon'))
+
+    def test_delays(self):
+        policy = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=5.0, rng=random.Random(0))
+        for attempt in range(4):
+            delay = policy.get_retry_delay(attempt)
+            self.assertGreaterEqual(delay, 0.0)
+            self.assertLessEqual(delay, min(5.0, 2.0 ** attempt))
+        self.assertIsNone(policy.get_retry_delay(4))
+
+        # Retry-After is the minimum delay, the request is not retried if it is too long
+        self.assertEqual(policy.get_retry_delay(0, retry_after=3.0), 3.0)
+        self.assertIsNone(policy.get_retry_delay(0, retry_after=60.0))
+
+    def test_budget(self):
+        policy = RetryPolicy(max_attempts=10, budget_ratio=0.5, budget_max_retries=2, breaker_threshold=None)
+        self.assertTrue(policy.allow_request())
+        self.assertIsNotNone(policy.get_retry_delay(0))
+        self.assertIsNotNone(policy.get_retry_delay(1))
+        self.assertIsNone(policy.get_retry_delay(2))
+
+        # Two more requests earn a retry
+        policy.allow_request()
+        policy.allow_request()
+        self.assertIsNotNone(policy.get_retry_delay(0))
+        self.assertIsNone(policy.get_retry_delay(0))
+
+    def test_circuit_breaker(self):
+        policy = RetryPolicy(breaker_threshold=3, breaker_reset_time=10.0, clock=self.clock)
+        for _ in range(3):
+            self.assertTrue(policy.allow_request())
+            policy.record_failure()
+        self.assertTrue(policy.is_open())
+        self.assertFalse(policy.allow_request())
+        self.assertIsNone(policy.get_retry_delay(0))
+
+        # After the reset time a single trial request is sent, its failure opens the circuit again
+        self.clock.now = 11.0
+        self.assertTrue(policy.allow_request())
+        self.assertFalse(policy.allow_request())
+        policy.record_failure()
+        self.assertTrue(policy.is_open())
+
+        # A successful trial closes it
+        self.clock.now = 22.0
+        self.assertTrue(policy.allow_request())
+        policy.record_success()
+        self.assertFalse(policy.is_open())
+        self.assertTrue(policy.allow_request())
+        self.assertTrue(policy.allow_request())
+
+    def test_from_cfg(self):
+        policy = RetryPolicy.from_cfg({'retries': 4, 'retryMaxDelay': 2.0, 'circuitBreakerThreshold': None})
+        self.assertEqual(policy.max_attempts, 4)
+        self.assertEqual(policy.max_delay, 2.0)
+        self.assertIsNone(policy.breaker_threshold)
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_attempts=0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from classes.rolling_statistics import RollingStatistics
+
+class TestRollingStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.statistics = RollingStatistics(window=5)
+
+    def test_empty(self):
+        self.assertEqual(self.statistics.mean(), 0.0)
+        self.assertEqual(self.statistics.mean_last(3), 0.0)
+
+    def test_mean_last(self):
+        values = [10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0, 80.0]
+        for i, value in enumerate(values):
+            self.statistics.append(value)
+            for n in range(1, 6):
+                expected = sum(values[:i + 1][-n:]) / min(n, i + 1)
+                self.assertAlmostEqual(self.statistics.mean_last(n), expected)
+        self.assertEqual(len(self.statistics), 8)
+        self.assertEqual(self.statistics.mean(), 45.0)
+        self.assertEqual(len(self.statistics.totals), 6)
+
+    def test_window_exceeded(self):
+        self.statistics.extend([1.0, 2.0])
+        with self.assertRaises(ValueError):
+            self.statistics.mean_last(6)
+
+if __name__ == '__main__':
+    unittest.main()
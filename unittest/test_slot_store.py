@@ -0,0 +1,99 @@
+import unittest
+import numpy as np
+import pandas as pd
+from classes.slot_store import SlotStore
+
+class TestSlotStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SlotStore(resolution='15min', initial_keys=1, initial_slots=4)
+        self.time_index = pd.date_range(start='2025-01-01', periods=10, freq='15min')
+
+    def test_set_and_get_value(self):
+        self.store.set_value('bidder1', self.time_index[3], 1.5)
+        self.store.set_value('bidder1', self.time_index[0], 0.5)
+        self.store.set_value('bidder2', self.time_index[9], 2.5)
+        self.assertEqual(self.store.get_value('bidder1', self.time_index[3]), 1.5)
+        self.assertEqual(self.store.get_value('bidder1', self.time_index[0]), 0.5)
+        self.assertEqual(self.store.get_value('bidder2', self.time_index[9]), 2.5)
+        self.assertEqual(self.store.get_value('bidder1', self.time_index[9], default=0.0), 0.0)
+        self.assertEqual(self.store.get_value('bidder3', self.time_index[0], default=0.0), 0.0)
+        self.assertEqual(self.store.get_value('bidder1', self.time_index[0] + pd.Timedelta('5min'), default=0.0), 0.0)
+
+    def test_misaligned_time_slot(self):
+        self.store.set_value('bidder1', self.time_index[0], 1.0)
+        with self.assertRaises(ValueError):
+            self.store.set_value('bidder1', self.time_index[0] + pd.Timedelta('5min'), 1.0)
+
+    def test_not_datetime_time_slot(self):
+        # Integer slots are not taken as nanoseconds from 1970
+        with self.assertRaises(TypeError):
+            self.store.set_value('bidder1', 3, 1.0)
+        with self.assertRaises(TypeError):
+            self.store.set_values('bidder1', [3, 4], [1.0, 2.0])
+        self.assertIsNone(self.store.epoch)
+        self.store.set_value('bidder1', self.time_index[0], 1.0)
+        self.assertEqual(self.store.get_value('bidder1', 0, default=0.0), 0.0)
+
+    def test_store_dataframe(self):
+        df = pd.DataFrame({'value': np.arange(10, dtype=float)}, index=self.time_index)
+        self.store.store_dataframe('bidder1', df)
+        self.store.store_dataframe('bidder2', df.iloc[5:] * 2)
+        values = self.store.get_values(['bidder1', 'bidder2', 'bidder2', 'bidder3'],
+                                       [self.time_index[2], self.time_index[2], self.time_index[7],
+                                        self.time_index[7]], default=0.0)
+        np.testing.assert_array_equal(values, [2.0, 0.0, 14.0, 0.0])
+
+        # Replacing the baseline discards the old values
+        self.store.store_dataframe('bidder1', df.iloc[:2])
+        self.assertTrue(np.isnan(self.store.get_value('bidder1', self.time_index[5])))
+
+    def test_get_range(self):
+        df = pd.DataFrame({'value': np.arange(10, dtype=float)}, index=self.time_index)
+        self.store.store_dataframe('bidder1', df.iloc[2:6])
+        series = self.store.get_range('bidder1', self.time_index[0], self.time_index[7], default=-1.0)
+        np.testing.assert_array_equal(series.values, [-1.0, -1.0, 2.0, 3.0, 4.0, 5.0, -1.0, -1.0])
+        self.assertTrue(series.index.equals(self.time_index[:8]))
+        self.assertTrue(self.store.get_series('bidder1').index.equals(self.time_index[2:6]))
+
+    def test_retention(self):
+        store = SlotStore(resolution='15min', initial_slots=2, retention=4)
+        time_index = pd.date_range(start='2025-01-01', periods=50, freq='15min')
+        for i, time_slot in enumerate(time_index):
+            store.set_value('mp1', time_slot, float(i))
+        self.assertLessEqual(store.values.shape[1], 8)
+        self.assertTrue(np.isnan(store.get_value('mp1', time_index[45])))
+        np.testing.assert_array_equal(store.get_key_view('mp1'), [46.0, 47.0, 48.0, 49.0])
+
+        # Values older than the retention window are discarded
+        store.set_value('mp1', time_index[10], 1.0)
+        self.assertTrue(np.isnan(store.get_value('mp1', time_index[10])))
+
+    def test_views(self):
+        self.store.set_points(['mp1', 'mp2', 'mp1'], self.time_index[[0, 1, 1]], [1.0, 2.0, 3.0])
+        view = self.store.get_key_view('mp1')
+        np.testing.assert_array_equal(view, [1.0, 3.0])
+        self.assertTrue(np.shares_memory(view, self.store.values))
+        slot_view = self.store.get_slot_view(self.time_index[1])
+        np.testing.assert_array_equal(slot_view, [3.0, 2.0])
+        self.assertTrue(np.shares_memory(slot_view, self.store.values))
+        self.assertIsNone(self.store.get_slot_view(self.time_index[5]))
+
+    def test_update_dataframe(self):
+        baseline = pd.DataFrame({'value': np.arange(10, dtype=float)}, index=self.time_index)
+        self.assertEqual(self.store.update_dataframe('bidder1', baseline), (self.time_index[0], self.time_index[9]))
+        self.assertIsNone(self.store.update_dataframe('bidder1', baseline))
+
+        updated = baseline.copy()
+        updated.iloc[3:6] = -1.0
+        self.assertEqual(self.store.update_dataframe('bidder1', updated), (self.time_index[3], self.time_index[5]))
+        np.testing.assert_array_equal(self.store.get_series('bidder1').values, updated['value'].values)
+
+        # The slots missing in the new baseline are discarded
+        self.assertEqual(self.store.update_dataframe('bidder1', updated.iloc[:8]),
+                         (self.time_index[8], self.time_index[9]))
+        self.assertTrue(np.isnan(self.store.get_value('bidder1', self.time_index[9])))
+        self.assertIsNone(self.store.update_dataframe('bidder1', updated.iloc[2:3], replace=False))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from classes.token_cache import TokenCache
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.folder, 'fsp_FSP1.json')
+        self.clock = FakeClock()
+        self.requests = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def request_token(self):
+        self.requests += 1
+        return {'access_token': 'token_%i' % self.requests, 'expires_in': 3600}
+
+    def test_expiry(self):
+        cache = TokenCache(self.file_name, refresh_margin=300, clock=self.clock)
+        token_data = cache.get_token(self.request_token)
+        self.assertEqual(token_data['access_token'], 'token_1')
+        self.assertEqual(token_data['expires_at'], 4600.0)
+        with open(self.file_name) as json_file:
+            self.assertEqual(json.load(json_file), token_data)
+
+        # The cached token is used without requests until refresh_margin seconds before its expiry
+        self.clock.now = 4200.0
+        self.assertEqual(cache.get_token(self.request_token)['access_token'], 'token_1')
+        self.clock.now = 4400.0
+        self.assertEqual(cache.get_token(self.request_token)['access_token'], 'token_2')
+        self.assertEqual(self.requests, 2)
+
+        # Only the token file and the lock file are left
+        self.assertEqual(sorted(os.listdir(self.folder)), ['fsp_FSP1.json', 'fsp_FSP1.json.lock'])
+
+    def test_invalid_cache(self):
+        with open(self.file_name, 'w') as json_file:
+            json_file.write('{"access_token": "old"')
+        cache = TokenCache(self.file_name, clock=self.clock)
+        self.assertEqual(cache.get_token(self.request_token)['access_token'], 'token_1')
+
+        # Tokens stored without expiry (previous format) are replaced
+        with open(self.file_name, 'w') as json_file:
+            json.dump({'access_token': 'old'}, json_file)
+        self.assertEqual(cache.get_token(self.request_token)['access_token'], 'token_2')
+
+    def test_failed_request(self):
+        cache = TokenCache(self.file_name, clock=self.clock)
+        self.assertIsNone(cache.get_token(lambda: None))
+        self.assertFalse(os.path.exists(self.file_name))
+
+    def test_force(self):
+        cache = TokenCache(self.file_name, clock=self.clock)
+        cache.get_token(self.request_token)
+        self.assertEqual(cache.get_token(self.request_token, force=True)['access_token'], 'token_2')
+
+    def test_force_replaced_token(self):
+        # The token rejected for a process has already been replaced by another one, it is not requested again
+        cache = TokenCache(self.file_name, clock=self.clock)
+        current = cache.get_token(self.request_token)
+        replaced = TokenCache(self.file_name, clock=self.clock).get_token(self.request_token, force=True,
+                                                                          current=current)
+        self.assertEqual(replaced['access_token'], 'token_2')
+        self.assertEqual(cache.get_token(self.request_token, force=True, current=current), replaced)
+        self.assertEqual(self.requests, 2)
+
+        # The token in the cache is the one rejected, a new one is requested
+        self.assertEqual(cache.get_token(self.request_token, force=True, current=replaced)['access_token'], 'token_3')
+
+    def test_concurrent_refresh(self):
+        def slow_request():
+            time.sleep(0.05)
+            return self.request_token()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(TokenCache(self.file_name).get_token(slow_request)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.requests, 1)
+        self.assertEqual(set(token_data['access_token'] for token_data in results), {'token_1'})
+
+if __name__ == '__main__':
+    unittest.main()
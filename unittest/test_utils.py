@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import unittest
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+from unittest import mock
+from classes.clearing_history import ClearingHistory, ALLOCATION_COLUMNS
+from scripts import utils
+from scripts.utils import (BID_COLUMNS, bids_to_table, history_to_table, buyers_to_table, get_cached_renderer,
+                           clear_figure_cache, write_report)
+
+class FakeBuyer:
+
+    def __init__(self, id, time_index, wtp):
+        self.id = id
+        self.demand_curve = pd.DataFrame({'demand': np.arange(len(time_index), dtype=float)}, index=time_index)
+        self.willingness_to_pay = wtp
+
+class FakeMarketOperator:
+
+    def __init__(self, clearing_history):
+        self.clearing_history = clearing_history
+
+class TestUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.time_index = pd.date_range(start='2025-01-01 00:00', periods=4, freq='h')
+        self.accepted_bids = {}
+        self.not_accepted_bids = {}
+        for i, time_slot in enumerate(self.time_index):
+            self.accepted_bids[time_slot] = [{'time_slot': time_slot, 'bidder_id': 'bidder_%i' % (i % 2),
+                                              'buyer_id': 'buyer_1', 'power': 1.0 + i, 'price': 0.5, 'reward': 2.0}]
+            self.not_accepted_bids[time_slot] = [{'time_slot': time_slot, 'bidder_id': 'bidder_2',
+                                                  'buyer_id': 'buyer_1', 'power': 3.0, 'price': 0.9}]
+        self.buyers = [FakeBuyer('buyer_1', self.time_index, 40.0),
+                       FakeBuyer('buyer_2', self.time_index,
+                                 pd.DataFrame({'wtp': [10.0, 20.0, 30.0, 40.0]}, index=self.time_index))]
+        history = ClearingHistory()
+        for i, time_slot in enumerate(self.time_index):
+            history.add_results({time_slot: [{'buyer_id': 'buyer_1', 'unfulfilled_demand': 0.0, 'allocations': [
+                {'bidder_id': 'bidder_%i' % (i % 2), 'buyer_id': 'buyer_1', 'requested_flexibility': 5.0,
+                 'bidded_flexibility': 2.0, 'provided_flexibility': 1.5, 'allocated_flexibility': 1.5,
+                 'baseline_value': 10.0, 'actual_value': 8.5, 'remaining_demand': 5.0, 'price': 0.5,
+                 'reward': 1.0 + i}]}]})
+        self.market_operator = FakeMarketOperator(history)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        clear_figure_cache()
+
+    def test_bids_to_table(self):
+        table = bids_to_table(self.accepted_bids, self.not_accepted_bids)
+        self.assertEqual(list(table.columns), BID_COLUMNS)
+        self.assertEqual(len(table), 8)
+        self.assertEqual(table['accepted'].sum(), 4)
+        # The rewards of the non-accepted bids are missing
+        self.assertTrue(table.loc[~table['accepted'], 'reward'].isna().all())
+        self.assertEqual(table.loc[table['accepted'], 'reward'].sum(), 8.0)
+        self.assertEqual(len(bids_to_table({})), 0)
+
+    def test_history_to_table(self):
+        table = history_to_table(self.market_operator)
+        self.assertEqual(list(table.columns), ALLOCATION_COLUMNS)
+        self.assertEqual(list(table['time_slot']), list(self.time_index))
+        self.assertEqual(table['reward'].sum(), 10.0)
+
+    def test_buyers_to_table(self):
+        table = buyers_to_table(self.buyers)
+        self.assertEqual(list(table.columns), ['time_slot', 'buyer_id', 'demand', 'wtp'])
+        self.assertEqual(len(table), 8)
+        self.assertEqual(table.loc[table['buyer_id'] == 'buyer_1', 'wtp'].tolist(), [40.0] * 4)
+        self.assertEqual(table.loc[table['buyer_id'] == 'buyer_2', 'wtp'].tolist(), [10.0, 20.0, 30.0, 40.0])
+        self.assertEqual(len(buyers_to_table([])), 0)
+
+    def test_plots(self):
+        bidders = ['bidder_0', 'bidder_1']
+        per_bidder_bids = {bidder_id: [bid for bids in self.accepted_bids.values() for bid in bids
+                                       if bid['bidder_id'] == bidder_id] for bidder_id in bidders}
+        per_bidder_not_accepted = {bidder_id: [bid for bids in self.not_accepted_bids.values() for bid in bids]
+                                   for bidder_id in bidders}
+        plots = [
+            (utils.plot_bids_per_bidder, (per_bidder_bids, per_bidder_not_accepted), ['bids_bidder_0.png']),
+            (utils.plot_successful_bids_per_bidder, (self.accepted_bids,), ['successful_bids_bidder_1.png']),
+            (utils.plot_unsuccessful_bids_per_bidder, (self.not_accepted_bids,), ['unsuccessful_bids_bidder_2.png']),
+            (utils.plot_combined_bids_per_bidder, (self.accepted_bids, self.not_accepted_bids),
+             ['combined_bids_bidder_0.png', 'combined_bids_bidder_2.png']),
+            (utils.plot_all_accepted_bids, (self.accepted_bids,), ['all_accepted_bids.png']),
+            (utils.plot_buyer_requests_and_wtp, (self.buyers,),
+             ['buyer_requests_wtp_buyer_1.png', 'buyer_requests_wtp_buyer_2.png']),
+            (utils.plot_rewards_per_bidder, (self.accepted_bids,), ['rewards_bidder_0.png', 'rewards_bidder_1.png']),
+            (utils.plot_all_bidders_rewards, (self.accepted_bids,), ['all_bidders_rewards.png']),
+            (utils.plot_flexibility_from_history, (self.market_operator,), ['flexibility_bidder_1.png']),
+            (utils.plot_flexibility_and_rewards_from_history, (self.market_operator,),
+             ['flexibility_rewards_bidder_0.png']),
+            (utils.plot_flexibility_requested_and_rewards_from_history, (self.market_operator,),
+             ['flexibility_requested_rewards_bidder_1.png']),
+        ]
+        for plot, args, files in plots:
+            with self.subTest(plot=plot.__name__):
+                plot_dir = os.path.join(self.folder, plot.__name__)
+                os.makedirs(plot_dir)
+                paths = plot(*args, plot_dir)
+                for file in files:
+                    self.assertIn(os.path.join(plot_dir, file), paths)
+                self.assertTrue(all(os.path.getsize(path) > 0 for path in paths))
+
+        # The demand plots of the simulation steps reuse the same renderer
+        df_duck = pd.DataFrame({'demand': [1.0, 2.0, 3.0, 4.0]}, index=self.time_index)
+        df_bus = pd.DataFrame({'demand': [4.0, 3.0, 2.0, 1.0]}, index=self.time_index)
+        for step in range(2):
+            self.assertTrue(os.path.exists(utils.plot_requests(self.time_index, df_duck, df_bus, self.folder, step)))
+        self.assertEqual(list(utils.FIGURE_CACHE.keys()), ['plot_requests'])
+
+    def test_figure_cache(self):
+        spec = {'file': '{key}.png', 'title': '{key}', 'legend': False, 'series': [{'column': 'value'}]}
+        with mock.patch.object(utils, 'FIGURE_CACHE_SIZE', 2):
+            renderer = get_cached_renderer('a', spec, False)
+            get_cached_renderer('b', spec, False)
+            self.assertIs(get_cached_renderer('a', spec, False), renderer)
+            # The least recently used renderer is released
+            get_cached_renderer('c', spec, False)
+            self.assertEqual(list(utils.FIGURE_CACHE.keys()), ['a', 'c'])
+        clear_figure_cache()
+        self.assertEqual(len(utils.FIGURE_CACHE), 0)
+        self.assertIsNot(get_cached_renderer('a', spec, False), renderer)
+
+    def test_report(self):
+        bids = bids_to_table(self.accepted_bids, self.not_accepted_bids)
+        plot = utils.plot_all_bidders_rewards(self.accepted_bids, self.folder)[0]
+        path = write_report(os.path.join(self.folder, 'report'), bids, history_to_table(self.market_operator),
+                            buyers_to_table(self.buyers), [plot])
+        for name in ['bids', 'history', 'buyers']:
+            self.assertTrue(os.path.exists(os.path.join(self.folder, 'report', '%s.csv' % name)))
+        with open(path) as html_file:
+            content = html_file.read()
+        self.assertIn('data:image/png;base64', content)
+        self.assertIn('bidder_2', content)
+
+if __name__ == '__main__':
+    unittest.main()